@@ -1,41 +1,185 @@
 """The Omada Controller component."""
+from http import HTTPStatus
+import logging
+
+from aiohttp.hdrs import METH_POST
+from aiohttp.web import Request, Response
+from homeassistant.components import webhook
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP, Platform
+from homeassistant.core import Event, HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryAuthFailed, ConfigEntryNotReady
 from homeassistant.helpers import config_validation as cv, device_registry as dr
+from homeassistant.helpers.typing import ConfigType
 
-from .const import ATTR_MANUFACTURER, DOMAIN
+from .cache import DeviceCache
+from .const import (
+    ATTR_MANUFACTURER,
+    CONF_EVENT_MODE,
+    CONF_PRESENCE_LOG,
+    CONF_WEBHOOK_ID,
+    DOMAIN,
+)
 from .errors import CannotConnect, LoginError
-from .controller import OmadaControllerDataUpdateCoordinator, OmadaController
+from .controller import OmadaControllerDataUpdateCoordinator
+from .events import parse_webhook_payload
+from .hub import async_acquire_controller, async_release_controller
+from .presence import PresenceLog
+from .services import async_setup_services
+
+_LOGGER = logging.getLogger(__name__)
 
 CONFIG_SCHEMA = cv.removed(DOMAIN, raise_if_present=False)
 
-PLATFORMS = [Platform.DEVICE_TRACKER]
+PLATFORMS = [Platform.DEVICE_TRACKER, Platform.SENSOR]
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the services of the Omada Controller component."""
+    async_setup_services(hass)
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
-    """Set up the Omada Controller component."""
-    try:
-        api = await hass.async_add_executor_job(
-            lambda: OmadaController(dict(config_entry.data))
-        )
-        await hass.async_add_executor_job(api.login)
-    except CannotConnect as api_error:
-        raise ConfigEntryNotReady from api_error
-    except LoginError as err:
-        raise ConfigEntryAuthFailed from err
+    """Set up the Omada Controller component.
 
+    When the entry has a device cache from an earlier run, its devices are
+    restored straight away and the controller is only contacted once setup
+    is done, so that startup does not wait on the controller. Otherwise the
+    entry waits for a login, which the config flow may already have made,
+    and the first refresh; the controller details come from the info
+    fetched on login.
+    """
+    config = {**config_entry.data, **config_entry.options}
+    api = async_acquire_controller(hass, config_entry.entry_id, config)
+    config_entry.async_on_unload(
+        lambda: async_release_controller(hass, config_entry.entry_id, config)
+    )
+
+    # Logging in doesn't depend on the cache, so it runs while the cache is read.
+    api.async_begin_login()
     coordinator = OmadaControllerDataUpdateCoordinator(hass, config_entry, api)
-    await hass.async_add_executor_job(coordinator.api.get_controller_details)
-    await coordinator.async_config_entry_first_refresh()
+    cache = DeviceCache(hass, config_entry.entry_id)
+    cached = await cache.async_load()
+
+    @callback
+    def async_record_changes() -> None:
+        cache.async_record_changes(coordinator.api.devices, coordinator.api.changes)
+
+    async def async_flush_cache(_event: Event) -> None:
+        await cache.async_flush()
+
+    config_entry.async_on_unload(cache.async_flush)
+    config_entry.async_on_unload(
+        hass.bus.async_listen(EVENT_HOMEASSISTANT_STOP, async_flush_cache)
+    )
+    config_entry.async_on_unload(coordinator.async_add_listener(async_record_changes))
+
+    if config_entry.options.get(CONF_PRESENCE_LOG):
+        presence_log = coordinator.presence_log = PresenceLog(hass, config_entry.entry_id)
+        await presence_log.async_load()
+
+        @callback
+        def async_record_transitions() -> None:
+            presence_log.async_record_changes(coordinator.api.devices, coordinator.api.changes)
+
+        async def async_flush_presence_log(_event: Event) -> None:
+            await presence_log.async_flush()
+
+        config_entry.async_on_unload(presence_log.async_flush)
+        config_entry.async_on_unload(
+            hass.bus.async_listen(EVENT_HOMEASSISTANT_STOP, async_flush_presence_log)
+        )
+        config_entry.async_on_unload(coordinator.async_add_listener(async_record_transitions))
+
+    if restored := bool(cache.details):
+        coordinator.api.restore(cache.details, cached)
+        if coordinator.presence_log is not None:
+            coordinator.presence_log.async_seed(coordinator.api.devices)
+    else:
+        try:
+            await api.async_ensure_logged_in()
+            await coordinator.api.get_controller_details()
+        except CannotConnect as api_error:
+            raise ConfigEntryNotReady from api_error
+        except LoginError as err:
+            raise ConfigEntryAuthFailed from err
+        cache.async_record_details(coordinator.api.details)
+        await coordinator.async_config_entry_first_refresh()
 
     hass.data.setdefault(DOMAIN, {})[config_entry.entry_id] = coordinator
+    if config_entry.options.get(CONF_EVENT_MODE):
+        webhook_id = config_entry.options[CONF_WEBHOOK_ID]
+        webhook.async_register(
+            hass,
+            DOMAIN,
+            config_entry.title,
+            webhook_id,
+            async_handle_webhook,
+            local_only=True,
+            allowed_methods=[METH_POST],
+        )
+        config_entry.async_on_unload(lambda: webhook.async_unregister(hass, webhook_id))
 
     await hass.config_entries.async_forward_entry_setups(config_entry, PLATFORMS)
+    config_entry.async_on_unload(config_entry.add_update_listener(async_reload_entry))
+    _async_update_device_registry(hass, config_entry, coordinator)
+
+    if restored:
+        config_entry.async_create_background_task(
+            hass,
+            _async_reconcile(hass, config_entry, coordinator, cache),
+            f"{DOMAIN} {config_entry.title} reconcile",
+        )
+    return True
+
+
+async def async_handle_webhook(
+    hass: HomeAssistant, webhook_id: str, request: Request
+) -> Response | None:
+    """Apply the client events the controller posted to an entry's webhook."""
+    try:
+        payload = await request.json()
+    except ValueError:
+        return Response(status=HTTPStatus.BAD_REQUEST)
+    events = parse_webhook_payload(payload)
+    coordinator: OmadaControllerDataUpdateCoordinator
+    for coordinator in hass.data.get(DOMAIN, {}).values():
+        if coordinator.config_entry.options.get(CONF_WEBHOOK_ID) == webhook_id:
+            coordinator.async_handle_events(events)
+    return None
+
+
+async def _async_reconcile(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    coordinator: OmadaControllerDataUpdateCoordinator,
+    cache: DeviceCache,
+) -> None:
+    """Refresh the restored devices and controller details from the controller.
 
+    Failures are left to the coordinator, which keeps retrying on its schedule.
+    """
+    await coordinator.async_refresh()
+    if not coordinator.last_update_success:
+        return
+    try:
+        await coordinator.api.get_controller_details()
+    except (CannotConnect, LoginError) as err:
+        _LOGGER.debug("Omada Controller %s details unavailable: %s", coordinator.host, err)
+        return
+    cache.async_record_details(coordinator.api.details)
+    _async_update_device_registry(hass, config_entry, coordinator)
+
+
+@callback
+def _async_update_device_registry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    coordinator: OmadaControllerDataUpdateCoordinator,
+) -> None:
     device_registry = dr.async_get(hass)
-    device_registry.async_get_or_create(
+    device = device_registry.async_get_or_create(
         config_entry_id=config_entry.entry_id,
         connections={(DOMAIN, coordinator.serial_num)},
         manufacturer=ATTR_MANUFACTURER,
@@ -43,7 +187,10 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
         name=coordinator.hostname,
         sw_version=coordinator.firmware,
     )
-    return True
+    if device.sw_version != coordinator.firmware or device.model != coordinator.model:
+        device_registry.async_update_device(
+            device.id, model=coordinator.model, sw_version=coordinator.firmware
+        )
 
 
 async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
@@ -54,3 +201,14 @@ async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
         hass.data[DOMAIN].pop(config_entry.entry_id)
 
     return unload_ok
+
+
+async def async_reload_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    """Reload the config entry when its options change."""
+    await hass.config_entries.async_reload(config_entry.entry_id)
+
+
+async def async_remove_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    """Delete the device cache and presence log of a removed entry."""
+    await DeviceCache(hass, config_entry.entry_id).async_remove()
+    await PresenceLog(hass, config_entry.entry_id).async_remove()
@@ -0,0 +1,82 @@
+"""Client counts and throughput per site, AP and SSID.
+
+The totals are kept up to date incrementally: the contribution of each
+connected client is remembered, and when the client changes, moves or goes
+away, only the groups it left or joined are adjusted.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Final
+
+SITE: Final = "site"
+AP: Final = "ap"
+SSID: Final = "ssid"
+
+# A client's group memberships and rates: (site, AP, SSID, rx rate, tx rate).
+_Contribution = tuple[str | None, str | None, str | None, int, int]
+
+
+def _rate(value: Any) -> int:
+    return value if isinstance(value, int) else 0
+
+
+@dataclass(slots=True)
+class Aggregate:
+    """The connected clients of a group and their summed rates, in Kbps."""
+
+    clients: int = 0
+    rx_rate: int = 0
+    tx_rate: int = 0
+
+
+class Aggregates:
+    """The aggregate of every site, AP and SSID that has had a connected client."""
+
+    def __init__(self) -> None:
+        """Initialize without any groups."""
+        self.groups: dict[tuple[str, str], Aggregate] = {}
+        # The groups that changed since they were last collected.
+        self.changed: set[tuple[str, str]] = set()
+        self._contributions: dict[str, _Contribution] = {}
+
+    def update(
+        self,
+        mac: str,
+        site: str | None,
+        ap_name: str | None,
+        ssid: str | None,
+        rx_rate: Any,
+        tx_rate: Any,
+    ) -> None:
+        """Count a connected client in its groups, moving it from its old ones."""
+        contribution = (site, ap_name, ssid, _rate(rx_rate), _rate(tx_rate))
+        if (previous := self._contributions.get(mac)) == contribution:
+            return
+        if previous is not None:
+            self._apply(previous, -1)
+        self._contributions[mac] = contribution
+        self._apply(contribution, 1)
+
+    def discard(self, mac: str) -> None:
+        """Stop counting a client that disconnected or is no longer tracked."""
+        if (previous := self._contributions.pop(mac, None)) is not None:
+            self._apply(previous, -1)
+
+    def pop_changed(self) -> set[tuple[str, str]]:
+        """Return the groups that changed since the last call."""
+        changed, self.changed = self.changed, set()
+        return changed
+
+    def _apply(self, contribution: _Contribution, sign: int) -> None:
+        site, ap_name, ssid, rx_rate, tx_rate = contribution
+        for kind, name in ((SITE, site), (AP, ap_name), (SSID, ssid)):
+            if name is None:
+                continue
+            key = (kind, name)
+            if (aggregate := self.groups.get(key)) is None:
+                aggregate = self.groups[key] = Aggregate()
+            aggregate.clients += sign
+            aggregate.rx_rate += sign * rx_rate
+            aggregate.tx_rate += sign * tx_rate
+            self.changed.add(key)
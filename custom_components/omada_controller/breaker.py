@@ -0,0 +1,76 @@
+"""Circuit breaker for the requests to an Omada Controller."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stop sending requests to a controller that keeps failing.
+
+    After ``threshold`` consecutive failed requests the breaker opens and
+    requests should fail without being sent. Once ``reset_timeout`` has
+    passed, the breaker is half open: one probe may be sent, which closes it
+    when it succeeds and reopens it for twice as long, up to
+    ``max_reset_timeout``, when it fails.
+    """
+
+    def __init__(
+        self,
+        threshold: int,
+        reset_timeout: float,
+        max_reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize a closed breaker."""
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max(max_reset_timeout, reset_timeout)
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._timeout = reset_timeout
+        self._clock = clock
+
+    @property
+    def closed(self) -> bool:
+        """Return whether requests may be sent."""
+        return self.opened_at is None
+
+    @property
+    def state(self) -> str:
+        """Return the state of the breaker."""
+        if self.opened_at is None:
+            return CLOSED
+        return HALF_OPEN if self.probe_due else OPEN
+
+    @property
+    def probe_due(self) -> bool:
+        """Return whether the breaker has been open long enough to probe."""
+        return self.opened_at is not None and self._clock() >= self.opened_at + self._timeout
+
+    def record_success(self) -> None:
+        """Record a request that got an answer, closing the breaker."""
+        self.failures = 0
+        self.opened_at = None
+        self._timeout = self.reset_timeout
+
+    def record_failure(self) -> bool:
+        """Record a failed request, returning whether it opened the breaker.
+
+        Requests that were already in flight when the breaker opened don't
+        extend how long it stays open.
+        """
+        self.failures += 1
+        if self.opened_at is None and self.failures >= self.threshold:
+            self.opened_at = self._clock()
+            return True
+        return False
+
+    def probe_failed(self) -> None:
+        """Keep the breaker open after a failed probe, for twice as long as before."""
+        self._timeout = min(self._timeout * 2, self.max_reset_timeout)
+        self.opened_at = self._clock()
@@ -0,0 +1,188 @@
+"""Request budget shared by everything talking to one Omada Controller.
+
+Every request takes a token from a bucket that refills at ``rate`` tokens
+a second, and holds one of ``max_in_flight`` slots while it runs. Requests
+that have to wait are served by priority, so logins and session checks go
+ahead of client polls, and only a bounded number of polls may wait at all:
+one more is turned away with ``RequestBudgetExceeded``.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+import heapq
+import itertools
+import time
+from typing import Any, Final
+
+from homeassistant.const import CONF_URL
+from homeassistant.core import HomeAssistant, callback
+
+from .const import (
+    BUDGET_BURST_SECONDS,
+    BUDGET_MAX_QUEUED_POLLS,
+    CONF_MAX_IN_FLIGHT,
+    CONF_REQUEST_RATE,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_REQUEST_RATE,
+    DOMAIN,
+)
+from .errors import RequestBudgetExceeded
+from .metrics import Histogram
+
+DATA_BUDGETS: Final = f"{DOMAIN}_budgets"
+
+PRIORITY_HIGH: Final = 0
+PRIORITY_POLL: Final = 1
+
+
+class RequestBudget:
+    """A token bucket with a limit on the requests in flight."""
+
+    def __init__(
+        self,
+        rate: float,
+        max_in_flight: int,
+        max_queued_polls: int = BUDGET_MAX_QUEUED_POLLS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize a full bucket."""
+        self._clock = clock
+        self.rate = rate
+        self.max_in_flight = max_in_flight
+        self.max_queued_polls = max_queued_polls
+        self._tokens = self.capacity
+        self._updated = clock()
+        self.in_flight = 0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._sequence = itertools.count()
+        self._queued_polls = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self.requests = 0
+        self.waited = 0
+        self.rejected = 0
+        self.wait = Histogram()
+
+    @property
+    def capacity(self) -> float:
+        """Return the tokens the bucket holds when full."""
+        return max(1.0, self.rate * BUDGET_BURST_SECONDS)
+
+    def configure(self, rate: float, max_in_flight: int) -> None:
+        """Change the limits, keeping the requests waiting and in flight."""
+        self.rate = rate
+        self.max_in_flight = max_in_flight
+        self._tokens = min(self._tokens, self.capacity)
+        self._wake()
+
+    @property
+    def saturation(self) -> float | None:
+        """Return the share of requests that had to wait or were turned away."""
+        if not self.requests:
+            return None
+        return (self.waited + self.rejected) / self.requests
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_HIGH) -> AsyncIterator[None]:
+        """Hold a slot of the budget for the duration of one request."""
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._wake()
+
+    async def _acquire(self, priority: int) -> None:
+        self.requests += 1
+        if not self._waiters and self._take():
+            return
+        if priority >= PRIORITY_POLL:
+            if self._queued_polls >= self.max_queued_polls:
+                self.rejected += 1
+                raise RequestBudgetExceeded
+            self._queued_polls += 1
+        self.waited += 1
+        start = self._clock()
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted just as the wait was cancelled.
+                self.in_flight -= 1
+                self._wake()
+            raise
+        finally:
+            if priority >= PRIORITY_POLL:
+                self._queued_polls -= 1
+        self.wait.record((self._clock() - start) * 1000)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self) -> bool:
+        """Take a token and a slot, if both are free."""
+        if self.in_flight >= self.max_in_flight:
+            return False
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        self.in_flight += 1
+        return True
+
+    @callback
+    def _wake(self) -> None:
+        """Grant waiting requests what the budget allows, and wait for the next token."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters:
+            future = self._waiters[0][2]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._take():
+                break
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+        if self._waiters and self.in_flight < self.max_in_flight:
+            delay = (1 - self._tokens) / self.rate if self.rate > 0 else 1.0
+            self._timer = asyncio.get_running_loop().call_later(max(delay, 0.001), self._wake)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary suitable for diagnostics."""
+        return {
+            "rate": self.rate,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "requests": self.requests,
+            "waited": self.waited,
+            "rejected": self.rejected,
+            "wait": self.wait.as_dict(),
+        }
+
+
+@callback
+def async_get_budget(hass: HomeAssistant, config: dict[str, Any]) -> RequestBudget:
+    """Return the budget of the controller at the config's URL.
+
+    Limits given in the config replace those of the budget; a config without
+    them, like the config flow's, uses the budget as it is.
+    """
+    budgets: dict[str, RequestBudget] = hass.data.setdefault(DATA_BUDGETS, {})
+    rate = config.get(CONF_REQUEST_RATE)
+    max_in_flight = config.get(CONF_MAX_IN_FLIGHT)
+    if (budget := budgets.get(url := config[CONF_URL])) is None:
+        budget = budgets[url] = RequestBudget(
+            rate or DEFAULT_REQUEST_RATE, max_in_flight or DEFAULT_MAX_IN_FLIGHT
+        )
+    elif rate is not None or max_in_flight is not None:
+        budget.configure(rate or budget.rate, max_in_flight or budget.max_in_flight)
+    return budget
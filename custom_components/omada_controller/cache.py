@@ -0,0 +1,216 @@
+"""On-disk cache of the devices known to a config entry.
+
+The cache is an append-only journal of JSON lines under ``.storage``. The
+first line is a header naming the cached client fields, followed by lines
+that are either the controller details (an object), a device (an array of
+MAC, site, connected flag and the field values) or a removal (an array of
+only the MAC). A later line for a MAC replaces the earlier ones. Only the
+devices whose cached state changed are appended after a refresh, and the
+journal is rewritten as a snapshot once it grows to well beyond the number
+of devices it holds.
+"""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Final
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import STORAGE_DIR
+
+from .const import ATTR_DEVICE_TRACKER, DOMAIN, VOLATILE_ATTRIBUTES
+from .device import Device, DeviceChanges
+from .policy import AttributeFilter
+
+_LOGGER = logging.getLogger(__name__)
+
+CACHE_VERSION: Final = 1
+CACHE_FIELDS: Final = ("lastSeen", *ATTR_DEVICE_TRACKER)
+# Fields that change on nearly every refresh. They are written along with a
+# device, but a change to only these does not cause the device to be written.
+VOLATILE_FIELDS: Final = frozenset({"lastSeen", *VOLATILE_ATTRIBUTES})
+# Seconds that changes are gathered for before being appended in one write.
+CACHE_WRITE_DELAY: Final = 10
+# Superseded lines allowed in the journal, beyond one per device, before it is compacted.
+CACHE_COMPACT_SLACK: Final = 1000
+
+_STABLE_INDEXES: Final = tuple(
+    index for index, name in enumerate(CACHE_FIELDS) if name not in VOLATILE_FIELDS
+)
+
+
+@dataclass
+class CachedDevice:
+    """A device as it was last written to the cache."""
+
+    site: str | None
+    connected: bool
+    params: dict[str, Any] = field(default_factory=dict)
+
+    def to_device(self, mac: str, attribute_filter: AttributeFilter | None = None) -> Device:
+        """Rebuild the device from the cached params."""
+        device = Device(mac, self.params, self.site, attribute_filter)
+        device.connected = self.connected
+        return device
+
+
+def _dumps(line: Any) -> str:
+    return json.dumps(line, separators=(",", ":")) + "\n"
+
+
+class DeviceCache:
+    """The journal of the devices known to one config entry."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the cache of the entry."""
+        self.hass = hass
+        self.path = Path(hass.config.path(STORAGE_DIR, f"{DOMAIN}.{entry_id}.devices"))
+        self.details: dict[str, str] = {}
+        # The stable part of the last line written for each device.
+        self._written: dict[str, tuple[Any, ...]] = {}
+        self._records: dict[str, list[Any]] = {}
+        self._pending: list[Any] = []
+        self._lines = 0
+        self._lock = asyncio.Lock()
+        self._unsub_flush: CALLBACK_TYPE | None = None
+
+    async def async_load(self) -> dict[str, CachedDevice]:
+        """Read the journal, returning the devices it holds."""
+        records = await self.hass.async_add_executor_job(self._load)
+        devices: dict[str, CachedDevice] = {}
+        for mac, (site, connected, *values) in records.items():
+            self._records[mac] = [mac, site, connected, *values]
+            self._written[mac] = self._stable(site, connected, values)
+            devices[mac] = CachedDevice(site, bool(connected), dict(zip(CACHE_FIELDS, values)))
+        return devices
+
+    def _load(self) -> dict[str, list[Any]]:
+        records: dict[str, list[Any]] = {}
+        try:
+            with self.path.open(encoding="utf-8") as journal:
+                lines = iter(journal)
+                header = json.loads(next(lines, "{}"))
+                if header.get("version") != CACHE_VERSION:
+                    return records
+                fields = header["fields"]
+                for number, line in enumerate(lines, 1):
+                    self._lines = number
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash; the device is refreshed anyway.
+                        continue
+                    if isinstance(entry, dict):
+                        self.details = entry
+                    elif len(entry) == 1:
+                        records.pop(entry[0], None)
+                    else:
+                        mac, site, connected, *values = entry
+                        params = dict(zip(fields, values))
+                        records[mac] = [site, connected, *map(params.get, CACHE_FIELDS)]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            _LOGGER.warning("Ignoring unreadable device cache %s: %s", self.path, err)
+            records.clear()
+            self.details = {}
+            self._lines = 0
+        return records
+
+    @staticmethod
+    def _stable(site: str | None, connected: bool, values: list[Any]) -> tuple[Any, ...]:
+        return (site, bool(connected), *(values[index] for index in _STABLE_INDEXES))
+
+    @callback
+    def async_record_details(self, details: dict[str, str]) -> None:
+        """Record the controller details, if they changed."""
+        if details != self.details:
+            self.details = dict(details)
+            self._pending.append(self.details)
+            self._async_schedule_flush()
+
+    @callback
+    def async_record_changes(
+        self, devices: dict[str, Device], changes: DeviceChanges
+    ) -> None:
+        """Record the devices whose cached state changed in the last refresh."""
+        for mac in changes.removed:
+            if self._written.pop(mac, None) is not None:
+                del self._records[mac]
+                self._pending.append([mac])
+        for mac in (changes.added | changes.changed) - changes.removed:
+            if (device := devices.get(mac)) is None:
+                continue
+            params = device.params()
+            values = [params.get(name) for name in CACHE_FIELDS]
+            stable = self._stable(device.site, device.connected, values)
+            if self._written.get(mac) == stable:
+                continue
+            self._written[mac] = stable
+            record = self._records[mac] = [mac, device.site, int(device.connected), *values]
+            self._pending.append(record)
+        if self._pending:
+            self._async_schedule_flush()
+
+    @callback
+    def _async_schedule_flush(self) -> None:
+        if self._unsub_flush is None:
+            self._unsub_flush = async_call_later(
+                self.hass, CACHE_WRITE_DELAY, self._async_scheduled_flush
+            )
+
+    async def _async_scheduled_flush(self, _now: Any) -> None:
+        self._unsub_flush = None
+        await self.async_flush()
+
+    async def async_flush(self) -> None:
+        """Write the pending changes, compacting the journal when it grew too long."""
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+        async with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            if (
+                not self._lines
+                or self._lines + len(pending) > 2 * len(self._records) + CACHE_COMPACT_SLACK
+            ):
+                snapshot: list[Any] = list(self._records.values())
+                if self.details:
+                    snapshot.insert(0, self.details)
+                self._lines = await self.hass.async_add_executor_job(
+                    self._write_snapshot, snapshot
+                )
+            else:
+                self._lines += await self.hass.async_add_executor_job(self._append, pending)
+
+    def _header(self) -> str:
+        return _dumps({"version": CACHE_VERSION, "fields": CACHE_FIELDS})
+
+    def _append(self, lines: list[Any]) -> int:
+        with self.path.open("a", encoding="utf-8") as journal:
+            journal.writelines(map(_dumps, lines))
+        return len(lines)
+
+    def _write_snapshot(self, lines: list[Any]) -> int:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix(".tmp")
+        with temp.open("w", encoding="utf-8") as journal:
+            journal.write(self._header())
+            journal.writelines(map(_dumps, lines))
+        os.replace(temp, self.path)
+        return len(lines)
+
+    async def async_remove(self) -> None:
+        """Delete the journal of an entry that is removed."""
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+        self._pending.clear()
+        await self.hass.async_add_executor_job(self.path.unlink, True)
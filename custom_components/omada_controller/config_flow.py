@@ -7,6 +7,7 @@ from typing import Any
 import voluptuous as vol
 
 from homeassistant import config_entries
+from homeassistant.components import webhook
 from homeassistant.const import (
     CONF_NAME,
     CONF_PASSWORD,
@@ -14,17 +15,71 @@ from homeassistant.const import (
     CONF_USERNAME,
     CONF_VERIFY_SSL,
 )
-from homeassistant.core import callback
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.network import NoURLAvailableError
 
 from .const import (
+    CONF_ATTRIBUTE_MIN_INTERVAL,
+    CONF_ATTRIBUTE_THRESHOLDS,
+    CONF_CONNECT_TIMEOUT,
     CONF_DETECTION_TIME,
+    CONF_EVENT_MODE,
+    CONF_EXCLUDED_ATTRIBUTES,
+    CONF_HISTORY_SAMPLES,
+    CONF_MAX_IN_FLIGHT,
+    CONF_MAX_SCAN_INTERVAL,
+    CONF_MIN_SCAN_INTERVAL,
+    CONF_PRESENCE_LOG,
+    CONF_READ_TIMEOUT,
+    CONF_REQUEST_RATE,
+    CONF_SITE_CONCURRENCY,
+    CONF_SITE_SCAN_INTERVALS,
+    CONF_SITES,
+    CONF_SWEEP_INTERVAL,
+    CONF_THROUGHPUT_SENSORS,
+    CONF_WEBHOOK_ID,
+    DEFAULT_ATTRIBUTE_MIN_INTERVAL,
+    DEFAULT_ATTRIBUTE_THRESHOLDS,
+    DEFAULT_CONNECT_TIMEOUT,
     DEFAULT_DETECTION_TIME,
+    DEFAULT_HISTORY_SAMPLES,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DEFAULT_MIN_SCAN_INTERVAL,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_REQUEST_RATE,
+    DEFAULT_SITE_CONCURRENCY,
+    DEFAULT_SWEEP_INTERVAL,
     DEFAULT_NAME,
     DOMAIN,
+    MAX_HISTORY_SAMPLES,
+    VOLATILE_ATTRIBUTES,
 )
 from .errors import CannotConnect, LoginError
-from .controller import OmadaController
+from .controller import OmadaController, async_create_controller, entry_sites
+from .hub import async_discard_controller, async_store_controller
+
+
+@callback
+def _async_claimed_sites(
+    hass: HomeAssistant, url: str, exclude_entry_id: str | None = None
+) -> set[str] | None:
+    """Return the sites of the controller already tracked by other entries.
+
+    None means an existing entry tracks every site.
+    """
+    claimed: set[str] = set()
+    for entry in hass.config_entries.async_entries(DOMAIN):
+        if entry.source == config_entries.SOURCE_IGNORE:
+            continue
+        if entry.entry_id == exclude_entry_id or entry.data[CONF_URL] != url:
+            continue
+        if not (sites := entry_sites(entry)):
+            return None
+        claimed.update(sites)
+    return claimed
 
 
 class OmadaControllerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
@@ -32,6 +87,11 @@ class OmadaControllerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
     _reauth_entry: config_entries.ConfigEntry | None
+    _user_input: dict[str, Any]
+    # The client logged in with, closed when the flow ends unless an entry uses it.
+    _api: OmadaController | None = None
+    _all_sites: list[str]
+    _available_sites: list[str]
 
     @staticmethod
     @callback
@@ -41,27 +101,43 @@ class OmadaControllerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         """Get the options flow for this handler."""
         return OmadaControllerOptionsFlowHandler(config_entry)
 
+    @callback
+    def async_remove(self) -> None:
+        """Close the flow's client, unless the entry it created uses it."""
+        if self._api is not None:
+            async_discard_controller(self.hass, self._api)
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Handle a flow initialized by the user."""
         errors = {}
         if user_input is not None:
-            self._async_abort_entries_match({CONF_URL: user_input[CONF_URL]})
+            claimed = _async_claimed_sites(self.hass, user_input[CONF_URL])
+            if claimed is None:
+                return self.async_abort(reason="already_configured")
 
+            api = async_create_controller(self.hass, user_input)
             try:
-                api = await self.hass.async_add_executor_job(lambda: OmadaController(user_input))
-                await self.hass.async_add_executor_job(api.login)
+                await api.login()
             except CannotConnect:
                 errors["base"] = "cannot_connect"
             except LoginError:
                 errors[CONF_USERNAME] = "invalid_auth"
                 errors[CONF_PASSWORD] = "invalid_auth"
 
-            if not errors:
-                return self.async_create_entry(
-                    title=f"{DEFAULT_NAME} ({user_input[CONF_URL]})", data=user_input
-                )
+            if errors:
+                api.async_close()
+            else:
+                self._user_input = user_input
+                self._api = api
+                self._all_sites = list(api.sites)
+                self._available_sites = [site for site in api.sites if site not in claimed]
+                if not self._available_sites:
+                    return self.async_abort(reason="already_configured")
+                if len(self._all_sites) == 1:
+                    return self._async_create_site_entry(self._available_sites)
+                return await self.async_step_sites()
         return self.async_show_form(
             step_id="user",
             data_schema=vol.Schema(
@@ -76,6 +152,48 @@ class OmadaControllerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             errors=errors,
         )
 
+    async def async_step_sites(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Choose the sites this entry tracks."""
+        errors = {}
+        if user_input is not None:
+            if user_input[CONF_SITES]:
+                return self._async_create_site_entry(user_input[CONF_SITES])
+            errors[CONF_SITES] = "no_sites"
+
+        return self.async_show_form(
+            step_id="sites",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_SITES, default=self._available_sites
+                    ): cv.multi_select({site: site for site in self._available_sites}),
+                }
+            ),
+            errors=errors,
+        )
+
+    @callback
+    def _async_create_site_entry(self, sites: list[str]) -> FlowResult:
+        """Create an entry tracking the given sites.
+
+        An entry tracking every site stores no site list, so that it also
+        picks up sites added to the controller later. The logged in client is
+        handed over to the entry's setup.
+        """
+        assert self._api
+        url = self._user_input[CONF_URL]
+        async_store_controller(self.hass, self._api)
+        if set(sites) == set(self._all_sites):
+            return self.async_create_entry(
+                title=f"{DEFAULT_NAME} ({url})", data=self._user_input
+            )
+        return self.async_create_entry(
+            title=f"{DEFAULT_NAME} ({url}: {', '.join(sites)})",
+            data={**self._user_input, CONF_SITES: sites},
+        )
+
     async def async_step_reauth(self, data: Mapping[str, Any]) -> FlowResult:
         """Perform reauth upon an API authentication error."""
         self._reauth_entry = self.hass.config_entries.async_get_entry(
@@ -91,15 +209,19 @@ class OmadaControllerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         assert self._reauth_entry
         if user_input is not None:
             user_input = {**self._reauth_entry.data, **user_input}
+            api = async_create_controller(self.hass, user_input)
             try:
-                api = await self.hass.async_add_executor_job(lambda: OmadaController(user_input))
-                await self.hass.async_add_executor_job(api.login)
+                await api.login()
             except CannotConnect:
                 errors["base"] = "cannot_connect"
             except LoginError:
                 errors[CONF_PASSWORD] = "invalid_auth"
 
-            if not errors:
+            if errors:
+                api.async_close()
+            else:
+                self._api = api
+                async_store_controller(self.hass, api)
                 self.hass.config_entries.async_update_entry(
                     self._reauth_entry,
                     data=user_input,
@@ -124,22 +246,78 @@ class OmadaControllerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
 class OmadaControllerOptionsFlowHandler(config_entries.OptionsFlow):
     """Handle OmadaController options."""
 
+    _all_sites: list[str]
+    _available_sites: list[str]
+    _tracked_sites: list[str]
+
     def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
         """Initialize OmadaController options flow."""
         self.config_entry = config_entry
+        self.options = dict(config_entry.options)
+        # Kept from the start, so the URL given to the controller stays valid.
+        self.options.setdefault(CONF_WEBHOOK_ID, webhook.async_generate_id())
 
     async def async_step_init(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
-        """Manage the OmadaController options."""
-        return await self.async_step_device_tracker()
+        """Manage the OmadaController options.
+
+        The sites can only be chosen while the entry is loaded, as they come
+        from its controller client.
+        """
+        coordinator = self.hass.data.get(DOMAIN, {}).get(self.config_entry.entry_id)
+        claimed = _async_claimed_sites(
+            self.hass, self.config_entry.data[CONF_URL], self.config_entry.entry_id
+        )
+        if coordinator is None or claimed is None:
+            self._all_sites = self._available_sites = []
+            self._tracked_sites = list(entry_sites(self.config_entry) or [])
+            return await self.async_step_device_tracker()
+        self._all_sites = list(coordinator.api.api.sites)
+        self._available_sites = [site for site in self._all_sites if site not in claimed]
+        return await self.async_step_sites()
+
+    async def async_step_sites(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Choose the sites the entry tracks."""
+        errors = {}
+        if user_input is not None:
+            sites = user_input[CONF_SITES]
+            if sites:
+                self._tracked_sites = sites
+                # An empty list tracks every site, including ones added later.
+                self.options[CONF_SITES] = (
+                    [] if set(sites) == set(self._all_sites) else sites
+                )
+                return await self.async_step_device_tracker()
+            errors[CONF_SITES] = "no_sites"
+
+        tracked = entry_sites(self.config_entry) or self._all_sites
+        return self.async_show_form(
+            step_id="sites",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_SITES,
+                        default=[site for site in tracked if site in self._available_sites],
+                    ): cv.multi_select({site: site for site in self._available_sites}),
+                }
+            ),
+            errors=errors,
+        )
 
     async def async_step_device_tracker(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Manage the device tracker options."""
+        errors = {}
         if user_input is not None:
-            return self.async_create_entry(title="", data=user_input)
+            if user_input[CONF_MIN_SCAN_INTERVAL] > user_input[CONF_MAX_SCAN_INTERVAL]:
+                errors[CONF_MAX_SCAN_INTERVAL] = "invalid_scan_interval"
+            else:
+                self.options.update(user_input)
+                return await self.async_step_connection()
 
         options = {
             vol.Optional(
@@ -148,8 +326,178 @@ class OmadaControllerOptionsFlowHandler(config_entries.OptionsFlow):
                     CONF_DETECTION_TIME, DEFAULT_DETECTION_TIME
                 ),
             ): int,
+            vol.Optional(
+                CONF_MIN_SCAN_INTERVAL,
+                default=self.config_entry.options.get(
+                    CONF_MIN_SCAN_INTERVAL, DEFAULT_MIN_SCAN_INTERVAL
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Optional(
+                CONF_MAX_SCAN_INTERVAL,
+                default=self.config_entry.options.get(
+                    CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+        }
+        return self.async_show_form(
+            step_id="device_tracker", data_schema=vol.Schema(options), errors=errors
+        )
+
+    async def async_step_connection(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Set how hard the entry may press the controller."""
+        if user_input is not None:
+            self.options.update(user_input)
+            return await self.async_step_events()
+
+        options = {
+            vol.Optional(
+                CONF_SITE_CONCURRENCY,
+                default=self.config_entry.options.get(
+                    CONF_SITE_CONCURRENCY, DEFAULT_SITE_CONCURRENCY
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Optional(
+                CONF_CONNECT_TIMEOUT,
+                default=self.config_entry.options.get(
+                    CONF_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Optional(
+                CONF_READ_TIMEOUT,
+                default=self.config_entry.options.get(
+                    CONF_READ_TIMEOUT, DEFAULT_READ_TIMEOUT
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Optional(
+                CONF_REQUEST_RATE,
+                default=self.config_entry.options.get(
+                    CONF_REQUEST_RATE, DEFAULT_REQUEST_RATE
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Optional(
+                CONF_MAX_IN_FLIGHT,
+                default=self.config_entry.options.get(
+                    CONF_MAX_IN_FLIGHT, DEFAULT_MAX_IN_FLIGHT
+                ),
+            ): vol.All(int, vol.Range(min=1)),
         }
+        return self.async_show_form(step_id="connection", data_schema=vol.Schema(options))
 
+    async def async_step_events(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Choose whether client events pushed by the controller update the devices."""
+        if user_input is not None:
+            self.options.update(user_input)
+            return await self.async_step_history()
+
+        options = {
+            vol.Optional(
+                CONF_EVENT_MODE,
+                default=self.config_entry.options.get(CONF_EVENT_MODE, False),
+            ): bool,
+            vol.Optional(
+                CONF_SWEEP_INTERVAL,
+                default=self.config_entry.options.get(
+                    CONF_SWEEP_INTERVAL, DEFAULT_SWEEP_INTERVAL
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+        }
+        webhook_id = self.options[CONF_WEBHOOK_ID]
+        try:
+            webhook_url = webhook.async_generate_url(self.hass, webhook_id)
+        except NoURLAvailableError:
+            webhook_url = webhook.async_generate_path(webhook_id)
         return self.async_show_form(
-            step_id="device_tracker", data_schema=vol.Schema(options)
+            step_id="events",
+            data_schema=vol.Schema(options),
+            description_placeholders={"webhook_url": webhook_url},
+        )
+
+    async def async_step_history(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Choose what is recorded about the clients over time."""
+        if user_input is not None:
+            self.options.update(user_input)
+            return await self.async_step_attributes()
+
+        options = {
+            vol.Optional(
+                CONF_HISTORY_SAMPLES,
+                default=self.config_entry.options.get(
+                    CONF_HISTORY_SAMPLES, DEFAULT_HISTORY_SAMPLES
+                ),
+            ): vol.All(int, vol.Range(min=0, max=MAX_HISTORY_SAMPLES)),
+            vol.Optional(
+                CONF_THROUGHPUT_SENSORS,
+                default=self.config_entry.options.get(CONF_THROUGHPUT_SENSORS, False),
+            ): bool,
+            vol.Optional(
+                CONF_PRESENCE_LOG,
+                default=self.config_entry.options.get(CONF_PRESENCE_LOG, False),
+            ): bool,
+        }
+        return self.async_show_form(step_id="history", data_schema=vol.Schema(options))
+
+    async def async_step_attributes(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Choose which changes to the volatile attributes are written to the state."""
+        if user_input is not None:
+            self.options[CONF_EXCLUDED_ATTRIBUTES] = user_input[CONF_EXCLUDED_ATTRIBUTES]
+            self.options[CONF_ATTRIBUTE_MIN_INTERVAL] = user_input[CONF_ATTRIBUTE_MIN_INTERVAL]
+            self.options[CONF_ATTRIBUTE_THRESHOLDS] = {
+                name: user_input[name] for name in VOLATILE_ATTRIBUTES
+            }
+            if self._tracked_sites:
+                return await self.async_step_site_intervals()
+            return self.async_create_entry(title="", data=self.options)
+
+        options = self.config_entry.options
+        thresholds = {
+            **DEFAULT_ATTRIBUTE_THRESHOLDS,
+            **options.get(CONF_ATTRIBUTE_THRESHOLDS, {}),
+        }
+        schema: dict[vol.Marker, Any] = {
+            vol.Optional(
+                CONF_EXCLUDED_ATTRIBUTES,
+                default=options.get(CONF_EXCLUDED_ATTRIBUTES, []),
+            ): cv.multi_select({name: name for name in VOLATILE_ATTRIBUTES}),
+            vol.Optional(
+                CONF_ATTRIBUTE_MIN_INTERVAL,
+                default=options.get(
+                    CONF_ATTRIBUTE_MIN_INTERVAL, DEFAULT_ATTRIBUTE_MIN_INTERVAL
+                ),
+            ): vol.All(int, vol.Range(min=0)),
+        }
+        for name in VOLATILE_ATTRIBUTES:
+            schema[vol.Optional(name, default=thresholds[name])] = vol.All(
+                int, vol.Range(min=0)
+            )
+        return self.async_show_form(step_id="attributes", data_schema=vol.Schema(schema))
+
+    async def async_step_site_intervals(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Set how often each tracked site is fetched; 0 fetches it on every refresh."""
+        if user_input is not None:
+            self.options[CONF_SITE_SCAN_INTERVALS] = {
+                site: seconds for site, seconds in user_input.items() if seconds
+            }
+            return self.async_create_entry(title="", data=self.options)
+
+        current = self.config_entry.options.get(CONF_SITE_SCAN_INTERVALS, {})
+        return self.async_show_form(
+            step_id="site_intervals",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(site, default=current.get(site, 0)): vol.All(
+                        int, vol.Range(min=0)
+                    )
+                    for site in self._tracked_sites
+                }
+            ),
         )
@@ -1,17 +1,89 @@
 """Constants used in the Mikrotik components."""
-from datetime import timedelta
 from typing import Final
 
 DOMAIN: Final = "omada_controller"
 DEFAULT_NAME: Final = "Omada Controller"
 DEFAULT_DETECTION_TIME: Final = 300
+DEFAULT_SITE_CONCURRENCY: Final = 4
+DEFAULT_MIN_SCAN_INTERVAL: Final = 10
+DEFAULT_MAX_SCAN_INTERVAL: Final = 120
+DEFAULT_SWEEP_INTERVAL: Final = 300
+DEFAULT_CONNECT_TIMEOUT: Final = 5
+DEFAULT_READ_TIMEOUT: Final = 10
+DEFAULT_ATTRIBUTE_MIN_INTERVAL: Final = 60
+DEFAULT_HISTORY_SAMPLES: Final = 60
+DEFAULT_REQUEST_RATE: Final = 20
+DEFAULT_MAX_IN_FLIGHT: Final = 16
+MAX_HISTORY_SAMPLES: Final = 1440
+# Smallest change of each volatile attribute that is written to the state.
+DEFAULT_ATTRIBUTE_THRESHOLDS: Final = {
+    "signalLevel": 5,
+    "snr": 3,
+    "rxRate": 10000,
+    "txRate": 10000,
+    "uptime": 3600,
+}
 
 ATTR_MANUFACTURER: Final = "TP-Link"
 ATTR_VERSION: Final = "current-version"
 
-SCAN_INTERVAL = timedelta(seconds=30)
+# Times a GET that failed in transport or with a server error is sent again.
+REQUEST_RETRIES: Final = 2
+# Seconds that the random delay before the first retry is drawn from; it doubles per retry.
+RETRY_BACKOFF: Final = 0.5
+# Consecutive failed requests that open the circuit breaker.
+BREAKER_FAILURE_THRESHOLD: Final = 5
+# Seconds the breaker stays open before probing; doubled after each failed probe.
+BREAKER_RESET_TIMEOUT: Final = 30
+BREAKER_MAX_RESET_TIMEOUT: Final = 300
+# Seconds of requests, at the budget's rate, that may be sent in one burst.
+BUDGET_BURST_SECONDS: Final = 2
+# Size at which the presence log starts a new segment, and the segments it keeps.
+PRESENCE_SEGMENT_BYTES: Final = 1 << 20
+PRESENCE_MAX_SEGMENTS: Final = 32
+# Client polls that may wait for the request budget before more are turned away.
+BUDGET_MAX_QUEUED_POLLS: Final = 32
+CLIENTS_PAGE_SIZE: Final = 1000
+CLIENTS_PAGE_PREFETCH: Final = 4
+# Most device tracker entities registered per event loop iteration.
+ENTITY_ADD_BATCH: Final = 250
+# Seconds of throughput samples averaged by the per-client rate sensors.
+THROUGHPUT_SENSOR_WINDOW: Final = 300
+# Sweep intervals that failing sweeps back off to, at most, in event mode.
+SWEEP_FAILURE_BACKOFF: Final = 8
+
+# errorCodes the controller answers with once the session token is no longer valid
+SESSION_EXPIRED_ERROR_CODES: Final = frozenset({-1005, -1200})
 
 CONF_DETECTION_TIME: Final = "detection_time"
+CONF_SITES: Final = "sites"
+CONF_SITE_SCAN_INTERVALS: Final = "site_scan_intervals"
+CONF_SITE_CONCURRENCY: Final = "site_concurrency"
+CONF_MIN_SCAN_INTERVAL: Final = "min_scan_interval"
+CONF_MAX_SCAN_INTERVAL: Final = "max_scan_interval"
+CONF_EVENT_MODE: Final = "event_mode"
+CONF_SWEEP_INTERVAL: Final = "sweep_interval"
+CONF_WEBHOOK_ID: Final = "webhook_id"
+CONF_CONNECT_TIMEOUT: Final = "connect_timeout"
+CONF_READ_TIMEOUT: Final = "read_timeout"
+CONF_ATTRIBUTE_THRESHOLDS: Final = "attribute_thresholds"
+CONF_ATTRIBUTE_MIN_INTERVAL: Final = "attribute_min_interval"
+CONF_EXCLUDED_ATTRIBUTES: Final = "excluded_attributes"
+CONF_HISTORY_SAMPLES: Final = "history_samples"
+CONF_THROUGHPUT_SENSORS: Final = "throughput_sensors"
+CONF_REQUEST_RATE: Final = "request_rate"
+CONF_MAX_IN_FLIGHT: Final = "max_in_flight"
+CONF_PRESENCE_LOG: Final = "presence_log"
+
+SERVICE_GET_THROUGHPUT_HISTORY: Final = "get_throughput_history"
+SERVICE_PROFILE_REFRESH: Final = "profile_refresh"
+DEFAULT_PROFILE_REFRESHES: Final = 5
+MAX_PROFILE_REFRESHES: Final = 100
+SERVICE_GET_PRESENCE_TRANSITIONS: Final = "get_presence_transitions"
+DEFAULT_PRESENCE_QUERY_LIMIT: Final = 1000
+MAX_PRESENCE_QUERY_LIMIT: Final = 10000
+# Functions listed in a refresh profile's summary.
+PROFILE_TOP_FUNCTIONS: Final = 30
 
 ###########################################
 # From mikrotik module
@@ -55,3 +127,6 @@ ATTR_DEVICE_TRACKER: Final = [
     "txRate",
     "uptime",
 ]
+
+# Client fields that change on nearly every refresh.
+VOLATILE_ATTRIBUTES: Final = ("signalLevel", "snr", "rxRate", "txRate", "uptime")
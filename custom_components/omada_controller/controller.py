@@ -1,53 +1,372 @@
+import asyncio
+from collections.abc import AsyncIterator, Callable, Iterable
+from http import HTTPStatus
 import logging
-import requests
+import math
+import random
+import re
+import time
 
-from datetime import timedelta
+import aiohttp
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 from typing import Any
 from urllib.parse import urlparse
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_PASSWORD, CONF_URL, CONF_USERNAME, CONF_VERIFY_SSL
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
-from .const import CONF_DETECTION_TIME, DEFAULT_DETECTION_TIME, DOMAIN, NAME
-from .device import Device
-from .errors import CannotConnect, LoginError
+from .const import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_MAX_RESET_TIMEOUT,
+    BREAKER_RESET_TIMEOUT,
+    CLIENTS_PAGE_PREFETCH,
+    CLIENTS_PAGE_SIZE,
+    CONF_CONNECT_TIMEOUT,
+    CONF_DETECTION_TIME,
+    CONF_EVENT_MODE,
+    CONF_HISTORY_SAMPLES,
+    CONF_MAX_IN_FLIGHT,
+    CONF_MAX_SCAN_INTERVAL,
+    CONF_MIN_SCAN_INTERVAL,
+    CONF_READ_TIMEOUT,
+    CONF_SITE_CONCURRENCY,
+    CONF_SITE_SCAN_INTERVALS,
+    CONF_REQUEST_RATE,
+    CONF_SITES,
+    CONF_SWEEP_INTERVAL,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_DETECTION_TIME,
+    DEFAULT_HISTORY_SAMPLES,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DEFAULT_MIN_SCAN_INTERVAL,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_REQUEST_RATE,
+    DEFAULT_SITE_CONCURRENCY,
+    DEFAULT_SWEEP_INTERVAL,
+    DOMAIN,
+    NAME,
+    PROFILE_TOP_FUNCTIONS,
+    REQUEST_RETRIES,
+    RETRY_BACKOFF,
+    SESSION_EXPIRED_ERROR_CODES,
+    SWEEP_FAILURE_BACKOFF,
+)
+from .aggregates import Aggregates
+from .breaker import CircuitBreaker
+from .budget import PRIORITY_HIGH, PRIORITY_POLL, RequestBudget, async_get_budget
+from .cache import CachedDevice
+from .device import Device, DeviceChanges
+from .errors import CannotConnect, ControllerUnavailable, LoginError, RequestBudgetExceeded
+from .events import DISCONNECTED, ClientEvent
+from .expiry import ExpiryQueue
+from .history import ThroughputHistory
+from .metrics import ControllerMetrics
+from .parser import decode_clients_page, decode_json, fingerprint_clients
+from .policy import AttributeFilter
+from .presence import PresenceLog
+from .profiling import RefreshProfiler
+from .scheduler import AdaptiveInterval
 
 _LOGGER = logging.getLogger(__name__)
 
+_SITE_PATH = re.compile(r"/sites/[^/]+/")
+# Failures that say nothing about the request itself, so sending it again may work.
+_TRANSIENT_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+@dataclass
+class SiteClients:
+    """The clients collected from each of the controller's sites."""
+
+    clients: dict[str, list[dict[str, Any]]] = field(default_factory=dict)
+    errors: dict[str, Exception] = field(default_factory=dict)
+
 
 class OmadaController:
-    """Wrapper around the API on TP-Link's Omada Controller."""
+    """Async wrapper around the API on TP-Link's Omada Controller."""
 
-    def __init__(self, config: dict[str, Any]) -> None:
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        config: dict[str, Any],
+        budget: RequestBudget | None = None,
+    ) -> None:
         self.config = config
         self.url: str = self.config[CONF_URL]
         self.token: str | None = None
         self.site_id: str | None = None
         self.headers: dict[str, str] = {"Content-Type": "application/json"}
-        self.session: requests.Session = requests.Session()
-        self.session.verify = self.config[CONF_VERIFY_SSL]
+        self.session: aiohttp.ClientSession = session
+        connect_timeout = self.config.get(CONF_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT)
+        read_timeout = self.config.get(CONF_READ_TIMEOUT, DEFAULT_READ_TIMEOUT)
+        # The read timeout applies between reads, so the total bounds a slow trickle.
+        self.timeout = aiohttp.ClientTimeout(
+            total=connect_timeout + read_timeout,
+            sock_connect=connect_timeout,
+            sock_read=read_timeout,
+        )
+        self.breaker = CircuitBreaker(
+            BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT, BREAKER_MAX_RESET_TIMEOUT
+        )
+        self._probe: asyncio.Future[bool] | None = None
+        self.budget = budget or RequestBudget(
+            self.config.get(CONF_REQUEST_RATE, DEFAULT_REQUEST_RATE),
+            self.config.get(CONF_MAX_IN_FLIGHT, DEFAULT_MAX_IN_FLIGHT),
+        )
+        self._rng = random.Random()
         self.sites: dict[str, str] = {}
-        self.controller_id: str = self.get_info()["omadacId"]
+        self.controller_id: str | None = None
+        self.info: dict[str, Any] | None = None
+        self.max_concurrent_sites: int = self.config.get(
+            CONF_SITE_CONCURRENCY, DEFAULT_SITE_CONCURRENCY
+        )
+        self._reauth: asyncio.Future[None] | None = None
+        self.metrics = ControllerMetrics()
+        # Sites tracked by each config entry using this client; None means all.
+        self.subscriptions: dict[str, frozenset[str] | None] = {}
+
+    def _endpoint(self, url: str) -> str:
+        """Return the metrics label for a URL, without ids or query."""
+        path = url[len(self.url) :].partition("?")[0]
+        if self.controller_id:
+            path = path.replace(f"/{self.controller_id}/", "/", 1)
+        return _SITE_PATH.sub("/sites/{site}/", path)
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        decode: Callable[[bytes], Any] = decode_json,
+        priority: int = PRIORITY_HIGH,
+        **kwargs: Any,
+    ) -> dict[str, Any]:
+        """Perform a request on the pooled session and decode the JSON body.
+
+        GETs that fail in transport, time out or get a server error are sent
+        again up to REQUEST_RETRIES times, each after a random delay of up to
+        twice the previous one. Requests that still fail count towards the
+        circuit breaker, and while it is open they fail straight away.
+        """
+        await self._async_check_breaker()
+        retries = REQUEST_RETRIES if method == "GET" else 0
+        attempt = 0
+        while True:
+            try:
+                body = await self._send(method, url, priority, **kwargs)
+            except _TRANSIENT_ERRORS:
+                if attempt >= retries or not self.breaker.closed:
+                    self._record_failure()
+                    raise
+                self.metrics.request_retries += 1
+                await asyncio.sleep(self._rng.uniform(0, RETRY_BACKOFF * 2**attempt))
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            with self.metrics.time_stage("decode"):
+                return decode(body)
+
+    async def _send(
+        self, method: str, url: str, priority: int = PRIORITY_HIGH, **kwargs: Any
+    ) -> bytes:
+        """Send one request within the budget and return the body.
 
-    def get_info(self) -> dict[str, Any]:
-        """Get controller info."""
+        Raises on a server error, and with ``RequestBudgetExceeded`` when too
+        many polls are already waiting for the budget.
+        """
+        async with self.budget.slot(priority):
+            start = time.perf_counter()
+            try:
+                async with self.session.request(
+                    method, url, headers=self.headers, timeout=self.timeout, **kwargs
+                ) as response:
+                    if response.status >= HTTPStatus.INTERNAL_SERVER_ERROR:
+                        response.raise_for_status()
+                    body = await response.read()
+            except Exception:
+                self.metrics.request_errors += 1
+                raise
+        self.metrics.record_request(
+            self._endpoint(url), (time.perf_counter() - start) * 1000, len(body)
+        )
+        return body
+
+    def _record_failure(self) -> None:
+        if self.breaker.record_failure():
+            self.metrics.breaker_trips += 1
+            _LOGGER.warning(
+                "Omada Controller %s keeps failing, holding requests back for %s seconds",
+                self.url,
+                self.breaker.reset_timeout,
+            )
+
+    async def _async_check_breaker(self) -> None:
+        """Fail fast while the breaker is open, probing once the controller may be back.
+
+        Concurrent callers share a single probe, and go ahead if it succeeds.
+        """
+        if self.breaker.closed:
+            return
+        if self._probe is None and self.breaker.probe_due:
+            self._probe = asyncio.ensure_future(self._async_probe())
+            self._probe.add_done_callback(self._async_probe_done)
+        if self._probe is None or not await asyncio.shield(self._probe):
+            self.metrics.requests_rejected += 1
+            raise ControllerUnavailable
+
+    async def _async_probe(self) -> bool:
+        """Check whether the controller answers its cheapest request again."""
         try:
-            return self.session.get(f"{self.url}/api/info").json()["result"]
+            response = decode_json(await self._send("GET", f"{self.url}/api/info"))
+            healthy = isinstance(response, dict) and response.get("errorCode") == 0
+        except Exception:  # pylint: disable=broad-except
+            healthy = False
+        if healthy:
+            _LOGGER.info("Omada Controller %s is answering again", self.url)
+            self.breaker.record_success()
+        else:
+            self.breaker.probe_failed()
+        return healthy
+
+    @callback
+    def _async_probe_done(self, future: asyncio.Future[bool]) -> None:
+        self._probe = None
+        if not future.cancelled():
+            future.exception()
+
+    async def _api_request(
+        self,
+        method: str,
+        path: str,
+        params: dict[str, Any] | None = None,
+        decode: Callable[[bytes], Any] = decode_json,
+        priority: int = PRIORITY_HIGH,
+        **kwargs: Any,
+    ) -> dict[str, Any]:
+        """Perform an authenticated request against the controller's v2 API.
+
+        If the controller reports an expired session, or answers with something
+        other than JSON (usually the login page), the session is renewed once
+        and the request retried.
+        """
+        for retried in (False, True):
+            token = self.token
+            url = f"{self.url}/{self.controller_id}/api/v2/{path}"
+            try:
+                response = await self._request(
+                    method,
+                    url,
+                    decode,
+                    priority,
+                    params={**(params or {}), "token": token},
+                    **kwargs,
+                )
+            except ValueError:
+                response = None
+            except (ControllerUnavailable, RequestBudgetExceeded):
+                raise
+            except Exception as error:
+                _LOGGER.error("Omada Controller %s error: %s", self.url, error)
+                raise CannotConnect from error
+
+            if not isinstance(response, dict):
+                error_code = None
+            else:
+                error_code = response.get("errorCode")
+                if error_code == 0:
+                    return response
+                if error_code not in SESSION_EXPIRED_ERROR_CODES:
+                    _LOGGER.error(
+                        "Omada Controller %s %s error - errorCode: %s", self.url, path, error_code
+                    )
+                    raise CannotConnect
+            if retried:
+                break
+            _LOGGER.debug("Omada Controller %s session expired (errorCode: %s)", self.url, error_code)
+            await self._async_reauthenticate(token)
+
+        _LOGGER.error("Omada Controller %s session could not be renewed", self.url)
+        raise CannotConnect
+
+    async def _async_reauthenticate(self, token: str | None) -> None:
+        """Renew the session that ``token`` belonged to.
+
+        Concurrent callers share a single attempt, and callers whose token has
+        already been replaced return straight away.
+        """
+        if self.token != token:
+            return
+        await asyncio.shield(self._async_start_renewal())
+
+    @callback
+    def _async_start_renewal(self) -> asyncio.Future[None]:
+        """Return the running session renewal, starting one if there is none."""
+        if self._reauth is None:
+            self._reauth = asyncio.ensure_future(self._async_renew_session())
+            self._reauth.add_done_callback(self._async_reauth_done)
+        return self._reauth
+
+    @callback
+    def _async_reauth_done(self, future: asyncio.Future[None]) -> None:
+        """Allow a later expiry to start a new attempt."""
+        self._reauth = None
+        if not future.cancelled():
+            future.exception()
+
+    async def _async_renew_session(self) -> None:
+        """Probe the session, logging in again only if it is no longer valid."""
+        if await self.is_logged_in():
+            return
+        if self.token is not None:
+            _LOGGER.info("Omada Controller %s session expired, logging in again", self.url)
+        await self.login()
+
+    async def is_logged_in(self) -> bool:
+        """Return whether the current token still has a valid session."""
+        if self.token is None:
+            return False
+        url = f"{self.url}/{self.controller_id}/api/v2/loginStatus"
+        try:
+            response = await self._request("GET", url, params={"token": self.token})
+            return bool(response["result"]["login"])
+        except Exception:  # pylint: disable=broad-except
+            return False
+
+    async def get_info(self) -> dict[str, Any]:
+        """Get controller info, which is only requested once per client."""
+        if self.info is not None:
+            return self.info
+        try:
+            info = (await self._request("GET", f"{self.url}/api/info"))["result"]
         except Exception as error:
             _LOGGER.error("Omada Controller %s error: %s", self.url, error)
             raise CannotConnect from error
+        self.controller_id = info["omadacId"]
+        self.info = info
+        return info
 
-    def login(self) -> None:
+    async def login(self) -> None:
         """Log into the API annd collecto the authentication token."""
+        with self.metrics.time_stage("login"):
+            await self._login()
+
+    async def _login(self) -> None:
+        if self.controller_id is None:
+            await self.get_info()
+
         url = f"{self.url}/api/v2/login"
         username: str = self.config[CONF_USERNAME]
         password: str = self.config[CONF_PASSWORD]
         data: dict[str, str] = {"username": username, "password": password}
         try:
-            response = self.session.post(url, json=data, headers=self.headers).json()
+            response = await self._request("POST", url, json=data)
         except Exception as error:
             _LOGGER.error("Omada Controller %s error: %s", self.url, error)
             raise CannotConnect from error
@@ -58,44 +377,177 @@ class OmadaController:
         self.token = response["result"]["token"]
         self.headers["Csrf-Token"] = self.token
 
-        url = f"{self.url}/{self.controller_id}/api/v2/loginStatus?token={self.token}"
-        try:
-            self.session.get(url, headers=self.headers).json()
-        except requests.exceptions.JSONDecodeError as error:
+        # The session check and the user's sites don't depend on each other.
+        status, user_response = await asyncio.gather(
+            self._request(
+                "GET", f"{self.url}/{self.controller_id}/api/v2/loginStatus?token={self.token}"
+            ),
+            self._request(
+                "GET",
+                f"{self.url}/{self.controller_id}/api/v2/users/current"
+                f"?token={self.token}&currentPage=1&currentPageSize=1000",
+            ),
+            return_exceptions=True,
+        )
+        if isinstance(status, ValueError):
             _LOGGER.error("Omada Controller %s login error", self.url)
-            raise LoginError from error
+            raise LoginError from status
+        for error in (status, user_response):
+            if isinstance(error, Exception):
+                _LOGGER.error("Omada Controller %s error: %s", self.url, error)
+                raise CannotConnect from error
+        self.sites = {s["name"]: s["key"] for s in user_response["result"]["privilege"]["sites"]}
 
-        url = (
-            f"{self.url}/{self.controller_id}/api/v2/users/current"
-            f"?token={self.token}&currentPage=1&currentPageSize=1000"
+    async def _get_clients_page(self, site_id: str, page: int) -> dict[str, Any]:
+        """Return one page of the active clients at the given site."""
+        params = {
+            "currentPage": page,
+            "currentPageSize": CLIENTS_PAGE_SIZE,
+            "filters.active": "true",
+        }
+        response = await self._api_request(
+            "GET", f"sites/{site_id}/clients", params, decode_clients_page, PRIORITY_POLL
         )
         try:
-            user_response = self.session.get(url, headers=self.headers).json()
-        except Exception as error:
+            return response["result"]
+        except KeyError as error:
             _LOGGER.error("Omada Controller %s error: %s", self.url, error)
             raise CannotConnect from error
-        self.sites = {s["name"]: s["key"] for s in user_response["result"]["privilege"]["sites"]}
 
-    def get_clients_at_site(self, site_name) -> list[dict[str, str]]:
-        """Return the list of clients at the givven site."""
+    async def iter_clients_at_site(self, site_name: str) -> AsyncIterator[list[dict[str, Any]]]:
+        """Yield the clients at the given site one page at a time.
+
+        The first page tells us ``totalRows``; the remaining pages are then
+        fetched concurrently, at most CLIENTS_PAGE_PREFETCH at a time, and
+        yielded in whatever order they arrive.
+        """
         site_id = self.sites[site_name]
-        url = (
-            f"{self.url}/{self.controller_id}/api/v2/sites/{site_id}/clients"
-            f"?token={self.token}&currentPage=1&currentPageSize=1000&filters.active=true"
-        )
+        first = await self._get_clients_page(site_id, 1)
+        yield first["data"]
+
+        pages = math.ceil(first.get("totalRows", 0) / CLIENTS_PAGE_SIZE)
+        next_page = 2
+        pending: set[asyncio.Task[dict[str, Any]]] = set()
         try:
-            return self.session.get(url, headers=self.headers).json()["result"]["data"]
-        except Exception as error:
-            _LOGGER.error("Omada Controller %s error: %s", self.url, error)
-            raise CannotConnect from error
+            while next_page <= pages or pending:
+                while next_page <= pages and len(pending) < CLIENTS_PAGE_PREFETCH:
+                    pending.add(asyncio.create_task(self._get_clients_page(site_id, next_page)))
+                    next_page += 1
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()["data"]
+        finally:
+            for task in pending:
+                task.cancel()
 
-    def get_all_clients(self) -> list[dict[str, str]]:
-        """Return a list of all clients on this controller."""
+    async def get_clients_at_site(self, site_name: str) -> list[dict[str, Any]]:
+        """Return the list of clients at the givven site."""
         clients = []
-        for site in self.sites:
-            clients += self.get_clients_at_site(site)
+        async for page in self.iter_clients_at_site(site_name):
+            clients += page
         return clients
 
+    async def iter_all_clients(
+        self,
+        errors: dict[str, Exception],
+        sites: Iterable[str] | None = None,
+        site_ends: bool = False,
+    ) -> AsyncIterator[tuple[str, list[dict[str, Any]] | None]]:
+        """Yield ``(site, page)`` pairs from the given sites as the pages arrive.
+
+        Sites (all of them by default) are fetched concurrently, at most
+        ``max_concurrent_sites`` at a time. Sites that fail are recorded in
+        ``errors`` without interrupting the others; an error is only raised
+        when every site failed, not counting those deferred because the request
+        budget was exhausted. With ``site_ends``, ``(site, None)`` follows
+        the last page of each site, or its failure.
+        """
+        sites = list(self.sites if sites is None else sites)
+        semaphore = asyncio.Semaphore(self.max_concurrent_sites)
+        queue: asyncio.Queue[tuple[str, list[dict[str, Any]] | None]] = asyncio.Queue(
+            self.max_concurrent_sites
+        )
+
+        async def fetch(site: str) -> None:
+            async with semaphore:
+                try:
+                    async for page in self.iter_clients_at_site(site):
+                        await queue.put((site, page))
+                except Exception as error:  # pylint: disable=broad-except
+                    errors[site] = error
+            await queue.put((site, None))
+
+        tasks = [asyncio.create_task(fetch(site)) for site in sites]
+        remaining = len(tasks)
+        try:
+            while remaining:
+                site, page = await queue.get()
+                if page is None:
+                    remaining -= 1
+                    if not site_ends:
+                        continue
+                yield site, page
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        failures = [
+            error for error in errors.values() if not isinstance(error, RequestBudgetExceeded)
+        ]
+        if failures and len(failures) == len(sites) - (len(errors) - len(failures)):
+            error = failures[0]
+            if isinstance(error, LoginError):
+                raise error
+            raise CannotConnect from error
+
+    async def get_all_clients(self, sites: Iterable[str] | None = None) -> SiteClients:
+        """Return the clients of the given sites, or all of them, fetched concurrently.
+
+        This collects what ``iter_all_clients`` yields, for callers that want
+        every client at once rather than processing the pages as they arrive.
+        """
+        result = SiteClients()
+        async for site, page in self.iter_all_clients(result.errors, sites):
+            result.clients.setdefault(site, []).extend(page)
+        return result
+
+    async def async_ensure_logged_in(self) -> None:
+        """Log in unless there is a session already, sharing concurrent attempts."""
+        if self.token is None:
+            await self._async_reauthenticate(None)
+
+    @callback
+    def async_begin_login(self) -> None:
+        """Start logging in, if there is no session, without waiting for it.
+
+        A later ``async_ensure_logged_in`` joins the login in flight.
+        """
+        if self.token is None:
+            self._async_start_renewal()
+
+    @callback
+    def async_close(self) -> None:
+        """Detach the client's session from the connector it shares."""
+        self.session.detach()
+
+
+@callback
+def async_create_controller(hass: HomeAssistant, config: dict[str, Any]) -> OmadaController:
+    """Create an API client that shares Home Assistant's pooled connector.
+
+    The client gets its own cookie jar, since the controller session cookie must
+    not leak between controllers and is usually issued for a bare IP address.
+    The session outlives any one config entry, as entries may share the
+    client, so whoever holds the client last calls ``async_close``.
+    """
+    session = async_create_clientsession(
+        hass,
+        verify_ssl=config[CONF_VERIFY_SSL],
+        auto_cleanup=False,
+        cookie_jar=aiohttp.CookieJar(unsafe=True),
+    )
+    return OmadaController(session, config, async_get_budget(hass, config))
+
 
 class OmadaControllerData:
     """Tracks the devices attached to the sites managed by the Omada Controller."""
@@ -103,36 +555,375 @@ class OmadaControllerData:
     def __init__(self, api: OmadaController) -> None:
         self.api = api
         self.devices: dict[str, Device] = {}
+        self.site_errors: dict[str, Exception] = {}
+        self.changes = DeviceChanges()
+        self._refreshing = False
+        # Whether ``changes`` holds changes merged into a refresh that the
+        # listeners have not been given yet.
+        self._undelivered = False
+        self.detection_time: float = DEFAULT_DETECTION_TIME
+        self.site_filter: frozenset[str] | None = None
+        # Holds back small changes to volatile attributes; None shows every change.
+        self.attribute_filter: AttributeFilter | None = None
+        # Throughput samples kept per device; 0 keeps no history.
+        self.history_samples = 0
+        self.history: dict[str, ThroughputHistory] = {}
+        self.aggregates = Aggregates()
+        # Seconds between fetches of a site; sites not listed are fetched every refresh.
+        self.site_intervals: dict[str, float] = {}
+        self._next_fetch: dict[str, float] = {}
+        # The fingerprint and clients of each site's last processed fetch, and
+        # when a fetch last found it unchanged. Clients that events place at a
+        # site join its clients until the next fetch.
+        self._fingerprints: dict[str, int] = {}
+        self._site_macs: dict[str, set[str]] = {}
+        self._site_verified: dict[str, float] = {}
+        self._present: set[str] = set()
+        self._expiries = ExpiryQueue()
+        self._sites: set[str] = set()
         self.hostname: str = urlparse(api.url).netloc
         self.model: str = ""
         self.firmware: str = ""
         self.serial_number: str = ""
 
-    def get_controller_details(self) -> None:
-        """Get what little details can be retrieved about the controller."""
-        info = self.api.get_info()
+    async def get_controller_details(self) -> None:
+        """Get what little details can be retrieved about the controller.
+
+        The info fetched on login is reused, so this only makes a request
+        when the client has not logged in yet.
+        """
+        info = await self.api.get_info()
         self.model: str = info["type"]
         self.firmware: str = info["controllerVer"]
         self.serial_number: str = self.api.controller_id
 
-    def update_devices(self):
-        """Update the state for the devices tracked here."""
+    @property
+    def details(self) -> dict[str, str]:
+        """Return the controller details, as kept in the device cache."""
+        return {
+            "hostname": self.hostname,
+            "model": self.model,
+            "firmware": self.firmware,
+            "serial_number": self.serial_number,
+        }
+
+    def restore(self, details: dict[str, str], devices: dict[str, CachedDevice]) -> None:
+        """Seed the controller details and devices from the cache of an earlier run.
+
+        The restored devices are recorded as added, and the next refresh
+        reconciles them with what the controller reports. Connected devices
+        the controller no longer lists go away once their detection time has
+        passed, as usual.
+        """
+        self.hostname = details.get("hostname", self.hostname)
+        self.model = details.get("model", self.model)
+        self.firmware = details.get("firmware", self.firmware)
+        self.serial_number = details.get("serial_number", self.serial_number)
+        self.changes = DeviceChanges()
+        for mac, cached in devices.items():
+            self.devices[mac] = cached.to_device(mac, self.attribute_filter)
+            if cached.connected:
+                self._present.add(mac)
+                self._site_macs.setdefault(cached.site, set()).add(mac)
+                self._count_client(mac, cached.site, cached.params)
+            self.changes.added.add(mac)
+
+    @property
+    def sites(self) -> list[str]:
+        """Return the names of the controller's sites tracked here."""
+        if self.site_filter is None:
+            return list(self.api.sites)
+        return [site for site in self.api.sites if site in self.site_filter]
+
+    def due_sites(self, sites: list[str], now: float) -> list[str]:
+        """Return the sites whose poll interval has passed since they were last fetched."""
+        return [site for site in sites if self._next_fetch.get(site, 0.0) <= now]
+
+    @property
+    def metrics(self) -> ControllerMetrics:
+        """Return the metrics of the controller."""
+        return self.api.metrics
+
+    @property
+    def refreshing(self) -> bool:
+        """Return whether a refresh is fetching the sites."""
+        return self._refreshing
+
+    def changes_delivered(self) -> None:
+        """Note that the listeners were given ``changes``, so the next batch starts afresh."""
+        self._undelivered = False
+
+    def _begin_changes(self) -> None:
+        """Start the batch of changes of something other than a refresh.
+
+        A refresh may be paused at a fetch, with part of its changes already
+        recorded. Changes made meanwhile join the refresh's batch, which the
+        listeners are given once the refresh is done, and a batch they have
+        not been given yet is kept.
+        """
+        if self._refreshing:
+            self._undelivered = True
+        elif not self._undelivered:
+            self.changes = DeviceChanges()
+
+    async def async_update_devices(self) -> None:
+        """Stream the clients from the controller into the tracked devices.
+
+        Only the sites that are due are fetched; the devices on the others
+        are left as they are until their site's next fetch. A site whose
+        clients match the previous fetch in every fingerprinted field is not
+        processed at all.
+        """
+        errors: dict[str, Exception] = {}
+        seen: set[str] = set()
+        missing: set[str] = set()
+        clients_per_site: dict[str, int] = {}
+        site_pages: dict[str, list[list[dict[str, Any]]]] = {}
+        fingerprints: dict[str, int] = {}
+        processing = 0.0
+        start = time.perf_counter()
+        if not self._undelivered:
+            self.changes = DeviceChanges()
+        self._refreshing = True
         try:
-            clients = self.api.get_all_clients()
+            await self.api.async_ensure_logged_in()
+            sites = self.sites
+            due = self.due_sites(sites, time.monotonic())
+            async for site, page in self.api.iter_all_clients(errors, due, site_ends=True):
+                page_start = time.perf_counter()
+                if page is not None:
+                    site_pages.setdefault(site, []).append(page)
+                    fingerprints[site] = fingerprints.get(site, 0) + fingerprint_clients(page)
+                    clients_per_site[site] = clients_per_site.get(site, 0) + len(page)
+                elif site not in errors:
+                    self._update_site(
+                        site, site_pages.pop(site, []), fingerprints.pop(site, 0), seen, missing
+                    )
+                else:
+                    site_pages.pop(site, None)
+                processing += time.perf_counter() - page_start
         except CannotConnect as err:
             raise UpdateFailed from err
         except LoginError as err:
             raise ConfigEntryAuthFailed from err
+        finally:
+            self._refreshing = False
+        for site, error in errors.items():
+            if isinstance(error, RequestBudgetExceeded):
+                # Left due, so it is fetched again on the next refresh.
+                _LOGGER.debug(
+                    "Omada Controller %s deferred site %s, its request budget is exhausted",
+                    self.api.url,
+                    site,
+                )
+                continue
+            _LOGGER.warning(
+                "Omada Controller %s failed to update site %s: %s", self.api.url, site, error
+            )
+        self.site_errors = errors
+        page_start = time.perf_counter()
+        fetched = set(due) - set(errors)
+        now = time.monotonic()
+        for site in fetched:
+            if interval := self.site_intervals.get(site):
+                self._next_fetch[site] = now + interval
+        if self._sites != set(sites):
+            self._sites = set(sites)
+            self._remove_devices(self._sites)
+        self._schedule_expiries(fetched, seen, missing, time.time())
+
+        end = time.perf_counter()
+        metrics = self.metrics
+        metrics.record_stage("update_devices", (processing + end - page_start) * 1000)
+        metrics.record_stage("refresh", (end - start) * 1000)
+        previous = metrics.clients_per_site
+        metrics.clients_per_site = {
+            site: clients_per_site.get(site, previous.get(site, 0)) for site in sites
+        }
+        metrics.devices_added += len(self.changes.added)
+        metrics.devices_removed += len(self.changes.removed)
+
+    def _update_site(
+        self,
+        site: str,
+        pages: list[list[dict[str, Any]]],
+        fingerprint: int,
+        seen: set[str],
+        missing: set[str],
+    ) -> None:
+        """Update the devices from every page of a site, unless nothing tracked changed.
 
-        for device in self.devices.values():
-            device.connected = False
+        When the fingerprint matches, the site's clients are the ones it had
+        last time with the same fingerprinted fields, so they are only noted
+        as seen. Their volatile attributes keep the values of the last fetch
+        that did change something. Otherwise the site's clients that the
+        fetch no longer lists are added to ``missing``.
+        """
+        unchanged = self._fingerprints.get(site) == fingerprint
+        self.metrics.record_fingerprint(site, unchanged)
+        if self.history_samples:
+            now = time.time()
+            for page in pages:
+                self._record_history(page, now)
+        if unchanged:
+            # The rates aren't fingerprinted, so the sums still take the new ones.
+            for page in pages:
+                for client in page:
+                    self._count_client(client["mac"], site, client)
+            seen.update(self._site_macs[site])
+            self._site_verified[site] = time.time()
+            return
+        macs: set[str] = set()
+        for page in pages:
+            macs.update(client["mac"] for client in page)
+            self._update_clients(site, page, seen)
+        missing.update(self._site_macs.get(site, set()) - macs)
+        self._fingerprints[site] = fingerprint
+        self._site_macs[site] = macs
 
+    def _invalidate_fingerprint(self, site: str | None) -> None:
+        """Make the next fetch of a site process it in full."""
+        self._fingerprints.pop(site, None)
+
+    def apply_events(self, events: Iterable[ClientEvent]) -> None:
+        """Update the devices from client events pushed by the controller.
+
+        Connecting and roaming clients are marked present with the fields the
+        event carries; the next fetch of their site fills in the rest. A
+        disconnect starts the usual consider-home countdown from the time of
+        the event. What changed is recorded in a fresh ``changes``, or in
+        those of the refresh in progress.
+        """
+        self._begin_changes()
+        sites = set(self.sites)
+        for event in events:
+            if event.site not in sites:
+                continue
+            mac = event.mac
+            device = self.devices.get(mac)
+            self._invalidate_fingerprint(event.site)
+            if event.kind == DISCONNECTED:
+                if device is not None and mac in self._present:
+                    self._present.discard(mac)
+                    self._expiries.schedule(mac, event.timestamp + self.detection_time)
+                continue
+            params = {**(device.params() if device else {}), **event.params}
+            params["lastSeen"] = int(event.timestamp * 1000)
+            self._update_clients(event.site, [{**params, "mac": mac}], set())
+            self._site_macs.setdefault(event.site, set()).add(mac)
+        self._expire_due(time.time())
+
+    def _update_clients(self, site: str, clients: list[dict[str, Any]], seen: set[str]) -> None:
+        """Update the devices for a batch of clients reported at a site."""
+        attribute_filter = self.attribute_filter
+        now = time.monotonic()
         for client in clients:
             mac = client["mac"]
-            if mac in self.devices:
-                self.devices[mac].update(client)
-            else:
-                self.devices[mac] = Device(mac, client)
+            seen.add(mac)
+            self._present.add(mac)
+            self._expiries.cancel(mac)
+            self._count_client(mac, site, client)
+            device = self.devices.get(mac)
+            if device is None:
+                self.devices[mac] = Device(mac, client, site, attribute_filter)
+                self.changes.added.add(mac)
+                continue
+            if not device.connected:
+                self.changes.connected.add(mac)
+            if device.update(client, site, attribute_filter, now):
+                self.changes.updated.add(mac)
+
+    def _count_client(self, mac: str, site: str | None, client: dict[str, Any]) -> None:
+        """Count a connected client in the aggregates of its site, AP and SSID."""
+        self.aggregates.update(
+            mac,
+            site,
+            client.get("apName"),
+            client.get("ssid"),
+            client.get("rxRate"),
+            client.get("txRate"),
+        )
+
+    def _record_history(self, clients: list[dict[str, Any]], now: float) -> None:
+        """Add a throughput sample of each client to its history."""
+        history = self.history
+        for client in clients:
+            if (samples := history.get(mac := client["mac"])) is None:
+                samples = history[mac] = ThroughputHistory(self.history_samples)
+            samples.append(
+                now,
+                client.get("rxRate"),
+                client.get("txRate"),
+                client.get("trafficDown"),
+                client.get("trafficUp"),
+            )
+
+    def _schedule_expiries(
+        self, sites: set[str], seen: set[str], missing: set[str], now: float
+    ) -> None:
+        """Start the consider-home countdown of devices missing from fully read sites.
+
+        A device stays connected until ``detection_time`` after it was last
+        seen. Only the devices that a site's fetch no longer lists are looked
+        at, unless another site listed them in the same refresh.
+        """
+        for mac in missing - seen:
+            if mac not in self._present:
+                continue
+            device = self.devices[mac]
+            if device.site not in sites:
+                continue
+            self._present.discard(mac)
+            last_seen = device.last_seen
+            start = last_seen.timestamp() if last_seen else now
+            start = max(start, self._site_verified.get(device.site, 0.0))
+            self._expiries.schedule(mac, start + self.detection_time)
+        self._expire_due(now)
+
+    @property
+    def next_expiry(self) -> float | None:
+        """Return when the next consider-home deadline falls, as a timestamp."""
+        return self._expiries.next_deadline
+
+    def expire_due(self, now: float) -> None:
+        """Disconnect the devices whose consider-home deadline has passed.
+
+        What changed is recorded in a fresh ``changes``, or in those of the
+        refresh in progress.
+        """
+        self._begin_changes()
+        self._expire_due(now)
+
+    def _expire_due(self, now: float) -> None:
+        for mac in self._expiries.pop_due(now):
+            device = self.devices.get(mac)
+            if device is not None and device.connected:
+                device.connected = False
+                self.changes.disconnected.add(mac)
+                self.aggregates.discard(mac)
+                self._invalidate_fingerprint(device.site)
+
+    def _remove_devices(self, sites: set[str]) -> None:
+        """Stop tracking devices on sites the controller no longer gives us."""
+        for mac in [mac for mac, device in self.devices.items() if device.site not in sites]:
+            self.devices.pop(mac).connected = False
+            self.history.pop(mac, None)
+            self.aggregates.discard(mac)
+            self._present.discard(mac)
+            self._expiries.cancel(mac)
+            self.changes.removed.add(mac)
+        for site in [site for site in self._fingerprints if site not in sites]:
+            self._invalidate_fingerprint(site)
+
+
+def entry_sites(config_entry: ConfigEntry) -> list[str] | None:
+    """Return the sites an entry tracks, or None when it tracks all of them.
+
+    The sites chosen in the options replace those chosen when the entry
+    was created.
+    """
+    sites = config_entry.options.get(CONF_SITES, config_entry.data.get(CONF_SITES))
+    return sites or None
 
 
 class OmadaControllerDataUpdateCoordinator(DataUpdateCoordinator[None]):
@@ -148,12 +939,50 @@ class OmadaControllerDataUpdateCoordinator(DataUpdateCoordinator[None]):
         self.hass = hass
         self.config_entry: ConfigEntry = config_entry
         self._oc_data = OmadaControllerData(api)
+        if config_entry.options.get(CONF_EVENT_MODE):
+            # Pushed events keep the devices current; polls only catch missed events.
+            sweep = timedelta(
+                seconds=config_entry.options.get(CONF_SWEEP_INTERVAL, DEFAULT_SWEEP_INTERVAL)
+            )
+            # Failed sweeps still back off, beyond the sweep interval.
+            self._scheduler = AdaptiveInterval(
+                sweep, sweep, failure_maximum=sweep * SWEEP_FAILURE_BACKOFF
+            )
+        else:
+            self._scheduler = AdaptiveInterval(
+                timedelta(
+                    seconds=config_entry.options.get(
+                        CONF_MIN_SCAN_INTERVAL, DEFAULT_MIN_SCAN_INTERVAL
+                    )
+                ),
+                timedelta(
+                    seconds=config_entry.options.get(
+                        CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL
+                    )
+                ),
+            )
+        self._oc_data.detection_time = self.option_detection_time.total_seconds()
+        self._oc_data.attribute_filter = AttributeFilter.from_options(config_entry.options)
+        self._oc_data.history_samples = config_entry.options.get(
+            CONF_HISTORY_SAMPLES, DEFAULT_HISTORY_SAMPLES
+        )
+        if sites := entry_sites(config_entry):
+            self._oc_data.site_filter = frozenset(sites)
+        self._oc_data.site_intervals = {
+            site: float(seconds)
+            for site, seconds in config_entry.options.get(CONF_SITE_SCAN_INTERVALS, {}).items()
+        }
+        self._unsub_expiry: CALLBACK_TYPE | None = None
+        # Set only while refreshes are being profiled.
+        self.profiler: RefreshProfiler | None = None
+        # Set when the entry logs presence transitions.
+        self.presence_log: PresenceLog | None = None
         conf_name = self.config_entry.data[NAME]
         super().__init__(
             self.hass,
             _LOGGER,
             name=f"{DOMAIN} - {conf_name}",
-            update_interval=timedelta(seconds=10),
+            update_interval=self._scheduler.interval,
         )
 
     @property
@@ -196,5 +1025,108 @@ class OmadaControllerDataUpdateCoordinator(DataUpdateCoordinator[None]):
         return self._oc_data
 
     async def _async_update_data(self) -> None:
-        """Update devices information."""
-        await self.hass.async_add_executor_job(self._oc_data.update_devices)
+        """Update the devices under the profiler, if one is set."""
+        if (profiler := self.profiler) is None:
+            await self._async_update_devices()
+            return
+        try:
+            with profiler.refresh():
+                await self._async_update_devices()
+        finally:
+            if profiler.finished and self.profiler is profiler:
+                self.profiler = None
+                self.hass.async_create_background_task(
+                    self._async_finish_profiling(profiler), f"{self.name} profile"
+                )
+
+    async def _async_update_devices(self) -> None:
+        """Update devices information and pick the interval to the next refresh."""
+        start = time.monotonic()
+        try:
+            await self._oc_data.async_update_devices()
+        except Exception:
+            self.update_interval = self._scheduler.failure()
+            raise
+        changes = self._oc_data.changes
+        churn = len(changes.added | changes.removed | changes.connected | changes.disconnected)
+        self.update_interval = self._scheduler.success(
+            churn, len(self._oc_data.devices), time.monotonic() - start
+        )
+        self._async_schedule_expiry()
+
+    @callback
+    def async_start_profiling(self, refreshes: int) -> RefreshProfiler:
+        """Profile the next refreshes, replacing any profiling in progress."""
+        if self.profiler is not None:
+            self.profiler.done.cancel()
+        self.profiler = RefreshProfiler(refreshes)
+        return self.profiler
+
+    async def _async_finish_profiling(self, profiler: RefreshProfiler) -> None:
+        """Write the profile to the config directory, logging where it went."""
+        path = self.hass.config.path(
+            f"{DOMAIN}.profile.{self.config_entry.entry_id}.{time.time()}"
+        )
+        try:
+            result = await self.hass.async_add_executor_job(
+                profiler.write, path, PROFILE_TOP_FUNCTIONS
+            )
+        except OSError as error:
+            _LOGGER.error("Could not write the refresh profile to %s: %s", path, error)
+            profiler.done.cancel()
+            return
+        _LOGGER.info(
+            "Profile of %s refreshes of %s written to %s",
+            result["refreshes"],
+            self.hostname,
+            result["profile"],
+        )
+        if not profiler.done.done():
+            profiler.done.set_result(result)
+
+    @callback
+    def async_handle_events(self, events: list[ClientEvent]) -> None:
+        """Apply client events pushed by the controller between refreshes."""
+        self._oc_data.metrics.events_received += len(events)
+        self._oc_data.apply_events(events)
+        # A refresh in progress gives the listeners the changes once it is done.
+        if self._oc_data.changes and not self._oc_data.refreshing:
+            self.async_update_listeners()
+        self._async_schedule_expiry()
+
+    @callback
+    def _async_schedule_expiry(self) -> None:
+        """Wake up at the next consider-home deadline, between refreshes if need be."""
+        if self._unsub_expiry:
+            self._unsub_expiry()
+            self._unsub_expiry = None
+        if (deadline := self._oc_data.next_expiry) is not None:
+            self._unsub_expiry = async_call_later(
+                self.hass, max(0, deadline - time.time()), self._async_expire_devices
+            )
+
+    @callback
+    def _async_expire_devices(self, _now: datetime) -> None:
+        """Mark the devices that are now due as away."""
+        self._unsub_expiry = None
+        self._oc_data.expire_due(time.time())
+        # A refresh in progress gives the listeners the changes once it is done.
+        if self._oc_data.changes and not self._oc_data.refreshing:
+            self.async_update_listeners()
+        self._async_schedule_expiry()
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Give the listeners the latest changes."""
+        super().async_update_listeners()
+        self._oc_data.changes_delivered()
+
+    async def async_shutdown(self) -> None:
+        """Cancel the pending expiry along with any scheduled refresh."""
+        await super().async_shutdown()
+        if self.profiler is not None:
+            self.profiler.done.cancel()
+            self.profiler = None
+        if self._unsub_expiry:
+            self._unsub_expiry()
+            self._unsub_expiry = None
@@ -2,39 +2,82 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any
+import time
+from typing import TYPE_CHECKING, Any, Final
 
 from homeassistant.util import slugify
+import homeassistant.util.dt as dt_util
 
 from .const import ATTR_DEVICE_TRACKER
 
+if TYPE_CHECKING:
+    from .policy import AttributeFilter
+
+ATTR_KEYS: Final = tuple(slugify(attr) for attr in ATTR_DEVICE_TRACKER)
+_NAME_INDEX: Final = ATTR_DEVICE_TRACKER.index("name")
+_IP_INDEX: Final = ATTR_DEVICE_TRACKER.index("ip")
+_AP_INDEX: Final = ATTR_DEVICE_TRACKER.index("apName")
+
 
 class Device:
-    """Represents a network device."""
+    """Represents a network device.
+
+    Only the fields in ATTR_DEVICE_TRACKER are kept from the client params, in
+    the same order, and the attribute mapping exposed to the entity is only
+    rebuilt after the shown values change. With an ``AttributeFilter``, the
+    shown values only follow the reported ones where its policies allow.
+    """
+
+    __slots__ = (
+        "_mac",
+        "_values",
+        "_shown",
+        "_shown_at",
+        "_pending",
+        "_attrs",
+        "_last_seen",
+        "site",
+        "connected",
+    )
 
-    def __init__(self, mac: str, params: dict[str, Any]) -> None:
+    def __init__(
+        self,
+        mac: str,
+        params: dict[str, Any],
+        site: str | None = None,
+        attribute_filter: AttributeFilter | None = None,
+    ) -> None:
         """Initialize the network device."""
         self._mac = mac
-        self._params = params
-        self._attrs: dict[str, Any] = {}
+        self._values: tuple[Any, ...] = tuple(map(params.get, ATTR_DEVICE_TRACKER))
+        self._shown = self._values
+        self._shown_at = 0.0
+        self._pending = False
+        if attribute_filter is not None:
+            self._shown = attribute_filter.initial(self._values)
+            self._shown_at = time.monotonic()
+        self._attrs: dict[str, Any] | None = None
+        self._last_seen: int | None = params.get("lastSeen")
+        self.site = site
         self.connected: bool = True
-        self._set_last_seen(params)
-
-    def _set_last_seen(self, params: dict[str, Any]) -> None:
-        timestamp: int | None = params.get("lastSeen")
-        if timestamp:
-            self._last_seen = datetime.utcfromtimestamp(timestamp / 1000.0)
 
     @property
     def name(self) -> str:
         """Return device name."""
-        return str(self._params.get("name", self.mac))
+        name = self._shown[_NAME_INDEX]
+        return self.mac if name is None else str(name)
 
     @property
     def ip_address(self) -> str | None:
         """Return device primary ip address."""
-        return self._params.get("ip")
+        return self._shown[_IP_INDEX]
+
+    @property
+    def ap_name(self) -> str | None:
+        """Return the name of the AP the device was last reported at."""
+        return self._values[_AP_INDEX]
 
     @property
     def mac(self) -> str:
@@ -44,18 +87,74 @@ class Device:
     @property
     def last_seen(self) -> datetime | None:
         """Return device last seen."""
-        return self._last_seen
+        if not self._last_seen:
+            return None
+        return dt_util.utc_from_timestamp(self._last_seen / 1000.0)
 
     @property
     def attrs(self) -> dict[str, Any]:
         """Return device attributes."""
-        for attr in ATTR_DEVICE_TRACKER:
-            if attr in self._params:
-                self._attrs[slugify(attr)] = self._params[attr]
+        if self._attrs is None:
+            self._attrs = {
+                key: value for key, value in zip(ATTR_KEYS, self._shown) if value is not None
+            }
         return self._attrs
 
-    def update(self, params: dict[str, Any]) -> None:
-        """Update Device params."""
-        self._params = params
-        self._set_last_seen(params)
+    def params(self) -> dict[str, Any]:
+        """Return the kept client params, from which the device can be rebuilt."""
+        params = dict(zip(ATTR_DEVICE_TRACKER, self._values))
+        params["lastSeen"] = self._last_seen
+        return params
+
+    def update(
+        self,
+        params: dict[str, Any],
+        site: str | None = None,
+        attribute_filter: AttributeFilter | None = None,
+        now: float = 0.0,
+    ) -> bool:
+        """Update Device params, returning whether the exposed attributes changed.
+
+        ``now`` is the monotonic time, against which the filter's minimum
+        interval is measured.
+        """
+        values = tuple(map(params.get, ATTR_DEVICE_TRACKER))
+        self._last_seen = params.get("lastSeen") or self._last_seen
+        self.site = site
         self.connected = True
+        if values == self._values and not self._pending:
+            return False
+        self._values = values
+        if attribute_filter is None:
+            shown = values
+        else:
+            # Also runs for unchanged values while a change is held back, as it may now be due.
+            shown = attribute_filter.update(self._shown, values, now - self._shown_at)
+            self._pending = attribute_filter.held_back(shown, values)
+            if shown == self._shown:
+                self._shown = shown
+                return False
+        self._shown = shown
+        self._shown_at = now
+        self._attrs = None
+        return True
+
+
+@dataclass
+class DeviceChanges:
+    """The MACs of the devices that changed during one refresh."""
+
+    added: set[str] = field(default_factory=set)
+    removed: set[str] = field(default_factory=set)
+    connected: set[str] = field(default_factory=set)
+    disconnected: set[str] = field(default_factory=set)
+    updated: set[str] = field(default_factory=set)
+
+    @property
+    def changed(self) -> set[str]:
+        """Return the MACs of the existing devices whose state changed."""
+        return self.removed | self.connected | self.disconnected | self.updated
+
+    def __bool__(self) -> bool:
+        """Return whether anything changed."""
+        return bool(self.added or self.changed)
@@ -1,23 +1,20 @@
 """Support for Omada Controllers as device tracker."""
 from __future__ import annotations
 
+import asyncio
 from typing import Any
 
-from homeassistant.components.device_tracker import (
-    DOMAIN as DEVICE_TRACKER,
-    ScannerEntity,
-    SourceType,
-)
-from homeassistant.config_entries import ConfigEntry
+from homeassistant.components.device_tracker import ScannerEntity, SourceType
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
-import homeassistant.util.dt as dt_util
 
-from .const import DOMAIN
+from .const import DOMAIN, ENTITY_ADD_BATCH
 from .controller import Device, OmadaControllerDataUpdateCoordinator
 
+# The entry states in which the device trackers may still be added.
+_ADDING_STATES = (ConfigEntryState.SETUP_IN_PROGRESS, ConfigEntryState.LOADED)
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -31,22 +28,15 @@ async def async_setup_entry(
 
     tracked: dict[str, OmadaControllerEntity] = {}
 
-    # registry = er.async_get(hass)
-
-    # # Restore clients that is not a part of active clients list.
-    # for entity in registry.entities.values():
-    #     if (
-    #         entity.config_entry_id == config_entry.entry_id
-    #         and entity.domain == DEVICE_TRACKER
-    #     ):
-    #         if entity.unique_id in coordinator.api.devices:
-    #             continue
-    #         coordinator.api.restore_device(entity.unique_id)
+    available = coordinator.last_update_success
 
     @callback
     def update_hub() -> None:
         """Update the status of the device."""
-        update_items(coordinator, async_add_entities, tracked)
+        nonlocal available
+        write_all = available != coordinator.last_update_success
+        available = coordinator.last_update_success
+        update_items(coordinator, config_entry, async_add_entities, tracked, write_all)
 
     config_entry.async_on_unload(coordinator.async_add_listener(update_hub))
 
@@ -56,33 +46,106 @@ async def async_setup_entry(
 @callback
 def update_items(
     coordinator: OmadaControllerDataUpdateCoordinator,
+    config_entry: ConfigEntry,
     async_add_entities: AddEntitiesCallback,
     tracked: dict[str, OmadaControllerEntity],
+    write_all: bool = False,
 ) -> None:
-    """Update tracked device state from the hub."""
+    """Update tracked device state from the hub.
+
+    Entities are only made for the devices added in the last refresh, and
+    only the entities whose device changed write their state, unless
+    ``write_all`` is set because the availability changed. A device that
+    comes back after it was removed is given to its existing entity.
+    """
+    with coordinator.api.metrics.time_stage("update_items"):
+        _update_items(coordinator, config_entry, async_add_entities, tracked, write_all)
+
+
+@callback
+def _update_items(
+    coordinator: OmadaControllerDataUpdateCoordinator,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+    tracked: dict[str, OmadaControllerEntity],
+    write_all: bool,
+) -> None:
+    data = coordinator.api
+    # Until the first entities are made, every device is new to the platform.
+    new_macs = data.changes.added if tracked else data.devices.keys()
     new_tracked: list[OmadaControllerEntity] = []
-    for mac, device in coordinator.api.devices.items():
-        if mac not in tracked:
+    for mac in new_macs:
+        if (device := data.devices.get(mac)) is None:
+            continue
+        if (entity := tracked.get(mac)) is None:
             tracked[mac] = OmadaControllerEntity(device, coordinator)
             new_tracked.append(tracked[mac])
+        else:
+            entity.device = device
+
+    if new_tracked:
+        async_add_entities(new_tracked[:ENTITY_ADD_BATCH])
+        if rest := new_tracked[ENTITY_ADD_BATCH:]:
+            config_entry.async_create_background_task(
+                coordinator.hass,
+                _async_add_batched(config_entry, async_add_entities, rest),
+                f"{DOMAIN} {config_entry.entry_id} add device trackers",
+            )
+
+    if write_all:
+        changed = tracked.keys()
+    else:
+        changed = (data.changes.changed | data.changes.added) & tracked.keys()
+    written = 0
+    for mac in changed:
+        entity = tracked[mac]
+        if entity.hass is not None:
+            entity.async_write_ha_state()
+            written += 1
+    data.metrics.state_writes += written
+    data.metrics.state_writes_skipped += len(tracked) - len(new_tracked) - written
+
+
+async def _async_add_batched(
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+    entities: list[OmadaControllerEntity],
+) -> None:
+    """Add the entities ENTITY_ADD_BATCH at a time, one batch per loop iteration.
 
-    async_add_entities(new_tracked)
+    The task is cancelled when the entry unloads, and stops early if the
+    entry is no longer being set up or loaded.
+    """
+    for start in range(0, len(entities), ENTITY_ADD_BATCH):
+        await asyncio.sleep(0)
+        if config_entry.state not in _ADDING_STATES:
+            return
+        async_add_entities(entities[start : start + ENTITY_ADD_BATCH])
 
 
-class OmadaControllerEntity(
-    CoordinatorEntity[OmadaControllerDataUpdateCoordinator], ScannerEntity
-):
-    """Representation of network device."""
+class OmadaControllerEntity(ScannerEntity):
+    """Representation of network device.
+
+    State writes are driven by ``update_items`` for the devices that changed,
+    rather than by every entity listening to the coordinator.
+    """
+
+    _attr_should_poll = False
 
     def __init__(
         self, device: Device, coordinator: OmadaControllerDataUpdateCoordinator
     ) -> None:
         """Initialize the tracked device."""
-        super().__init__(coordinator)
+        self.coordinator = coordinator
         self.device = device
         self._attr_name = device.name
         self._attr_unique_id = device.mac
 
+    @property
+    def available(self) -> bool:
+        """Return if the last refresh of the controller succeeded."""
+        return self.coordinator.last_update_success
+
     @property
     def is_connected(self) -> bool:
         """Return true if the client is connected to the network."""
@@ -0,0 +1,56 @@
+"""Diagnostics support for Omada Controller."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_WEBHOOK_ID, DOMAIN
+from .controller import OmadaControllerDataUpdateCoordinator
+
+TO_REDACT = {CONF_PASSWORD, CONF_USERNAME, CONF_WEBHOOK_ID}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: OmadaControllerDataUpdateCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    data = coordinator.api
+    return {
+        "entry": {
+            "data": async_redact_data(config_entry.data, TO_REDACT),
+            "options": async_redact_data(config_entry.options, TO_REDACT),
+        },
+        "controller": {
+            "model": data.model,
+            "firmware": data.firmware,
+            "sites": list(data.api.sites),
+            "site_errors": {site: repr(error) for site, error in data.site_errors.items()},
+            "circuit_breaker": data.api.breaker.state,
+            "request_budget": data.api.budget.as_dict(),
+        },
+        "coordinator": {
+            "last_update_success": coordinator.last_update_success,
+            "update_interval": coordinator.update_interval.total_seconds()
+            if coordinator.update_interval
+            else None,
+        },
+        "devices": {
+            "tracked": len(data.devices),
+            "connected": sum(device.connected for device in data.devices.values()),
+        },
+        "metrics": data.metrics.as_dict(),
+        "presence_log": {"bytes": coordinator.presence_log.nbytes}
+        if coordinator.presence_log is not None
+        else None,
+        "history": {
+            "clients": len(data.history),
+            "bytes": sum(history.nbytes for history in data.history.values()),
+        },
+    }
@@ -8,3 +8,11 @@ class CannotConnect(HomeAssistantError):
 
 class LoginError(HomeAssistantError):
     """Component got logged out."""
+
+
+class ControllerUnavailable(CannotConnect):
+    """The controller keeps failing, so requests to it are held back."""
+
+
+class RequestBudgetExceeded(CannotConnect):
+    """Too many requests are already waiting for the controller's request budget."""
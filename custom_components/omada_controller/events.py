@@ -0,0 +1,86 @@
+"""Client events pushed by the controller to a Home Assistant webhook.
+
+The controller posts its webhook messages as JSON with the site name in
+``Site``, a millisecond ``timestamp`` and the log lines in ``text``, e.g.::
+
+    {
+        "Site": "Default",
+        "timestamp": 1700000000000,
+        "text": [
+            "[client:phone:AA-BB-CC-DD-EE-FF] was connected to [ap:Hall:11-22-33-44-55-66] with SSID \\"Home\\"."
+        ]
+    }
+
+Only the lines about clients connecting, disconnecting and roaming are
+used; everything else the controller reports is ignored.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import re
+import time
+from typing import Any, Final
+
+CONNECTED: Final = "connected"
+DISCONNECTED: Final = "disconnected"
+ROAMED: Final = "roamed"
+
+_MAC: Final = r"[0-9A-Fa-f]{2}(?:[-:][0-9A-Fa-f]{2}){5}"
+_CLIENT: Final = re.compile(rf"\[(?:[\w-]*client):(?:(?P<name>[^\]]*):)?(?P<mac>{_MAC})\]")
+_AP: Final = re.compile(rf"\[ap:(?P<name>[^\]]*?)(?::{_MAC})?\]")
+_SSID: Final = re.compile(r'SSID\s+"(?P<ssid>[^"]*)"')
+# Checked in order, as a line about roaming may also say the client connected.
+_KINDS: Final = (
+    (re.compile(r"\bdisconnected\b"), DISCONNECTED),
+    (re.compile(r"\broam"), ROAMED),
+    (re.compile(r"\bconnected\b"), CONNECTED),
+)
+
+
+@dataclass
+class ClientEvent:
+    """A client connecting to, disconnecting from or roaming within a site."""
+
+    site: str
+    mac: str
+    kind: str
+    timestamp: float
+    params: dict[str, Any] = field(default_factory=dict)
+
+
+def parse_client_event(site: str, line: str, timestamp: float) -> ClientEvent | None:
+    """Return the client event a log line describes, if it describes one."""
+    if (client := _CLIENT.search(line)) is None:
+        return None
+    kind = next((kind for pattern, kind in _KINDS if pattern.search(line)), None)
+    if kind is None:
+        return None
+    params: dict[str, Any] = {}
+    if client["name"]:
+        params["name"] = client["name"]
+    if kind != DISCONNECTED:
+        # A roaming client names the AP it left first and the one it joined last.
+        if aps := _AP.findall(line):
+            params["apName"] = aps[-1]
+        if ssid := _SSID.search(line):
+            params["ssid"] = ssid["ssid"]
+    mac = client["mac"].upper().replace(":", "-")
+    return ClientEvent(site, mac, kind, timestamp, params)
+
+
+def parse_webhook_payload(payload: Any) -> list[ClientEvent]:
+    """Return the client events in a webhook message from the controller."""
+    if not isinstance(payload, dict) or not isinstance(site := payload.get("Site"), str):
+        return []
+    lines = payload.get("text")
+    if isinstance(lines, str):
+        lines = [lines]
+    if not isinstance(lines, list):
+        return []
+    timestamp = payload.get("timestamp")
+    timestamp = timestamp / 1000 if isinstance(timestamp, (int, float)) else time.time()
+    events = []
+    for line in lines:
+        if isinstance(line, str) and (event := parse_client_event(site, line, timestamp)):
+            events.append(event)
+    return events
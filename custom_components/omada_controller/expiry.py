@@ -0,0 +1,63 @@
+"""Time-ordered queue of pending device expiries."""
+from __future__ import annotations
+
+import heapq
+
+
+class ExpiryQueue:
+    """Deadlines by MAC address, kept in a heap so the earliest is always first.
+
+    Rescheduling or cancelling a MAC leaves its old heap entry in place; such
+    stale entries are skipped when popped, and the heap is rebuilt once they
+    outnumber the live ones. Every operation only touches the entries involved
+    rather than all tracked devices.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty queue."""
+        self._heap: list[tuple[float, str]] = []
+        self._deadlines: dict[str, float] = {}
+
+    def __len__(self) -> int:
+        """Return the number of pending deadlines."""
+        return len(self._deadlines)
+
+    def __contains__(self, mac: object) -> bool:
+        """Return whether the MAC has a pending deadline."""
+        return mac in self._deadlines
+
+    def schedule(self, mac: str, deadline: float) -> None:
+        """Set the deadline for a MAC, replacing any earlier one."""
+        self._deadlines[mac] = deadline
+        heapq.heappush(self._heap, (deadline, mac))
+        self._compact()
+
+    def cancel(self, mac: str) -> None:
+        """Drop the pending deadline for a MAC, if any."""
+        if self._deadlines.pop(mac, None) is not None:
+            self._compact()
+
+    @property
+    def next_deadline(self) -> float | None:
+        """Return the earliest pending deadline."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> list[str]:
+        """Remove and return the MACs whose deadline is at or before ``now``."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, mac = heapq.heappop(self._heap)
+            if self._deadlines.get(mac) == deadline:
+                del self._deadlines[mac]
+                due.append(mac)
+        return due
+
+    def _drop_stale(self) -> None:
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _compact(self) -> None:
+        if len(self._heap) > 2 * len(self._deadlines) + 16:
+            self._heap = [(deadline, mac) for mac, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
@@ -0,0 +1,144 @@
+"""Recent throughput samples of each client, in fixed-size ring buffers.
+
+A sample holds the client's receive and transmit rates and its download
+and upload counters. The samples are stored column by column in
+preallocated typed arrays, so a history takes the same 28 bytes per sample
+however long it has been kept, and the oldest sample is overwritten once
+it is full.
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Any, Final
+
+_UINT32_MAX: Final = 2**32 - 1
+_UINT64_MAX: Final = 2**64 - 1
+
+
+def _clamp(value: Any, maximum: int) -> int:
+    """Return the value as an unsigned int that fits its column; missing is 0."""
+    if not isinstance(value, (int, float)):
+        return 0
+    return min(maximum, max(0, int(value)))
+
+
+def _stats(values: list[int]) -> dict[str, float]:
+    return {"min": min(values), "max": max(values), "mean": round(sum(values) / len(values), 1)}
+
+
+class ThroughputHistory:
+    """The last ``capacity`` throughput samples of one client."""
+
+    __slots__ = ("_times", "_rx", "_tx", "_down", "_up", "_next", "_count")
+
+    def __init__(self, capacity: int) -> None:
+        """Initialize an empty history."""
+        self._times = array("I", bytes(4 * capacity))
+        self._rx = array("I", bytes(4 * capacity))
+        self._tx = array("I", bytes(4 * capacity))
+        self._down = array("Q", bytes(8 * capacity))
+        self._up = array("Q", bytes(8 * capacity))
+        self._next = 0
+        self._count = 0
+
+    @property
+    def capacity(self) -> int:
+        """Return the number of samples kept."""
+        return len(self._times)
+
+    @property
+    def nbytes(self) -> int:
+        """Return the memory taken by the samples."""
+        return sum(
+            column.itemsize * len(column)
+            for column in (self._times, self._rx, self._tx, self._down, self._up)
+        )
+
+    def __len__(self) -> int:
+        """Return the number of samples held."""
+        return self._count
+
+    def append(
+        self, timestamp: float, rx_rate: Any, tx_rate: Any, downloaded: Any, uploaded: Any
+    ) -> None:
+        """Add a sample, overwriting the oldest one when the history is full."""
+        if not (capacity := len(self._times)):
+            return
+        index = self._next
+        self._times[index] = _clamp(timestamp, _UINT32_MAX)
+        self._rx[index] = _clamp(rx_rate, _UINT32_MAX)
+        self._tx[index] = _clamp(tx_rate, _UINT32_MAX)
+        self._down[index] = _clamp(downloaded, _UINT64_MAX)
+        self._up[index] = _clamp(uploaded, _UINT64_MAX)
+        self._next = (index + 1) % capacity
+        self._count = min(self._count + 1, capacity)
+
+    def _order(self) -> range | list[int]:
+        """Return the indexes of the samples, oldest first."""
+        if self._count < len(self._times):
+            return range(self._count)
+        return [*range(self._next, len(self._times)), *range(self._next)]
+
+    def samples(self) -> list[tuple[int, int, int, int, int]]:
+        """Return the samples, oldest first, as (timestamp, rx, tx, down, up) tuples."""
+        return [
+            (self._times[i], self._rx[i], self._tx[i], self._down[i], self._up[i])
+            for i in self._order()
+        ]
+
+    def downsample(self, window: int, since: float = 0) -> list[dict[str, Any]]:
+        """Summarize the samples in windows of ``window`` seconds, oldest first.
+
+        Windows are aligned to multiples of ``window``. Each gives the
+        minimum, maximum and mean of the rates, and the bytes transferred,
+        from the increase of the counters since the previous sample; a
+        counter that went down was reset, and counts from zero.
+        """
+        windows: list[dict[str, Any]] = []
+        previous: tuple[int, int] | None = None
+        start = -1
+        rx: list[int] = []
+        tx: list[int] = []
+        downloaded = uploaded = 0
+
+        def close() -> None:
+            windows.append(
+                {
+                    "start": start,
+                    "samples": len(rx),
+                    "rx_rate": _stats(rx),
+                    "tx_rate": _stats(tx),
+                    "downloaded": downloaded,
+                    "uploaded": uploaded,
+                }
+            )
+
+        for i in self._order():
+            timestamp = self._times[i]
+            down, up = self._down[i], self._up[i]
+            if timestamp >= since:
+                if timestamp - timestamp % window != start:
+                    if rx:
+                        close()
+                    start = timestamp - timestamp % window
+                    rx, tx = [], []
+                    downloaded = uploaded = 0
+                rx.append(self._rx[i])
+                tx.append(self._tx[i])
+                if previous is not None:
+                    downloaded += down - previous[0] if down >= previous[0] else down
+                    uploaded += up - previous[1] if up >= previous[1] else up
+            previous = (down, up)
+        if rx:
+            close()
+        return windows
+
+    def mean_rates(self, since: float) -> tuple[float, float] | None:
+        """Return the mean receive and transmit rates of the samples since a time."""
+        indexes = [i for i in self._order() if self._times[i] >= since]
+        if not indexes:
+            return None
+        return (
+            sum(self._rx[i] for i in indexes) / len(indexes),
+            sum(self._tx[i] for i in indexes) / len(indexes),
+        )
@@ -0,0 +1,91 @@
+"""Controller clients shared between config entries.
+
+Config entries for the same controller URL and credentials, for example
+entries that each track different sites, share one OmadaController. They
+share its login and session. The config flow splits the sites between
+the entries, so no site is fetched for more than one of them. The client
+the config flow logged in with is kept here too, so that setting up the
+new entry doesn't log in again.
+
+A shared client is made with the settings of the entry that first needs
+it, so its connect and read timeouts and its site concurrency are that
+entry's. The other entries' request budget limits still apply, as the
+budget is shared per controller URL.
+"""
+from __future__ import annotations
+
+from typing import Any, Final
+
+from homeassistant.const import CONF_PASSWORD, CONF_URL, CONF_USERNAME
+from homeassistant.core import HomeAssistant, callback
+
+from .const import CONF_SITES, DOMAIN
+from .budget import async_get_budget
+from .controller import OmadaController, async_create_controller
+
+DATA_HUBS: Final = f"{DOMAIN}_hubs"
+
+
+def _hub_key(config: dict[str, Any]) -> tuple[str, str, str]:
+    return (config[CONF_URL], config[CONF_USERNAME], config[CONF_PASSWORD])
+
+
+@callback
+def async_acquire_controller(
+    hass: HomeAssistant, entry_id: str, config: dict[str, Any]
+) -> OmadaController:
+    """Return the client for the entry's controller, creating it if needed.
+
+    The entry is subscribed to the sites in its ``CONF_SITES``, or to all of
+    them when it has none. The client logs in on its first request. The
+    entry's request budget limits apply to the client, shared or not, but
+    its timeouts and site concurrency only when it creates the client.
+    """
+    hubs: dict[tuple[str, str, str], OmadaController] = hass.data.setdefault(DATA_HUBS, {})
+    key = _hub_key(config)
+    if (api := hubs.get(key)) is None:
+        api = hubs[key] = async_create_controller(hass, config)
+    else:
+        async_get_budget(hass, config)
+    sites = config.get(CONF_SITES)
+    api.subscriptions[entry_id] = frozenset(sites) if sites else None
+    return api
+
+
+@callback
+def async_store_controller(hass: HomeAssistant, api: OmadaController) -> None:
+    """Keep a client validated by the config flow for the entry about to be set up.
+
+    A client that entries already share for the same controller is kept
+    instead. The flow hands the client to ``async_discard_controller`` when
+    it ends, which closes it unless an entry took it over.
+    """
+    hubs: dict[tuple[str, str, str], OmadaController] = hass.data.setdefault(DATA_HUBS, {})
+    hubs.setdefault(_hub_key(api.config), api)
+
+
+@callback
+def async_discard_controller(hass: HomeAssistant, api: OmadaController) -> None:
+    """Close a client made by a config flow, unless an entry uses it."""
+    if api.subscriptions:
+        return
+    hubs: dict[tuple[str, str, str], OmadaController] = hass.data.get(DATA_HUBS, {})
+    key = _hub_key(api.config)
+    if hubs.get(key) is api:
+        del hubs[key]
+    api.async_close()
+
+
+@callback
+def async_release_controller(
+    hass: HomeAssistant, entry_id: str, config: dict[str, Any]
+) -> None:
+    """Unsubscribe the entry, closing the client once no entry uses it."""
+    hubs: dict[tuple[str, str, str], OmadaController] = hass.data.get(DATA_HUBS, {})
+    key = _hub_key(config)
+    if (api := hubs.get(key)) is None:
+        return
+    api.subscriptions.pop(entry_id, None)
+    if not api.subscriptions:
+        del hubs[key]
+        api.async_close()
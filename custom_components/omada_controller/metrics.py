@@ -0,0 +1,147 @@
+"""Timings and counters for the Omada Controller refresh path."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Iterator
+from contextlib import contextmanager
+import time
+from typing import Any, Final
+
+# Upper bounds, in milliseconds, of the latency histogram buckets.
+LATENCY_BUCKETS: Final = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """A latency histogram over fixed millisecond buckets."""
+
+    __slots__ = ("counts", "count", "total", "maximum", "last")
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.last = 0.0
+
+    def record(self, milliseconds: float) -> None:
+        """Add one observation."""
+        self.counts[bisect_left(LATENCY_BUCKETS, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.last = milliseconds
+        self.maximum = max(self.maximum, milliseconds)
+
+    def percentile(self, pct: float) -> float | None:
+        """Return the upper bound of the bucket holding the ``pct`` percentile."""
+        if not self.count:
+            return None
+        rank = pct / 100 * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return float(bound)
+        return self.maximum
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary suitable for diagnostics."""
+        labels = [f"le_{bound}" for bound in LATENCY_BUCKETS] + ["le_inf"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 2) if self.count else None,
+            "last_ms": round(self.last, 2),
+            "max_ms": round(self.maximum, 2),
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class ControllerMetrics:
+    """Everything measured about one controller's requests and refreshes."""
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.endpoints: dict[str, Histogram] = {}
+        self.stages: dict[str, Histogram] = {}
+        self.requests = 0
+        self.request_errors = 0
+        self.request_retries = 0
+        self.requests_rejected = 0
+        self.breaker_trips = 0
+        self.bytes_received = 0
+        self.clients_per_site: dict[str, int] = {}
+        self.devices_added = 0
+        self.devices_removed = 0
+        self.state_writes = 0
+        self.state_writes_skipped = 0
+        self.events_received = 0
+        # Fetches of each site, and how many of them were found unchanged.
+        self.site_fetches: dict[str, int] = {}
+        self.site_fingerprint_hits: dict[str, int] = {}
+
+    def record_request(self, endpoint: str, milliseconds: float, size: int) -> None:
+        """Record one HTTP round trip to the controller."""
+        self.requests += 1
+        self.bytes_received += size
+        if (histogram := self.endpoints.get(endpoint)) is None:
+            histogram = self.endpoints[endpoint] = Histogram()
+        histogram.record(milliseconds)
+
+    def record_stage(self, stage: str, milliseconds: float) -> None:
+        """Record the time spent in one stage of a refresh."""
+        if (histogram := self.stages.get(stage)) is None:
+            histogram = self.stages[stage] = Histogram()
+        histogram.record(milliseconds)
+
+    def record_fingerprint(self, site: str, unchanged: bool) -> None:
+        """Record whether a fetch of the site found its clients unchanged."""
+        self.site_fetches[site] = self.site_fetches.get(site, 0) + 1
+        if unchanged:
+            self.site_fingerprint_hits[site] = self.site_fingerprint_hits.get(site, 0) + 1
+
+    @property
+    def fingerprint_hit_rates(self) -> dict[str, float]:
+        """Return the share of each site's fetches that were found unchanged."""
+        return {
+            site: self.site_fingerprint_hits.get(site, 0) / fetches
+            for site, fetches in self.site_fetches.items()
+        }
+
+    @property
+    def fingerprint_hit_rate(self) -> float | None:
+        """Return the share of all site fetches that were found unchanged."""
+        if not (fetches := sum(self.site_fetches.values())):
+            return None
+        return sum(self.site_fingerprint_hits.values()) / fetches
+
+    @contextmanager
+    def time_stage(self, stage: str) -> Iterator[None]:
+        """Time the enclosed block as a refresh stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, (time.perf_counter() - start) * 1000)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary suitable for diagnostics."""
+        return {
+            "requests": self.requests,
+            "request_errors": self.request_errors,
+            "request_retries": self.request_retries,
+            "requests_rejected": self.requests_rejected,
+            "breaker_trips": self.breaker_trips,
+            "bytes_received": self.bytes_received,
+            "endpoints": {name: h.as_dict() for name, h in self.endpoints.items()},
+            "stages": {name: h.as_dict() for name, h in self.stages.items()},
+            "clients_per_site": dict(self.clients_per_site),
+            "devices_added": self.devices_added,
+            "devices_removed": self.devices_removed,
+            "state_writes": self.state_writes,
+            "state_writes_skipped": self.state_writes_skipped,
+            "events_received": self.events_received,
+            "site_fetches": dict(self.site_fetches),
+            "fingerprint_hit_rates": self.fingerprint_hit_rates,
+        }
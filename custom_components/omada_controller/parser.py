@@ -0,0 +1,54 @@
+"""Decoding of controller responses into the few fields the integration uses."""
+from __future__ import annotations
+
+from typing import Any, Final
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # pragma: no cover - orjson ships with Home Assistant
+    from json import loads as json_loads
+
+from .const import ATTR_DEVICE_TRACKER
+
+# The client fields kept from each record; everything else is dropped on decode.
+CLIENT_FIELDS: Final = ("mac", "lastSeen", *ATTR_DEVICE_TRACKER)
+# The client fields whose change is worth processing a site's clients for.
+FINGERPRINT_FIELDS: Final = ("mac", "ip", "name", "apName", "ssid")
+
+
+def decode_json(body: bytes) -> Any:
+    """Decode a raw response body without first copying it into a str."""
+    return json_loads(body)
+
+
+def project_client(client: dict[str, Any]) -> dict[str, Any]:
+    """Return only the fields of a client record that the integration uses."""
+    return {field: client[field] for field in CLIENT_FIELDS if field in client}
+
+
+def decode_clients_page(body: bytes) -> Any:
+    """Decode one page of clients, then project each of its records.
+
+    The whole page is decoded first, and the records are cut down to
+    CLIENT_FIELDS afterwards. The response keeps its usual shape, but the
+    full records are dropped once the page is projected, so at most one
+    page of them is ever alive at a time. The peak memory of decoding a
+    page is therefore about that of decoding it in full; what shrinks is
+    the memory kept once it is decoded.
+    """
+    response = json_loads(body)
+    try:
+        data = response["result"]["data"]
+    except (KeyError, TypeError):
+        return response
+    response["result"]["data"] = [project_client(client) for client in data]
+    return response
+
+
+def fingerprint_clients(clients: list[dict[str, Any]]) -> int:
+    """Return a fingerprint of the clients over FINGERPRINT_FIELDS.
+
+    The clients' hashes are summed, so the fingerprints of a site's pages add
+    up to the same value whatever order the controller lists its clients in.
+    """
+    return sum(hash(tuple(map(client.get, FINGERPRINT_FIELDS))) for client in clients)
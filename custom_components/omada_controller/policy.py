@@ -0,0 +1,114 @@
+"""Which changes to a device's attributes are worth a state write.
+
+The volatile attributes, such as the signal level and uptime, change on
+nearly every refresh. Writing each change makes the recorder store a new
+state row per device per poll, so a change to one of them is only shown
+once it is large enough and the device's attributes were not written too
+recently. A change to any other attribute is shown straight away, along
+with the latest volatile values.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+import math
+from typing import Any
+
+from .const import (
+    ATTR_DEVICE_TRACKER,
+    CONF_ATTRIBUTE_MIN_INTERVAL,
+    CONF_ATTRIBUTE_THRESHOLDS,
+    CONF_EXCLUDED_ATTRIBUTES,
+    DEFAULT_ATTRIBUTE_MIN_INTERVAL,
+    DEFAULT_ATTRIBUTE_THRESHOLDS,
+    VOLATILE_ATTRIBUTES,
+)
+
+
+@dataclass(frozen=True)
+class AttributePolicy:
+    """When a change to one volatile attribute is shown.
+
+    An excluded attribute is never shown. Otherwise a new value is shown
+    once it differs from the shown one by at least ``threshold``, and at
+    least ``min_interval`` seconds passed since the device's attributes
+    were last written.
+    """
+
+    threshold: float = 0
+    min_interval: float = 0
+    exclude: bool = False
+
+    def accepts(self, shown: Any, value: Any, age: float) -> bool:
+        """Return whether ``value`` should replace the ``shown`` value."""
+        if self.exclude or value == shown or age < self.min_interval:
+            return False
+        if isinstance(value, (int, float)) and isinstance(shown, (int, float)):
+            return abs(value - shown) >= self.threshold
+        return True
+
+
+class AttributeFilter:
+    """Apply the attribute policies to the values reported for a device."""
+
+    def __init__(self, policies: Mapping[str, AttributePolicy]) -> None:
+        """Initialize the filter from the policy of each volatile attribute."""
+        self._policies = tuple(
+            (ATTR_DEVICE_TRACKER.index(name), policy)
+            for name, policy in policies.items()
+            if name in ATTR_DEVICE_TRACKER
+        )
+        self._excluded = tuple(index for index, policy in self._policies if policy.exclude)
+        filtered = {index for index, _ in self._policies}
+        self._stable = tuple(i for i in range(len(ATTR_DEVICE_TRACKER)) if i not in filtered)
+
+    @classmethod
+    def from_options(cls, options: Mapping[str, Any]) -> AttributeFilter:
+        """Build the filter from a config entry's options."""
+        thresholds = {
+            **DEFAULT_ATTRIBUTE_THRESHOLDS,
+            **options.get(CONF_ATTRIBUTE_THRESHOLDS, {}),
+        }
+        min_interval = options.get(CONF_ATTRIBUTE_MIN_INTERVAL, DEFAULT_ATTRIBUTE_MIN_INTERVAL)
+        excluded: Iterable[str] = options.get(CONF_EXCLUDED_ATTRIBUTES, [])
+        return cls(
+            {
+                name: AttributePolicy(
+                    thresholds.get(name, 0), min_interval, name in excluded
+                )
+                for name in VOLATILE_ATTRIBUTES
+            }
+        )
+
+    def initial(self, values: tuple[Any, ...]) -> tuple[Any, ...]:
+        """Return the values shown for a new device, which leave out the excluded ones."""
+        if not self._excluded:
+            return values
+        shown = list(values)
+        for index in self._excluded:
+            shown[index] = None
+        return tuple(shown)
+
+    def update(
+        self, shown: tuple[Any, ...], values: tuple[Any, ...], age: float
+    ) -> tuple[Any, ...]:
+        """Return the values to show, given the shown ones and the ones just reported.
+
+        ``age`` is the number of seconds since the shown values were written.
+        """
+        if any(values[index] != shown[index] for index in self._stable):
+            return self.initial(values)
+        if not self._excluded and values == shown:
+            return values
+        updated = list(shown)
+        for index, policy in self._policies:
+            if policy.accepts(shown[index], values[index], age):
+                updated[index] = values[index]
+        return tuple(updated)
+
+    def held_back(self, shown: tuple[Any, ...], values: tuple[Any, ...]) -> bool:
+        """Return whether a reported value is held back only until it is old enough."""
+        return any(
+            policy.accepts(shown[index], values[index], math.inf)
+            for index, policy in self._policies
+        )
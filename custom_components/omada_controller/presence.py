@@ -0,0 +1,335 @@
+"""Append-only log of the presence transitions of a config entry's clients.
+
+Each time a client connects, disconnects or roams to another AP, a fixed
+size record is appended to a segment file under ``.storage``. A record
+holds the time in whole seconds, the kind of transition, the client's MAC
+and the indexes of its site and AP names. The names are kept once, in the
+order they first appeared, in a names file beside the segments.
+
+Records are appended in time order, so a segment is its own time index:
+range queries binary search the memory-mapped segment for the first
+record and read on from there, without loading the rest of the log. The
+MACs in each full segment are collected the first time a query for one
+MAC reads it, so later queries skip the segments the MAC is not in. Once
+a segment reaches PRESENCE_SEGMENT_BYTES a new one is started, and only
+the newest PRESENCE_MAX_SEGMENTS are kept.
+"""
+from __future__ import annotations
+
+import asyncio
+from bisect import bisect_left
+from dataclasses import dataclass
+import logging
+import mmap
+from pathlib import Path
+import shutil
+import struct
+import time
+from typing import Any, Final
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import STORAGE_DIR
+import homeassistant.util.dt as dt_util
+
+from .const import DOMAIN, PRESENCE_MAX_SEGMENTS, PRESENCE_SEGMENT_BYTES
+from .device import Device, DeviceChanges
+
+_LOGGER = logging.getLogger(__name__)
+
+CONNECT: Final = 1
+DISCONNECT: Final = 2
+ROAM: Final = 3
+TRANSITIONS: Final = {CONNECT: "connect", DISCONNECT: "disconnect", ROAM: "roam"}
+
+# Seconds that transitions are gathered for before being appended in one write.
+PRESENCE_WRITE_DELAY: Final = 10
+
+_MAGIC: Final = b"OMPL\x01"
+# The header is padded to a record, so records stay aligned.
+_RECORD: Final = struct.Struct("<IB6sHHx")
+_HEADER: Final = _MAGIC.ljust(_RECORD.size, b"\0")
+_TIME: Final = struct.Struct("<I")
+_MAC_OFFSET: Final = _TIME.size + 1
+_MAC_SIZE: Final = 6
+_SEGMENT_RECORDS: Final = (PRESENCE_SEGMENT_BYTES - len(_HEADER)) // _RECORD.size
+_NAMES: Final = "names"
+_SUFFIX: Final = ".seg"
+
+
+def _pack_mac(mac: str) -> bytes:
+    return bytes.fromhex(mac.replace("-", "").replace(":", ""))
+
+
+def _unpack_mac(mac: bytes) -> str:
+    return mac.hex("-").upper()
+
+
+@dataclass
+class _Segment:
+    """A segment file and the span of times its records cover."""
+
+    path: Path
+    records: int
+    first: int
+    last: int
+    # The MACs in the segment, once a query for one MAC has read it.
+    macs: set[bytes] | None = None
+
+
+class PresenceLog:
+    """The presence transition log of one config entry."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the log of the entry."""
+        self.hass = hass
+        self.path = Path(hass.config.path(STORAGE_DIR, f"{DOMAIN}.{entry_id}.presence"))
+        self._names: list[str] = [""]
+        self._name_ids: dict[str, int] = {"": 0}
+        self._new_names: list[str] = []
+        self._segments: list[_Segment] = []
+        self._pending: list[tuple[int, int, bytes, int, int]] = []
+        self._last_time = 0
+        # The site and AP each connected client was last logged at.
+        self._locations: dict[str, tuple[str | None, str | None]] = {}
+        self._lock = asyncio.Lock()
+        self._unsub_flush: CALLBACK_TYPE | None = None
+
+    @property
+    def nbytes(self) -> int:
+        """Return the size of the segments on disk."""
+        return sum(len(_HEADER) + segment.records * _RECORD.size for segment in self._segments)
+
+    async def async_load(self) -> None:
+        """Read the names and the time span of each segment."""
+        await self.hass.async_add_executor_job(self._load)
+
+    def _load(self) -> None:
+        names_path = self.path / _NAMES
+        try:
+            text = names_path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return
+        *names, partial = text.split("\n")
+        if partial:
+            # A name cut short by a crash, before any record used it.
+            names_path.write_text("".join(f"{name}\n" for name in names), encoding="utf-8")
+        for name in names:
+            self._name_ids.setdefault(name, len(self._names))
+            self._names.append(name)
+        for path in sorted(self.path.glob(f"*{_SUFFIX}")):
+            try:
+                segment = self._load_segment(path)
+            except (OSError, ValueError) as err:
+                _LOGGER.warning("Ignoring unreadable presence log segment %s: %s", path, err)
+                continue
+            self._segments.append(segment)
+        if self._segments:
+            self._last_time = self._segments[-1].last
+
+    @staticmethod
+    def _load_segment(path: Path) -> _Segment:
+        with path.open("r+b") as file:
+            if file.read(len(_HEADER)) != _HEADER:
+                raise ValueError("not a presence log segment")
+            size = path.stat().st_size
+            records = (size - len(_HEADER)) // _RECORD.size
+            if len(_HEADER) + records * _RECORD.size != size:
+                # A record cut short by a crash; later records must stay aligned.
+                file.truncate(len(_HEADER) + records * _RECORD.size)
+            if not records:
+                return _Segment(path, 0, 0, 0)
+            file.seek(len(_HEADER))
+            (first,) = _TIME.unpack(file.read(_TIME.size))
+            file.seek(len(_HEADER) + (records - 1) * _RECORD.size)
+            (last,) = _TIME.unpack(file.read(_TIME.size))
+        return _Segment(path, records, first, last)
+
+    def _name_id(self, name: str | None) -> int:
+        if name is None:
+            return 0
+        name = name.replace("\n", " ")
+        if (name_id := self._name_ids.get(name)) is None:
+            if len(self._names) > 0xFFFF:
+                return 0
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+            self._new_names.append(name)
+        return name_id
+
+    def _log(self, kind: int, mac: str, site: str | None, ap_name: str | None) -> None:
+        # Keep the log in time order even if the clock steps back.
+        self._last_time = max(self._last_time, int(time.time()))
+        self._pending.append(
+            (self._last_time, kind, _pack_mac(mac), self._name_id(site), self._name_id(ap_name))
+        )
+
+    @callback
+    def async_seed(self, devices: dict[str, Device]) -> None:
+        """Remember where the connected devices are, so that their roams are logged."""
+        for mac, device in devices.items():
+            if device.connected:
+                self._locations.setdefault(mac, (device.site, device.ap_name))
+
+    @callback
+    def async_record_changes(self, devices: dict[str, Device], changes: DeviceChanges) -> None:
+        """Log the clients that connected, disconnected or roamed in the last refresh."""
+        locations = self._locations
+        for mac in changes.removed:
+            locations.pop(mac, None)
+        for mac in sorted(changes.disconnected - changes.removed):
+            location = locations.pop(mac, None)
+            if location is None and (device := devices.get(mac)) is not None:
+                location = (device.site, device.ap_name)
+            if location is not None:
+                self._log(DISCONNECT, mac, *location)
+        for mac in sorted(changes.added | changes.connected):
+            if (device := devices.get(mac)) is not None and device.connected:
+                locations[mac] = location = (device.site, device.ap_name)
+                self._log(CONNECT, mac, *location)
+        for mac in sorted(changes.updated - changes.connected):
+            if (device := devices.get(mac)) is None or not device.connected:
+                continue
+            location = (device.site, device.ap_name)
+            if (previous := locations.get(mac)) != location:
+                locations[mac] = location
+                # Without a previous location the client connected before it was logged.
+                if previous is not None:
+                    self._log(ROAM, mac, *location)
+        if self._pending:
+            self._async_schedule_flush()
+
+    @callback
+    def _async_schedule_flush(self) -> None:
+        if self._unsub_flush is None:
+            self._unsub_flush = async_call_later(
+                self.hass, PRESENCE_WRITE_DELAY, self._async_scheduled_flush
+            )
+
+    async def _async_scheduled_flush(self, _now: Any) -> None:
+        self._unsub_flush = None
+        await self.async_flush()
+
+    async def async_flush(self) -> None:
+        """Append the pending transitions, starting a new segment when the last is full."""
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+        async with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            names, self._new_names = self._new_names, []
+            await self.hass.async_add_executor_job(self._append, pending, names)
+
+    def _append(self, records: list[tuple[int, int, bytes, int, int]], names: list[str]) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        if names:
+            # Names are written first, so no record refers to a name that is not.
+            with (self.path / _NAMES).open("a", encoding="utf-8") as file:
+                file.writelines(f"{name}\n" for name in names)
+        while records:
+            segment = self._segments[-1] if self._segments else None
+            if segment is None or segment.records >= _SEGMENT_RECORDS:
+                segment = self._start_segment(records[0][0])
+            room = _SEGMENT_RECORDS - segment.records
+            batch, records = records[:room], records[room:]
+            with segment.path.open("ab") as file:
+                file.write(b"".join(_RECORD.pack(*record) for record in batch))
+            if not segment.records:
+                segment.first = batch[0][0]
+            segment.records += len(batch)
+            segment.last = batch[-1][0]
+            if segment.macs is not None:
+                segment.macs.update(record[2] for record in batch)
+
+    def _start_segment(self, first: int) -> _Segment:
+        number = int(self._segments[-1].path.stem) + 1 if self._segments else 0
+        segment = _Segment(self.path / f"{number:08d}{_SUFFIX}", 0, first, first)
+        segment.path.write_bytes(_HEADER)
+        self._segments.append(segment)
+        while len(self._segments) > PRESENCE_MAX_SEGMENTS:
+            self._segments.pop(0).path.unlink(missing_ok=True)
+        return segment
+
+    async def async_query(
+        self, start: float, end: float, mac: str | None = None, limit: int = 1000
+    ) -> tuple[list[dict[str, Any]], bool]:
+        """Return the transitions between two times, oldest first, and whether there were more.
+
+        Pending transitions are written first, so the result is up to date.
+        """
+        await self.async_flush()
+        async with self._lock:
+            return await self.hass.async_add_executor_job(
+                self._query, int(start), int(end), mac and _pack_mac(mac), limit
+            )
+
+    def _query(
+        self, start: int, end: int, mac: bytes | None, limit: int
+    ) -> tuple[list[dict[str, Any]], bool]:
+        transitions: list[dict[str, Any]] = []
+        for segment in self._segments:
+            if not segment.records or segment.last < start or segment.first > end:
+                continue
+            if mac is not None and segment.macs is not None and mac not in segment.macs:
+                continue
+            if self._query_segment(segment, start, end, mac, limit, transitions):
+                return transitions, True
+        return transitions, False
+
+    def _query_segment(
+        self,
+        segment: _Segment,
+        start: int,
+        end: int,
+        mac: bytes | None,
+        limit: int,
+        transitions: list[dict[str, Any]],
+    ) -> bool:
+        """Add the segment's transitions in range, returning whether the limit was hit."""
+        size = _RECORD.size
+        records = segment.records
+        with segment.path.open("rb") as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as view:
+            if mac is not None and segment.macs is None and records >= _SEGMENT_RECORDS:
+                segment.macs = {
+                    view[offset + _MAC_OFFSET : offset + _MAC_OFFSET + _MAC_SIZE]
+                    for offset in range(len(_HEADER), len(_HEADER) + records * size, size)
+                }
+                if mac not in segment.macs:
+                    return False
+            first = bisect_left(
+                range(records),
+                start,
+                key=lambda index: _TIME.unpack_from(view, len(_HEADER) + index * size)[0],
+            )
+            for offset in range(len(_HEADER) + first * size, len(_HEADER) + records * size, size):
+                timestamp, kind, record_mac, site, ap_name = _RECORD.unpack_from(view, offset)
+                if timestamp > end:
+                    break
+                if mac is not None and record_mac != mac:
+                    continue
+                if len(transitions) >= limit:
+                    return True
+                transitions.append(
+                    {
+                        "time": dt_util.utc_from_timestamp(timestamp).isoformat(),
+                        "mac": _unpack_mac(record_mac),
+                        "transition": TRANSITIONS.get(kind),
+                        "site": self._names[site] or None,
+                        "ap": self._names[ap_name] or None,
+                    }
+                )
+        return False
+
+    async def async_remove(self) -> None:
+        """Delete the log of an entry that is removed."""
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+        self._pending.clear()
+        await self.hass.async_add_executor_job(
+            lambda: shutil.rmtree(self.path, ignore_errors=True)
+        )
@@ -0,0 +1,106 @@
+"""Profiling of the refreshes of an Omada Controller coordinator.
+
+cProfile traces the whole event loop thread while it is enabled, so a
+profiled refresh also shows whatever else ran while it awaited the
+controller. A refresh is profiled from the fetch of the clients until
+the devices are updated. The entity updates that the coordinator's
+listeners make afterwards are not profiled, though the device tracker's
+are timed as the ``update_items`` stage of the metrics.
+"""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+import io
+import logging
+import pstats
+import time
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class RefreshProfiler:
+    """Collects one cProfile profile over a number of refreshes."""
+
+    def __init__(self, refreshes: int) -> None:
+        """Initialize a profiler for the next ``refreshes`` refreshes."""
+        self.refreshes = refreshes
+        self.remaining = refreshes
+        self.elapsed = 0.0
+        self.profile = cProfile.Profile()
+        self._active = False
+        self.done: asyncio.Future[dict[str, Any]] = asyncio.get_running_loop().create_future()
+
+    @property
+    def finished(self) -> bool:
+        """Return whether all the refreshes have been profiled."""
+        return self.remaining <= 0
+
+    @contextmanager
+    def refresh(self) -> Iterator[None]:
+        """Profile the refresh run within the context.
+
+        A refresh that overlaps one already being profiled, or that starts
+        while another profiler is active, runs without being profiled.
+        """
+        if self._active or self.finished:
+            yield
+            return
+        try:
+            self.profile.enable()
+        except ValueError as error:
+            _LOGGER.debug("Refresh not profiled: %s", error)
+            yield
+            return
+        self._active = True
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.profile.disable()
+            self._active = False
+            self.elapsed += time.perf_counter() - start
+            self.remaining -= 1
+
+    def top_functions(self, limit: int) -> list[dict[str, Any]]:
+        """Return the functions that took the most cumulative time."""
+        stats = pstats.Stats(self.profile).stats  # type: ignore[attr-defined]
+        ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+        return [
+            {
+                "function": pstats.func_std_string(function),
+                "calls": calls,
+                "total_time": round(total_time, 6),
+                "cumulative_time": round(cumulative_time, 6),
+            }
+            for function, (_, calls, total_time, cumulative_time, _) in ranked[:limit]
+        ]
+
+    def summary(self, limit: int) -> str:
+        """Return the report of the top functions by cumulative time."""
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return stream.getvalue()
+
+    def write(self, path: str, limit: int) -> dict[str, Any]:
+        """Write the profile and its summary, and return where along with the top functions.
+
+        The profile, ``<path>.prof``, can be loaded with ``pstats`` or tools
+        such as snakeviz; the summary, ``<path>.txt``, is plain text.
+        """
+        refreshes = self.refreshes - max(self.remaining, 0)
+        self.profile.dump_stats(f"{path}.prof")
+        with open(f"{path}.txt", "w", encoding="utf-8") as file:
+            file.write(f"{refreshes} refreshes profiled in {self.elapsed:.3f} seconds\n\n")
+            file.write(self.summary(limit))
+        return {
+            "profile": f"{path}.prof",
+            "summary": f"{path}.txt",
+            "refreshes": refreshes,
+            "elapsed": round(self.elapsed, 6),
+            "top_functions": self.top_functions(limit),
+        }
@@ -0,0 +1,83 @@
+"""Adaptive poll interval for the Omada Controller coordinator."""
+from __future__ import annotations
+
+from datetime import timedelta
+import random
+
+# Share of the tracked devices that must connect or disconnect in one refresh
+# before the interval is shortened.
+HIGH_CHURN_RATIO = 0.01
+# Factor applied to the interval on each quiet refresh.
+QUIET_GROWTH = 1.5
+# A refresh slower than this share of the interval counts as controller strain.
+SLOW_REFRESH_RATIO = 0.5
+
+
+class AdaptiveInterval:
+    """Choose the next poll interval from client churn and refresh health.
+
+    The interval halves while clients come and go, grows gradually while the
+    network is quiet, and backs off exponentially with jitter while refreshes
+    fail. It always stays within ``minimum`` and ``maximum``, except that the
+    backoff may go on to ``failure_maximum`` when that is longer.
+    """
+
+    def __init__(
+        self,
+        minimum: timedelta,
+        maximum: timedelta,
+        rng: random.Random | None = None,
+        failure_maximum: timedelta | None = None,
+    ) -> None:
+        """Initialize the scheduler at the shortest interval."""
+        self.minimum = minimum.total_seconds()
+        self.maximum = max(maximum.total_seconds(), self.minimum)
+        self.failure_maximum = max(
+            failure_maximum.total_seconds() if failure_maximum else 0.0, self.maximum
+        )
+        self.failures = 0
+        self._seconds = self.minimum
+        self._backoff_base = self.minimum
+        self._rng = rng or random.Random()
+
+    @property
+    def interval(self) -> timedelta:
+        """Return the current interval."""
+        return timedelta(seconds=self._seconds)
+
+    def _clamp(self, seconds: float, maximum: float | None = None) -> float:
+        return min(maximum or self.maximum, max(self.minimum, seconds))
+
+    def success(self, churn: int, tracked: int, duration: float) -> timedelta:
+        """Return the interval after a refresh that took ``duration`` seconds.
+
+        ``churn`` is the number of devices that were added, removed, connected
+        or disconnected out of the ``tracked`` devices.
+        """
+        self.failures = 0
+        if duration > self._seconds * SLOW_REFRESH_RATIO:
+            seconds = self._seconds * 2
+        elif churn and churn >= max(1, tracked * HIGH_CHURN_RATIO):
+            seconds = self._seconds / 2
+        elif not churn:
+            seconds = self._seconds * QUIET_GROWTH
+        else:
+            seconds = self._seconds
+        self._seconds = self._clamp(seconds)
+        return self.interval
+
+    def failure(self) -> timedelta:
+        """Return the interval after a failed refresh.
+
+        The backoff doubles the last healthy interval with each consecutive
+        failure, and the delay is drawn from its upper half so entries
+        recovering together spread out.
+        """
+        if not self.failures:
+            self._backoff_base = self._seconds
+        self.failures += 1
+        backoff = self._clamp(self._backoff_base * 2**self.failures, self.failure_maximum)
+        self._seconds = self._clamp(
+            self._rng.uniform(backoff / 2, backoff), self.failure_maximum
+        )
+        return self.interval
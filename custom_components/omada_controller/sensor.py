@@ -0,0 +1,399 @@
+"""Sensors for the Omada Controller's sites, APs and SSIDs, and its refresh path.
+
+Per-client rate sensors can be added in the options.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+import time
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import (
+    PERCENTAGE,
+    EntityCategory,
+    UnitOfDataRate,
+    UnitOfInformation,
+    UnitOfTime,
+)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .aggregates import AP, SITE, SSID, Aggregate
+from .const import CONF_THROUGHPUT_SENSORS, DOMAIN, THROUGHPUT_SENSOR_WINDOW
+from .controller import OmadaControllerData, OmadaControllerDataUpdateCoordinator
+
+
+def _stage_ms(stage: str, pct: float | None = None) -> Callable[[OmadaControllerData], float | None]:
+    """Return a value function reading a refresh stage's histogram."""
+
+    def value(data: OmadaControllerData) -> float | None:
+        if (histogram := data.metrics.stages.get(stage)) is None:
+            return None
+        return round(histogram.last, 1) if pct is None else histogram.percentile(pct)
+
+    return value
+
+
+def _fingerprint_hit_rate(data: OmadaControllerData) -> float | None:
+    """Return the percentage of site fetches that found the site unchanged."""
+    if (rate := data.metrics.fingerprint_hit_rate) is None:
+        return None
+    return round(rate * 100, 1)
+
+
+def _budget_saturation(data: OmadaControllerData) -> float | None:
+    """Return the percentage of requests that waited for the request budget."""
+    if (saturation := data.api.budget.saturation) is None:
+        return None
+    return round(saturation * 100, 1)
+
+
+@dataclass(frozen=True, kw_only=True)
+class OmadaControllerSensorEntityDescription(SensorEntityDescription):
+    """Describes an Omada Controller diagnostic sensor."""
+
+    value_fn: Callable[[OmadaControllerData], float | int | None]
+
+
+SENSORS: tuple[OmadaControllerSensorEntityDescription, ...] = (
+    OmadaControllerSensorEntityDescription(
+        key="refresh_duration",
+        name="Refresh duration",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_stage_ms("refresh"),
+    ),
+    OmadaControllerSensorEntityDescription(
+        key="refresh_duration_p95",
+        name="Refresh duration (95th percentile)",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        value_fn=_stage_ms("refresh", 95),
+    ),
+    OmadaControllerSensorEntityDescription(
+        key="update_devices_duration",
+        name="Device update duration",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_stage_ms("update_devices"),
+    ),
+    OmadaControllerSensorEntityDescription(
+        key="requests",
+        name="Requests",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda data: data.metrics.requests,
+    ),
+    OmadaControllerSensorEntityDescription(
+        key="request_errors",
+        name="Request errors",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda data: data.metrics.request_errors,
+    ),
+    OmadaControllerSensorEntityDescription(
+        key="bytes_received",
+        name="Data received",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        suggested_unit_of_measurement=UnitOfInformation.MEBIBYTES,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda data: data.metrics.bytes_received,
+    ),
+    OmadaControllerSensorEntityDescription(
+        key="fingerprint_hit_rate",
+        name="Unchanged site fetches",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_fingerprint_hit_rate,
+    ),
+    OmadaControllerSensorEntityDescription(
+        key="budget_saturation",
+        name="Request budget saturation",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_budget_saturation,
+    ),
+    OmadaControllerSensorEntityDescription(
+        key="tracked_devices",
+        name="Tracked devices",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda data: len(data.devices),
+    ),
+    OmadaControllerSensorEntityDescription(
+        key="clients",
+        name="Clients reported",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda data: sum(data.metrics.clients_per_site.values()),
+    ),
+    OmadaControllerSensorEntityDescription(
+        key="devices_added",
+        name="Devices added",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda data: data.metrics.devices_added,
+    ),
+    OmadaControllerSensorEntityDescription(
+        key="devices_removed",
+        name="Devices removed",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda data: data.metrics.devices_removed,
+    ),
+    OmadaControllerSensorEntityDescription(
+        key="state_writes",
+        name="State writes",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda data: data.metrics.state_writes,
+    ),
+    OmadaControllerSensorEntityDescription(
+        key="state_writes_skipped",
+        name="State writes skipped",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda data: data.metrics.state_writes_skipped,
+    ),
+)
+
+
+@dataclass(frozen=True, kw_only=True)
+class OmadaControllerAggregateSensorEntityDescription(SensorEntityDescription):
+    """Describes a total over the connected clients of a site, AP or SSID."""
+
+    value_fn: Callable[[Aggregate], int]
+
+
+AGGREGATE_SENSORS: tuple[OmadaControllerAggregateSensorEntityDescription, ...] = (
+    OmadaControllerAggregateSensorEntityDescription(
+        key="clients",
+        name="clients",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda aggregate: aggregate.clients,
+    ),
+    OmadaControllerAggregateSensorEntityDescription(
+        key="rx_rate",
+        name="receive rate",
+        device_class=SensorDeviceClass.DATA_RATE,
+        native_unit_of_measurement=UnitOfDataRate.KILOBITS_PER_SECOND,
+        suggested_unit_of_measurement=UnitOfDataRate.MEGABITS_PER_SECOND,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda aggregate: aggregate.rx_rate,
+    ),
+    OmadaControllerAggregateSensorEntityDescription(
+        key="tx_rate",
+        name="transmit rate",
+        device_class=SensorDeviceClass.DATA_RATE,
+        native_unit_of_measurement=UnitOfDataRate.KILOBITS_PER_SECOND,
+        suggested_unit_of_measurement=UnitOfDataRate.MEGABITS_PER_SECOND,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda aggregate: aggregate.tx_rate,
+    ),
+)
+
+_GROUP_LABELS = {SITE: "Site", AP: "AP", SSID: "SSID"}
+
+
+@dataclass(frozen=True, kw_only=True)
+class OmadaControllerThroughputSensorEntityDescription(SensorEntityDescription):
+    """Describes a client's rate, averaged over its recent throughput samples."""
+
+    rate_index: int
+
+
+THROUGHPUT_SENSORS: tuple[OmadaControllerThroughputSensorEntityDescription, ...] = (
+    OmadaControllerThroughputSensorEntityDescription(
+        key="rx_rate",
+        name="receive rate",
+        rate_index=0,
+    ),
+    OmadaControllerThroughputSensorEntityDescription(
+        key="tx_rate",
+        name="transmit rate",
+        rate_index=1,
+    ),
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up the diagnostic sensors for Omada Controller component."""
+    coordinator: OmadaControllerDataUpdateCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    async_add_entities(
+        OmadaControllerDiagnosticSensor(coordinator, description) for description in SENSORS
+    )
+
+    groups: dict[tuple[str, str], list[OmadaControllerAggregateSensor]] = {}
+    available = coordinator.last_update_success
+
+    @callback
+    def async_update_groups() -> None:
+        """Add sensors for new groups and write the state of the changed ones."""
+        nonlocal available
+        changed = coordinator.api.aggregates.pop_changed()
+        new: list[OmadaControllerAggregateSensor] = []
+        for group in changed - groups.keys():
+            groups[group] = [
+                OmadaControllerAggregateSensor(coordinator, group, description)
+                for description in AGGREGATE_SENSORS
+            ]
+            new.extend(groups[group])
+        if new:
+            async_add_entities(new)
+        if available != coordinator.last_update_success:
+            available = coordinator.last_update_success
+            changed = set(groups)
+        for group in changed:
+            for sensor in groups[group]:
+                if sensor.hass is not None:
+                    sensor.async_write_ha_state()
+
+    config_entry.async_on_unload(coordinator.async_add_listener(async_update_groups))
+    async_update_groups()
+
+    if not config_entry.options.get(CONF_THROUGHPUT_SENSORS):
+        return
+
+    clients: set[str] = set()
+
+    @callback
+    def async_add_clients() -> None:
+        """Add the rate sensors of the clients with a throughput history."""
+        if new := coordinator.api.history.keys() - clients:
+            clients.update(new)
+            async_add_entities(
+                OmadaControllerThroughputSensor(coordinator, mac, description)
+                for mac in new
+                for description in THROUGHPUT_SENSORS
+            )
+
+    config_entry.async_on_unload(coordinator.async_add_listener(async_add_clients))
+    async_add_clients()
+
+
+class OmadaControllerDiagnosticSensor(
+    CoordinatorEntity[OmadaControllerDataUpdateCoordinator], SensorEntity
+):
+    """A measurement of the controller's refresh path, disabled by default."""
+
+    entity_description: OmadaControllerSensorEntityDescription
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_has_entity_name = True
+
+    def __init__(
+        self,
+        coordinator: OmadaControllerDataUpdateCoordinator,
+        description: OmadaControllerSensorEntityDescription,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_unique_id = f"{coordinator.config_entry.entry_id}_{description.key}"
+        self._attr_device_info = DeviceInfo(
+            connections={(DOMAIN, coordinator.serial_num)},
+            name=coordinator.hostname,
+        )
+
+    @property
+    def native_value(self) -> float | int | None:
+        """Return the measured value."""
+        return self.entity_description.value_fn(self.coordinator.api)
+
+
+class OmadaControllerAggregateSensor(SensorEntity):
+    """A total over the connected clients of a site, AP or SSID.
+
+    The state is written by the platform when the group changed, rather
+    than by every sensor listening to the coordinator.
+    """
+
+    entity_description: OmadaControllerAggregateSensorEntityDescription
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+
+    def __init__(
+        self,
+        coordinator: OmadaControllerDataUpdateCoordinator,
+        group: tuple[str, str],
+        description: OmadaControllerAggregateSensorEntityDescription,
+    ) -> None:
+        """Initialize the sensor."""
+        self.coordinator = coordinator
+        self.entity_description = description
+        kind, name = group
+        self._aggregate = coordinator.api.aggregates.groups[group]
+        self._attr_name = f"{_GROUP_LABELS[kind]} {name} {description.name}"
+        self._attr_unique_id = (
+            f"{coordinator.config_entry.entry_id}_{kind}_{name}_{description.key}"
+        )
+        self._attr_device_info = DeviceInfo(
+            connections={(DOMAIN, coordinator.serial_num)},
+            name=coordinator.hostname,
+        )
+
+    @property
+    def available(self) -> bool:
+        """Return if the last refresh of the controller succeeded."""
+        return self.coordinator.last_update_success
+
+    @property
+    def native_value(self) -> int:
+        """Return the total."""
+        return self.entity_description.value_fn(self._aggregate)
+
+
+class OmadaControllerThroughputSensor(
+    CoordinatorEntity[OmadaControllerDataUpdateCoordinator], SensorEntity
+):
+    """A client's rate, averaged over the last THROUGHPUT_SENSOR_WINDOW seconds.
+
+    The state is only written when the rounded rate or the availability changed.
+    """
+
+    entity_description: OmadaControllerThroughputSensorEntityDescription
+    _attr_device_class = SensorDeviceClass.DATA_RATE
+    _attr_native_unit_of_measurement = UnitOfDataRate.KILOBITS_PER_SECOND
+    _attr_suggested_unit_of_measurement = UnitOfDataRate.MEGABITS_PER_SECOND
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(
+        self,
+        coordinator: OmadaControllerDataUpdateCoordinator,
+        mac: str,
+        description: OmadaControllerThroughputSensorEntityDescription,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._mac = mac
+        device = coordinator.api.devices.get(mac)
+        self._attr_name = f"{device.name if device else mac} {description.name}"
+        self._attr_unique_id = f"{mac}_{description.key}"
+        self._attr_native_value = self._rate()
+        self._written = (self.available, self._attr_native_value)
+
+    def _rate(self) -> int | None:
+        history = self.coordinator.api.history.get(self._mac)
+        if history is None:
+            return None
+        rates = history.mean_rates(time.time() - THROUGHPUT_SENSOR_WINDOW)
+        return None if rates is None else round(rates[self.entity_description.rate_index])
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state if the rate or the availability changed."""
+        self._attr_native_value = self._rate()
+        if (state := (self.available, self._attr_native_value)) != self._written:
+            self._written = state
+            self.async_write_ha_state()
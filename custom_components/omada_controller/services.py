@@ -0,0 +1,193 @@
+"""Services for the Omada Controller component."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers import (
+    config_validation as cv,
+    device_registry as dr,
+    entity_registry as er,
+)
+import homeassistant.util.dt as dt_util
+
+from .const import (
+    DEFAULT_PRESENCE_QUERY_LIMIT,
+    DEFAULT_PROFILE_REFRESHES,
+    DOMAIN,
+    MAX_PRESENCE_QUERY_LIMIT,
+    MAX_PROFILE_REFRESHES,
+    SERVICE_GET_PRESENCE_TRANSITIONS,
+    SERVICE_GET_THROUGHPUT_HISTORY,
+    SERVICE_PROFILE_REFRESH,
+)
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_END = "end"
+ATTR_LIMIT = "limit"
+ATTR_MAC = "mac"
+ATTR_REFRESHES = "refreshes"
+ATTR_START = "start"
+ATTR_WINDOW = "window"
+
+GET_THROUGHPUT_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Optional(ATTR_WINDOW): vol.All(vol.Coerce(int), vol.Range(min=1)),
+    }
+)
+
+GET_PRESENCE_TRANSITIONS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+        vol.Optional(ATTR_MAC): vol.All(
+            cv.string, dr.format_mac, vol.Match(r"^([0-9a-f]{2}:){5}[0-9a-f]{2}$")
+        ),
+        vol.Optional(ATTR_LIMIT, default=DEFAULT_PRESENCE_QUERY_LIMIT): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=MAX_PRESENCE_QUERY_LIMIT)
+        ),
+    }
+)
+
+PROFILE_REFRESH_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_REFRESHES, default=DEFAULT_PROFILE_REFRESHES): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=MAX_PROFILE_REFRESHES)
+        ),
+    }
+)
+
+
+def _as_utc(value: datetime | None) -> datetime | None:
+    """Return a service's time in UTC, taking one without a time zone as local."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    return dt_util.as_utc(value)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the component."""
+
+    async def async_get_throughput_history(call: ServiceCall) -> ServiceResponse:
+        """Return the throughput history of the clients behind device trackers.
+
+        With a ``window``, the samples are summarized per window of that many
+        seconds; otherwise they are returned as they were taken.
+        """
+        registry = er.async_get(hass)
+        window: int | None = call.data.get(ATTR_WINDOW)
+        response: dict[str, Any] = {}
+        for entity_id in call.data[ATTR_ENTITY_ID]:
+            entry = registry.async_get(entity_id)
+            coordinator = (
+                hass.data.get(DOMAIN, {}).get(entry.config_entry_id) if entry else None
+            )
+            if entry is None or entry.platform != DOMAIN or coordinator is None:
+                raise ServiceValidationError(
+                    f"{entity_id} is not a loaded Omada Controller device tracker"
+                )
+            history = coordinator.api.history.get(entry.unique_id)
+            if history is None:
+                response[entity_id] = {"mac": entry.unique_id, "samples": []}
+            elif window is None:
+                response[entity_id] = {
+                    "mac": entry.unique_id,
+                    "samples": [
+                        {
+                            "time": dt_util.utc_from_timestamp(timestamp).isoformat(),
+                            "rx_rate": rx_rate,
+                            "tx_rate": tx_rate,
+                            "downloaded": downloaded,
+                            "uploaded": uploaded,
+                        }
+                        for timestamp, rx_rate, tx_rate, downloaded, uploaded in history.samples()
+                    ],
+                }
+            else:
+                windows = history.downsample(window)
+                for summary in windows:
+                    summary["start"] = dt_util.utc_from_timestamp(summary["start"]).isoformat()
+                response[entity_id] = {"mac": entry.unique_id, "windows": windows}
+        return response
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_THROUGHPUT_HISTORY,
+        async_get_throughput_history,
+        schema=GET_THROUGHPUT_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def async_get_presence_transitions(call: ServiceCall) -> ServiceResponse:
+        """Return the presence transitions of a config entry's clients, oldest first.
+
+        Only the part of the log in the time range is read, and
+        ``truncated`` says whether more transitions than ``limit`` were in it.
+        """
+        entry_id: str = call.data[ATTR_CONFIG_ENTRY_ID]
+        coordinator = hass.data.get(DOMAIN, {}).get(entry_id)
+        if coordinator is None or coordinator.presence_log is None:
+            raise ServiceValidationError(
+                f"{entry_id} is not a loaded Omada Controller entry with a presence log"
+            )
+        end = _as_utc(call.data.get(ATTR_END)) or dt_util.utcnow()
+        start = _as_utc(call.data.get(ATTR_START)) or end - timedelta(days=1)
+        transitions, truncated = await coordinator.presence_log.async_query(
+            start.timestamp(), end.timestamp(), call.data.get(ATTR_MAC), call.data[ATTR_LIMIT]
+        )
+        return {"transitions": transitions, "truncated": truncated}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_PRESENCE_TRANSITIONS,
+        async_get_presence_transitions,
+        schema=GET_PRESENCE_TRANSITIONS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def async_profile_refresh(call: ServiceCall) -> ServiceResponse:
+        """Profile the next refreshes of a config entry.
+
+        The profile and a summary of its top functions are written to the
+        config directory once the refreshes are done. When a response is
+        asked for, the call waits until then and returns where they went,
+        along with the top functions.
+        """
+        entry_id: str = call.data[ATTR_CONFIG_ENTRY_ID]
+        if (coordinator := hass.data.get(DOMAIN, {}).get(entry_id)) is None:
+            raise ServiceValidationError(f"{entry_id} is not a loaded Omada Controller entry")
+        profiler = coordinator.async_start_profiling(call.data[ATTR_REFRESHES])
+        if not call.return_response:
+            return None
+        try:
+            return await asyncio.shield(profiler.done)
+        except asyncio.CancelledError:
+            if not profiler.done.cancelled():
+                raise
+        raise HomeAssistantError("Profiling stopped before the refreshes were profiled")
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE_REFRESH,
+        async_profile_refresh,
+        schema=PROFILE_REFRESH_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
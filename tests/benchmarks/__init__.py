@@ -0,0 +1 @@
+"""Benchmarks for the Omada Controller integration's hot paths."""
@@ -0,0 +1,78 @@
+"""Benchmark the memory and attribute access cost of the Device model.
+
+Run with ``python -m tests.benchmarks.bench_device``.
+"""
+from __future__ import annotations
+
+import argparse
+from collections.abc import Callable
+import gc
+import timeit
+import tracemalloc
+
+from custom_components.omada_controller.device import Device
+
+from ..common import make_client
+
+
+def _traced(build: Callable[[], object]) -> int:
+    """Return the bytes still allocated by ``build`` once its result is kept."""
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current
+
+
+def measure_memory(count: int) -> tuple[float, float]:
+    """Return the bytes per client kept as a raw dict and as a Device."""
+    raw = _traced(lambda: [make_client(i) for i in range(count)])
+
+    def build_devices() -> list[Device]:
+        return [
+            Device(client["mac"], client) for client in map(make_client, range(count))
+        ]
+
+    return raw / count, _traced(build_devices) / count
+
+
+def measure_attrs(count: int, repeat: int) -> tuple[float, float]:
+    """Return the seconds per ``attrs`` access on an unchanged and a changed device."""
+    devices = [
+        Device(client["mac"], client) for client in map(make_client, range(count))
+    ]
+    unchanged = timeit.timeit(lambda: [d.attrs for d in devices], number=repeat)
+
+    updates = [make_client(i, last_seen=i) | {"uptime": i} for i in range(count)]
+
+    def update_and_read() -> None:
+        for device, client in zip(devices, updates):
+            client["uptime"] += 1
+            device.update(client)
+            device.attrs
+
+    changed = timeit.timeit(update_and_read, number=repeat)
+    return unchanged / (count * repeat), changed / (count * repeat)
+
+
+def main() -> None:
+    """Run the benchmark and print a short report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    per_dict, per_device = measure_memory(args.devices)
+    unchanged, changed = measure_attrs(args.devices, args.repeat)
+    print(f"devices:               {args.devices}")
+    print(f"raw client dict:       {per_dict:.0f} B")
+    print(f"Device:                {per_device:.0f} B")
+    print(f"attrs (cached):        {unchanged * 1e9:.0f} ns")
+    print(f"update + attrs:        {changed * 1e9:.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Load benchmark of the refresh hot path against the fake controller.
+
+Each tick advances the fake network, then times one full refresh through
+``OmadaControllerData.async_update_devices``.
+
+Run with ``python -m tests.benchmarks.bench_refresh --sites 40 --clients 250``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import resource
+import statistics
+import time
+import tracemalloc
+
+from aiohttp import ClientSession, CookieJar
+from homeassistant.const import CONF_PASSWORD, CONF_URL, CONF_USERNAME, CONF_VERIFY_SSL
+from homeassistant.helpers.update_coordinator import UpdateFailed
+
+from custom_components.omada_controller.const import (
+    CONF_MAX_IN_FLIGHT,
+    CONF_REQUEST_RATE,
+    CONF_SITE_CONCURRENCY,
+)
+from custom_components.omada_controller.controller import (
+    OmadaController,
+    OmadaControllerData,
+)
+from custom_components.omada_controller.policy import AttributeFilter
+
+from ..fake_controller import PASSWORD, USERNAME, FakeOmadaController
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Return the ``pct`` percentile of the samples, by nearest rank."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the benchmark and print a short report."""
+    fake = FakeOmadaController(
+        sites=args.sites,
+        clients_per_site=args.clients,
+        churn=args.churn,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+    )
+    await fake.start()
+    session = ClientSession(cookie_jar=CookieJar(unsafe=True))
+    config = {
+        CONF_URL: fake.url,
+        CONF_USERNAME: USERNAME,
+        CONF_PASSWORD: PASSWORD,
+        CONF_VERIFY_SSL: False,
+        CONF_SITE_CONCURRENCY: args.concurrency,
+        CONF_REQUEST_RATE: args.request_rate,
+        CONF_MAX_IN_FLIGHT: args.max_in_flight,
+    }
+    data = OmadaControllerData(OmadaController(session, config))
+    if args.attribute_filter:
+        data.attribute_filter = AttributeFilter.from_options({})
+    latencies: list[float] = []
+    writes: list[int] = []
+    failures = 0
+    try:
+        await data.api.login()
+        await data.async_update_devices()
+        for _ in range(args.ticks):
+            fake.tick()
+            start = time.perf_counter()
+            try:
+                await data.async_update_devices()
+            except UpdateFailed:
+                failures += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            writes.append(len(data.changes.added) + len(data.changes.changed))
+
+        # Tracing slows everything down, so peak memory gets a refresh of its own.
+        fake.tick()
+        tracemalloc.start()
+        try:
+            await data.async_update_devices()
+        except UpdateFailed:
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        await session.close()
+        await fake.close()
+
+    print(
+        f"sites: {args.sites}  clients/site: {args.clients}  churn: {args.churn:.1%}"
+        f"  latency: {args.latency * 1000:.0f}ms  error rate: {args.error_rate:.1%}"
+    )
+    print(f"devices tracked:       {len(data.devices)}")
+    print(f"refreshes:             {len(latencies)} ok, {failures} failed")
+    if latencies:
+        print(
+            "refresh latency (ms):  "
+            + "  ".join(
+                f"p{pct}={percentile(latencies, pct) * 1000:.1f}"
+                for pct in (50, 90, 99)
+            )
+            + f"  max={max(latencies) * 1000:.1f}"
+        )
+        mean_writes = statistics.mean(writes)
+        print(f"state writes per tick: mean={mean_writes:.1f}  max={max(writes)}")
+    if (hit_rate := data.metrics.fingerprint_hit_rate) is not None:
+        print(f"unchanged sites:       {hit_rate:.1%}")
+    budget = data.api.budget
+    if (saturation := budget.saturation) is not None:
+        print(
+            f"request budget:        {saturation:.1%} waited or rejected"
+            f"  wait p90={budget.wait.percentile(90) or 0:.1f}ms"
+            f"  rejected={budget.rejected}"
+        )
+    print(f"peak refresh memory:   {peak / 2**20:.1f} MiB")
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"max RSS:               {max_rss:.1f} MiB")
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=300, help="clients per site")
+    parser.add_argument(
+        "--churn", type=float, default=0.01, help="share replaced per tick"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.005, help="seconds per request"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="extra random latency"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="sites fetched at once"
+    )
+    parser.add_argument("--ticks", type=int, default=50)
+    parser.add_argument(
+        "--request-rate", type=int, default=1000, help="requests per second"
+    )
+    parser.add_argument(
+        "--max-in-flight", type=int, default=16, help="requests at once"
+    )
+    parser.add_argument(
+        "--attribute-filter",
+        action="store_true",
+        help="hold back small attribute changes, as entries do by default",
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Common helpers for the Omada Controller tests."""
+from __future__ import annotations
+
+import random
+from typing import Any
+
+
+def make_mac(index: int, prefix: int = 0xAA) -> str:
+    """Return a deterministic client MAC in the controller's format."""
+    return f"{prefix:02X}-" + "-".join(f"{b:02X}" for b in index.to_bytes(5, "big"))
+
+
+def make_client(
+    index: int,
+    site: str = "Default",
+    ap_count: int = 8,
+    last_seen: int = 1_700_000_000_000,
+    rng: random.Random | None = None,
+) -> dict[str, Any]:
+    """Return a client record shaped like the controller's ``clients`` response.
+
+    The record carries the full set of fields a real controller sends, most of
+    which the integration never uses.
+    """
+    rng = rng or random.Random(index)
+    ap = index % ap_count
+    return {
+        "id": f"{index:024x}",
+        "mac": make_mac(index),
+        "name": f"client-{index}",
+        "hostName": f"client-{index}",
+        "deviceType": "unknown",
+        "ip": f"10.{(index >> 16) & 0xFF}.{(index >> 8) & 0xFF}.{index & 0xFF}",
+        "ipv6List": [],
+        "connectType": 1,
+        "connectDevType": "ap",
+        "connectedToWirelessRouter": False,
+        "wireless": True,
+        "ssid": f"{site}-wifi",
+        "signalLevel": rng.randint(20, 100),
+        "healthScore": -1,
+        "signalRank": rng.randint(1, 5),
+        "wifiMode": 5,
+        "apName": f"{site}-ap-{ap}",
+        "apMac": make_mac(ap, prefix=0x50),
+        "radioId": rng.randint(0, 1),
+        "channel": rng.choice([1, 6, 11, 36, 44, 149]),
+        "rxRate": rng.randint(1000, 866000),
+        "txRate": rng.randint(1000, 866000),
+        "powerSave": False,
+        "rssi": -rng.randint(30, 90),
+        "snr": rng.randint(5, 60),
+        "vid": 0,
+        "activity": rng.randint(0, 100000),
+        "trafficDown": rng.randint(0, 10**10),
+        "trafficUp": rng.randint(0, 10**9),
+        "uptime": rng.randint(0, 10**6),
+        "lastSeen": last_seen,
+        "authStatus": 0,
+        "guest": False,
+        "active": True,
+        "manager": False,
+        "downPacket": rng.randint(0, 10**8),
+        "upPacket": rng.randint(0, 10**8),
+        "support5g": True,
+        "standardPort": "",
+        "blocked": False,
+        "dot1xVlan": 0,
+    }
@@ -0,0 +1,71 @@
+"""Fixtures for the Omada Controller tests."""
+from aiohttp import ClientSession, CookieJar
+import pytest
+import pytest_asyncio
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.omada_controller.const import DOMAIN
+from custom_components.omada_controller.controller import (
+    OmadaController,
+    OmadaControllerData,
+)
+
+from .fake_controller import FakeOmadaController
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """Let every test load the integration from custom_components."""
+    yield
+
+
+@pytest.fixture
+def add_entry(hass):
+    """Return a function that adds a config entry for a fake controller."""
+
+    def add_entry(fake, data=None, options=None):
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={**fake.entry_data, **(data or {})},
+            options=options or {},
+        )
+        entry.add_to_hass(hass)
+        return entry
+
+    return add_entry
+
+
+@pytest_asyncio.fixture
+async def fake_controller(socket_enabled):
+    """Serve a fake controller with three sites of a few clients each."""
+    fake = FakeOmadaController(sites=3, clients_per_site=5)
+    await fake.start()
+    yield fake
+    await fake.close()
+
+
+@pytest_asyncio.fixture
+async def api(fake_controller):
+    """Return an API client for the fake controller."""
+    session = ClientSession(cookie_jar=CookieJar(unsafe=True))
+    yield OmadaController(session, fake_controller.entry_data)
+    await session.close()
+
+
+@pytest_asyncio.fixture
+async def data(api):
+    """Return the devices tracked on the fake controller's Default site."""
+    data = OmadaControllerData(api)
+    data.site_filter = frozenset({"Default"})
+    return data
+
+
+@pytest_asyncio.fixture
+async def refresh(fake_controller, data):
+    """Return a function that refreshes ``data`` with the given Default clients."""
+
+    async def refresh(clients):
+        fake_controller.site("Default").clients = [dict(client) for client in clients]
+        await data.async_update_devices()
+
+    return refresh
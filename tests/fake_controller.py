@@ -0,0 +1,280 @@
+"""An in-process stand-in for an Omada controller's HTTP API."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import random
+import time
+from typing import Any
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from homeassistant.const import (
+    CONF_NAME,
+    CONF_PASSWORD,
+    CONF_URL,
+    CONF_USERNAME,
+    CONF_VERIFY_SSL,
+)
+
+from .common import make_client
+
+CONTROLLER_ID = "fakeomadac0001"
+USERNAME = "admin"
+PASSWORD = "secret"
+SESSION_EXPIRED = -1005
+INVALID_CREDENTIALS = -30109
+
+
+def event_line(kind: str, client: dict[str, Any], ap: str | None = None) -> str:
+    """Return the line the controller logs when a client connects, leaves or roams."""
+    who = f"[client:{client['name']}:{client['mac']}]"
+    to_ap = f"[ap:{ap or client['apName']}:{client['apMac']}]"
+    ssid = f'SSID "{client["ssid"]}"'
+    if kind == "connected":
+        return f"{who} was connected to {to_ap} with {ssid} on channel 36."
+    if kind == "disconnected":
+        return f"{who} was disconnected from {ssid} on {to_ap}."
+    from_ap = f"[ap:{client['apName']}:{client['apMac']}]"
+    return f"{who} is roaming from {from_ap} to {to_ap} with {ssid}."
+
+
+def event_payload(
+    site: str, lines: list[str], timestamp: int | None = None
+) -> dict[str, Any]:
+    """Return a webhook message as the controller posts it."""
+    return {
+        "Site": site,
+        "description": "This is a webhook message from Omada Controller",
+        "shardSecret": "",
+        "text": lines,
+        "Controller": "Omada Controller",
+        "timestamp": timestamp if timestamp is not None else int(time.time() * 1000),
+    }
+
+
+@dataclass
+class FakeSite:
+    """A site and the clients currently active on it."""
+
+    name: str
+    key: str
+    clients: list[dict[str, Any]]
+
+
+class FakeOmadaController:
+    """Serve the controller endpoints the integration uses from generated data.
+
+    ``latency`` (seconds, plus up to ``jitter``) delays every response and
+    ``error_rate`` is the chance that a clients request fails with a 500;
+    sites named in ``failing_sites`` always fail. The next ``fail_next``
+    requests of any kind fail with a 503, as during an outage.
+    ``round_trips`` counts the times a request started while none were in
+    flight, so requests sent together count once.
+    ``tick()`` advances the network: ``churn`` of each site's clients leave
+    and are replaced by new ones, and the rest see their counters move on.
+    The connects and disconnects are queued as webhook messages, which
+    ``post_events()`` sends the way the controller's webhook does.
+    """
+
+    def __init__(
+        self,
+        sites: int = 1,
+        clients_per_site: int = 10,
+        churn: float = 0.0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        """Generate the sites and their clients."""
+        self.churn = churn
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.failing_sites: set[str] = set()
+        self.fail_next = 0
+        self.rng = random.Random(seed)
+        self.sites: list[FakeSite] = []
+        self._next_client = 0
+        for index in range(sites):
+            name = "Default" if index == 0 else f"Site {index}"
+            site = FakeSite(name, f"site{index:04d}", [])
+            site.clients = [self._new_client(site) for _ in range(clients_per_site)]
+            self.sites.append(site)
+        self.token: str | None = None
+        self.logins = 0
+        self.requests: dict[str, int] = {}
+        self.in_flight = 0
+        self.round_trips = 0
+        self.events: list[dict[str, Any]] = []
+        self.server: TestServer | None = None
+
+    def _new_client(self, site: FakeSite) -> dict[str, Any]:
+        self._next_client += 1
+        return make_client(self._next_client, site=site.name, rng=self.rng)
+
+    @property
+    def url(self) -> str:
+        """Return the base URL of the running server."""
+        assert self.server is not None
+        return str(self.server.make_url("")).rstrip("/")
+
+    @property
+    def entry_data(self) -> dict[str, Any]:
+        """Return the config entry data for this controller."""
+        return {
+            CONF_NAME: "Omada",
+            CONF_URL: self.url,
+            CONF_USERNAME: USERNAME,
+            CONF_PASSWORD: PASSWORD,
+            CONF_VERIFY_SSL: False,
+        }
+
+    @property
+    def site_keys(self) -> dict[str, str]:
+        """Return the site keys by name, as the integration stores them."""
+        return {site.name: site.key for site in self.sites}
+
+    def site(self, name: str) -> FakeSite:
+        """Return the site with the given name."""
+        return next(site for site in self.sites if site.name == name)
+
+    def expire_session(self) -> None:
+        """Invalidate the current token, as the controller does after a timeout."""
+        self.token = None
+
+    def tick(self) -> None:
+        """Replace a share of every site's clients and advance the rest."""
+        for site in self.sites:
+            leaving = int(len(site.clients) * self.churn)
+            lines = []
+            for index in self.rng.sample(range(len(site.clients)), leaving):
+                lines.append(event_line("disconnected", site.clients[index]))
+                site.clients[index] = self._new_client(site)
+                lines.append(event_line("connected", site.clients[index]))
+            for client in site.clients:
+                client["uptime"] += 10
+                client["lastSeen"] += 10_000
+                client["trafficDown"] += self.rng.randint(0, 10**6)
+            if lines:
+                self.events.append(event_payload(site.name, lines))
+
+    async def post_events(self, session: Any, url: str) -> None:
+        """Post the queued webhook messages to ``url`` and clear the queue."""
+        events, self.events = self.events, []
+        for payload in events:
+            async with session.post(url, json=payload) as response:
+                assert response.status == 200
+
+    def make_app(self) -> web.Application:
+        """Return the web application serving the fake API."""
+        app = web.Application(middlewares=[self._middleware])
+        base = f"/{CONTROLLER_ID}/api/v2"
+        app.router.add_get("/api/info", self._info)
+        app.router.add_post("/api/v2/login", self._login)
+        app.router.add_get(f"{base}/loginStatus", self._login_status)
+        app.router.add_get(f"{base}/users/current", self._current_user)
+        app.router.add_get(f"{base}/sites/{{site_key}}/clients", self._clients)
+        return app
+
+    async def start(self) -> str:
+        """Start serving on a local port and return the base URL."""
+        self.server = TestServer(self.make_app())
+        await self.server.start_server()
+        return self.url
+
+    async def close(self) -> None:
+        """Stop serving."""
+        if self.server is not None:
+            await self.server.close()
+            self.server = None
+
+    @web.middleware
+    async def _middleware(
+        self, request: web.Request, handler: Any
+    ) -> web.StreamResponse:
+        route = request.match_info.route.resource
+        path = route.canonical if route is not None else request.path
+        self.requests[path] = self.requests.get(path, 0) + 1
+        if not self.in_flight:
+            self.round_trips += 1
+        self.in_flight += 1
+        try:
+            if self.latency or self.jitter:
+                await asyncio.sleep(self.latency + self.rng.uniform(0, self.jitter))
+            if self.fail_next:
+                self.fail_next -= 1
+                return web.Response(status=503, text="Service Unavailable")
+            return await handler(request)
+        finally:
+            self.in_flight -= 1
+
+    @staticmethod
+    def _ok(result: Any) -> web.Response:
+        return web.json_response({"errorCode": 0, "msg": "Success.", "result": result})
+
+    def _authorized(self, request: web.Request) -> bool:
+        return self.token is not None and request.query.get("token") == self.token
+
+    async def _info(self, request: web.Request) -> web.Response:
+        return self._ok(
+            {
+                "omadacId": CONTROLLER_ID,
+                "type": 1,
+                "controllerVer": "5.9.31",
+                "apiVer": "3",
+            }
+        )
+
+    async def _login(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if (body.get("username"), body.get("password")) != (USERNAME, PASSWORD):
+            return web.json_response(
+                {
+                    "errorCode": INVALID_CREDENTIALS,
+                    "msg": "Invalid username or password.",
+                }
+            )
+        self.logins += 1
+        self.token = f"token-{self.logins}"
+        return self._ok({"roleType": 0, "token": self.token})
+
+    async def _login_status(self, request: web.Request) -> web.Response:
+        return self._ok({"login": self._authorized(request)})
+
+    async def _current_user(self, request: web.Request) -> web.Response:
+        if not self._authorized(request):
+            return web.json_response(
+                {"errorCode": SESSION_EXPIRED, "msg": "Session expired."}
+            )
+        sites = [{"name": site.name, "key": site.key} for site in self.sites]
+        return self._ok({"name": USERNAME, "privilege": {"sites": sites}})
+
+    async def _clients(self, request: web.Request) -> web.Response:
+        if not self._authorized(request):
+            return web.json_response(
+                {"errorCode": SESSION_EXPIRED, "msg": "Session expired."}
+            )
+        site = next(
+            (s for s in self.sites if s.key == request.match_info["site_key"]), None
+        )
+        if site is None:
+            return web.json_response(
+                {"errorCode": -1001, "msg": "Invalid request parameters."}
+            )
+        if site.name in self.failing_sites or (
+            self.error_rate and self.rng.random() < self.error_rate
+        ):
+            return web.Response(status=500, text="Internal Server Error")
+        page = int(request.query.get("currentPage", 1))
+        size = int(request.query.get("currentPageSize", 10))
+        data = site.clients[(page - 1) * size : page * size]
+        return self._ok(
+            {
+                "totalRows": len(site.clients),
+                "currentPage": page,
+                "currentSize": size,
+                "data": data,
+            }
+        )
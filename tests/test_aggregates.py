@@ -0,0 +1,75 @@
+"""Test the aggregates per site, AP and SSID."""
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.omada_controller.aggregates import AP, SITE, SSID, Aggregate
+from custom_components.omada_controller.const import DOMAIN
+
+from .common import make_client
+from .fake_controller import FakeOmadaController
+
+
+async def test_aggregates_follow_device_changes(data, refresh):
+    """Test clients moving, changing rate and leaving only adjust their groups."""
+    data.detection_time = 0
+    one, two = make_client(1), make_client(2)
+    await refresh([one, two])
+    groups = data.aggregates.groups
+    assert groups[(SITE, "Default")] == Aggregate(
+        2, one["rxRate"] + two["rxRate"], one["txRate"] + two["txRate"]
+    )
+    assert groups[(SSID, "Default-wifi")].clients == 2
+    assert data.aggregates.pop_changed() == {
+        (SITE, "Default"),
+        (SSID, "Default-wifi"),
+        (AP, one["apName"]),
+        (AP, two["apName"]),
+    }
+
+    await refresh([{**one, "apName": two["apName"], "rxRate": 5}, two])
+    assert groups[(AP, one["apName"])] == Aggregate()
+    assert groups[(AP, two["apName"])].clients == 2
+    assert groups[(SITE, "Default")].rx_rate == 5 + two["rxRate"]
+    assert (SSID, "Default-wifi") in data.aggregates.pop_changed()
+
+    await refresh([two])
+    assert data.changes.disconnected == {one["mac"]}
+    assert groups[(SITE, "Default")] == Aggregate(1, two["rxRate"], two["txRate"])
+    data.aggregates.pop_changed()
+    await refresh([two])
+    assert not data.aggregates.pop_changed()
+
+
+async def test_aggregate_sensors(hass, tmp_path, socket_enabled, add_entry):
+    """Test a sensor per site, AP and SSID follows its connected clients."""
+    hass.config.config_dir = str(tmp_path)
+    fake = FakeOmadaController(sites=1, clients_per_site=4, churn=0.5)
+    await fake.start()
+    entry = add_entry(fake, options={"detection_time": 0})
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    registry = er.async_get(hass)
+
+    def state(group: str, key: str) -> str:
+        entity_id = registry.async_get_entity_id(
+            "sensor", DOMAIN, f"{entry.entry_id}_{group}_{key}"
+        )
+        return hass.states.get(entity_id).state
+
+    site = fake.site("Default")
+    assert state("site_Default", "clients") == "4"
+    assert state("ssid_Default-wifi", "clients") == "4"
+    rx = sum(client["rxRate"] for client in site.clients)
+    assert float(state("site_Default", "rx_rate")) == rx / 1000
+
+    fake.tick()
+    site.clients.pop()
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+    assert state("site_Default", "clients") == "3"
+    for client in site.clients:
+        expected = sum(other["apName"] == client["apName"] for other in site.clients)
+        assert state(f"ap_{client['apName']}", "clients") == str(expected)
+
+    await hass.config_entries.async_unload(entry.entry_id)
+    await fake.close()
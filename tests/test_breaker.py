@@ -0,0 +1,46 @@
+"""Test the circuit breaker."""
+from custom_components.omada_controller.breaker import CircuitBreaker
+
+
+class Clock:
+    """A clock that only moves when told to."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_opens_after_consecutive_failures():
+    """Test the breaker opens only after enough failures in a row."""
+    clock = Clock()
+    breaker = CircuitBreaker(3, 30, 300, clock)
+    assert not breaker.record_failure()
+    assert not breaker.record_failure()
+    breaker.record_success()
+    assert not breaker.record_failure()
+    assert not breaker.record_failure()
+    assert breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.record_failure()
+
+    clock.now = 30
+    assert breaker.state == "half_open"
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_probes_back_off():
+    """Test each failed probe keeps the breaker open for longer, up to the maximum."""
+    clock = Clock()
+    breaker = CircuitBreaker(1, 30, 100, clock)
+    breaker.record_failure()
+    waits = []
+    for _ in range(4):
+        opened = clock.now
+        while not breaker.probe_due:
+            clock.now += 1
+        waits.append(clock.now - opened)
+        breaker.probe_failed()
+    assert waits == [30, 60, 100, 100]
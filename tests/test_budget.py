@@ -0,0 +1,108 @@
+"""Test the request budget."""
+import asyncio
+
+import pytest
+
+from homeassistant.const import CONF_URL
+
+from custom_components.omada_controller.budget import (
+    PRIORITY_HIGH,
+    PRIORITY_POLL,
+    RequestBudget,
+    async_get_budget,
+)
+from custom_components.omada_controller.const import (
+    CONF_MAX_IN_FLIGHT,
+    CONF_REQUEST_RATE,
+)
+from custom_components.omada_controller.errors import RequestBudgetExceeded
+
+
+class Clock:
+    """A clock that only moves when told to."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def _request(
+    budget: RequestBudget, priority: int, order: list[str], name: str
+) -> None:
+    async with budget.slot(priority):
+        order.append(name)
+
+
+@pytest.mark.asyncio
+async def test_waiters_served_by_priority():
+    """Test a waiting login goes ahead of the polls that waited before it."""
+    budget = RequestBudget(1000, 1)
+    order: list[str] = []
+    async with budget.slot(PRIORITY_POLL):
+        tasks = [
+            asyncio.create_task(_request(budget, priority, order, name))
+            for name, priority in (("poll 1", PRIORITY_POLL), ("poll 2", PRIORITY_POLL))
+        ]
+        await asyncio.sleep(0)
+        tasks.append(
+            asyncio.create_task(_request(budget, PRIORITY_HIGH, order, "login"))
+        )
+        await asyncio.sleep(0)
+        assert budget.in_flight == 1
+        assert budget.as_dict()["queued"] == 3
+    await asyncio.gather(*tasks)
+    assert order == ["login", "poll 1", "poll 2"]
+    assert (budget.requests, budget.waited) == (4, 3)
+    assert budget.saturation == 0.75
+
+
+@pytest.mark.asyncio
+async def test_polls_beyond_the_queue_are_turned_away():
+    """Test only a bounded number of polls wait, while other requests still queue."""
+    budget = RequestBudget(1000, 1, max_queued_polls=1)
+    order: list[str] = []
+    async with budget.slot():
+        waiting = [asyncio.create_task(_request(budget, PRIORITY_POLL, order, "poll"))]
+        await asyncio.sleep(0)
+        with pytest.raises(RequestBudgetExceeded):
+            await _request(budget, PRIORITY_POLL, order, "rejected")
+        waiting.append(
+            asyncio.create_task(_request(budget, PRIORITY_HIGH, order, "login"))
+        )
+        await asyncio.sleep(0)
+    await asyncio.gather(*waiting)
+    assert order == ["login", "poll"]
+    assert budget.rejected == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limits_requests():
+    """Test requests beyond the burst wait for the bucket to refill."""
+    clock = Clock()
+    budget = RequestBudget(1, 10, clock=clock)
+    order: list[str] = []
+    for name in ("first", "second"):
+        await _request(budget, PRIORITY_POLL, order, name)
+    third = asyncio.create_task(_request(budget, PRIORITY_POLL, order, "third"))
+    await asyncio.sleep(0)
+    assert order == ["first", "second"]
+
+    clock.now = 1
+    budget.configure(1, 10)
+    await third
+    assert order == ["first", "second", "third"]
+    assert budget.wait.count == 1
+
+
+async def test_budget_shared_per_controller(hass):
+    """Test clients of one controller share a budget, and entries set its limits."""
+    budget = async_get_budget(hass, {CONF_URL: "https://omada"})
+    assert async_get_budget(hass, {CONF_URL: "https://other"}) is not budget
+    shared = async_get_budget(
+        hass, {CONF_URL: "https://omada", CONF_REQUEST_RATE: 5, CONF_MAX_IN_FLIGHT: 2}
+    )
+    assert shared is budget
+    assert (budget.rate, budget.max_in_flight) == (5, 2)
+    assert async_get_budget(hass, {CONF_URL: "https://omada"}).rate == 5
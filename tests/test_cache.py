@@ -0,0 +1,69 @@
+"""Test the device cache."""
+from custom_components.omada_controller import cache as cache_module
+from custom_components.omada_controller.cache import DeviceCache
+from custom_components.omada_controller.device import DeviceChanges
+
+DETAILS = {
+    "hostname": "omada",
+    "model": "OC200",
+    "firmware": "5.9.31",
+    "serial_number": "fakeomadac0001",
+}
+ONE = {"mac": "CC-CC-CC-CC-CC-01", "name": "phone", "ip": "10.0.0.1", "uptime": 1}
+TWO = {"mac": "CC-CC-CC-CC-CC-02", "name": "laptop", "ip": "10.0.0.2", "uptime": 1}
+
+
+def _journal_lines(cache: DeviceCache) -> int:
+    return len(cache.path.read_text(encoding="utf-8").splitlines())
+
+
+async def test_cache_round_trip(hass, tmp_path, data, refresh):
+    """Test devices survive a restart and only real changes are appended."""
+    hass.config.config_dir = str(tmp_path)
+    data.detection_time = 0
+    cache = DeviceCache(hass, "entry")
+    cache.async_record_details(DETAILS)
+
+    await refresh([ONE, TWO])
+    cache.async_record_changes(data.devices, data.changes)
+    await cache.async_flush()
+    assert _journal_lines(cache) == 4
+
+    await refresh([{**ONE, "uptime": 2}, {**TWO, "uptime": 2}])
+    cache.async_record_changes(data.devices, data.changes)
+    await cache.async_flush()
+    assert _journal_lines(cache) == 4
+
+    await refresh([{**ONE, "ip": "10.0.0.9"}])
+    cache.async_record_changes(data.devices, data.changes)
+    cache.async_record_changes(data.devices, DeviceChanges(removed={TWO["mac"]}))
+    await cache.async_flush()
+    assert _journal_lines(cache) == 7
+
+    restored = DeviceCache(hass, "entry")
+    devices = await restored.async_load()
+    assert restored.details == DETAILS
+    assert list(devices) == [ONE["mac"]]
+    assert devices[ONE["mac"]].connected
+    assert devices[ONE["mac"]].params["name"] == "phone"
+    assert devices[ONE["mac"]].to_device(ONE["mac"]).ip_address == "10.0.0.9"
+
+
+async def test_cache_compacts_and_skips_torn_lines(
+    hass, tmp_path, monkeypatch, data, refresh
+):
+    """Test the journal is rewritten once it grows and a torn tail is ignored."""
+    hass.config.config_dir = str(tmp_path)
+    monkeypatch.setattr(cache_module, "CACHE_COMPACT_SLACK", 2)
+    cache = DeviceCache(hass, "entry")
+    for ip in range(10):
+        await refresh([{**ONE, "ip": f"10.0.0.{ip}"}])
+        cache.async_record_changes(data.devices, data.changes)
+        await cache.async_flush()
+    assert _journal_lines(cache) <= 5
+
+    with cache.path.open("a", encoding="utf-8") as journal:
+        journal.write('["CC-CC-CC-CC-CC-02","Default",1,')
+    devices = await DeviceCache(hass, "entry").async_load()
+    assert list(devices) == [ONE["mac"]]
+    assert devices[ONE["mac"]].params["ip"] == "10.0.0.9"
@@ -0,0 +1,96 @@
+"""Test the Omada Controller config and options flows."""
+from custom_components.omada_controller.const import (
+    CONF_ATTRIBUTE_THRESHOLDS,
+    CONF_DETECTION_TIME,
+    CONF_EVENT_MODE,
+    CONF_EXCLUDED_ATTRIBUTES,
+    CONF_MAX_SCAN_INTERVAL,
+    CONF_MIN_SCAN_INTERVAL,
+    CONF_PRESENCE_LOG,
+    CONF_SITE_CONCURRENCY,
+    CONF_SITE_SCAN_INTERVALS,
+    CONF_SITES,
+    DOMAIN,
+)
+
+from .fake_controller import FakeOmadaController
+
+
+async def test_options_choose_sites_and_intervals(
+    hass, tmp_path, socket_enabled, add_entry
+):
+    """Test the options pick the sites, minus other entries', and their intervals."""
+    hass.config.config_dir = str(tmp_path)
+    fake = FakeOmadaController(sites=3, clients_per_site=2)
+    await fake.start()
+    add_entry(fake, data={CONF_SITES: ["Site 2"]})
+    entry = add_entry(fake, data={CONF_SITES: ["Default"]})
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    assert result["step_id"] == "sites"
+    assert set(result["data_schema"].schema[CONF_SITES].options) == {
+        "Default",
+        "Site 1",
+    }
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF_SITES: ["Default", "Site 1"]}
+    )
+    assert result["step_id"] == "device_tracker"
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        {
+            CONF_DETECTION_TIME: 300,
+            CONF_MIN_SCAN_INTERVAL: 120,
+            CONF_MAX_SCAN_INTERVAL: 10,
+        },
+    )
+    assert result["errors"] == {CONF_MAX_SCAN_INTERVAL: "invalid_scan_interval"}
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        {
+            CONF_DETECTION_TIME: 300,
+            CONF_MIN_SCAN_INTERVAL: 10,
+            CONF_MAX_SCAN_INTERVAL: 120,
+        },
+    )
+    assert result["step_id"] == "connection"
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF_SITE_CONCURRENCY: 4}
+    )
+    assert result["step_id"] == "events"
+    assert result["description_placeholders"]["webhook_url"]
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF_EVENT_MODE: False}
+    )
+    assert result["step_id"] == "history"
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF_PRESENCE_LOG: False}
+    )
+    assert result["step_id"] == "attributes"
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF_EXCLUDED_ATTRIBUTES: ["uptime"], "signalLevel": 10}
+    )
+    assert result["step_id"] == "site_intervals"
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {"Default": 0, "Site 1": 600}
+    )
+    assert result["type"] == "create_entry"
+    assert entry.options[CONF_SITES] == ["Default", "Site 1"]
+    assert entry.options[CONF_SITE_SCAN_INTERVALS] == {"Site 1": 600}
+    assert entry.options[CONF_SITE_CONCURRENCY] == 4
+    assert entry.options[CONF_MAX_SCAN_INTERVAL] == 120
+    assert entry.options[CONF_EXCLUDED_ATTRIBUTES] == ["uptime"]
+    assert entry.options[CONF_ATTRIBUTE_THRESHOLDS]["signalLevel"] == 10
+
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    assert coordinator.api.sites == ["Default", "Site 1"]
+    assert coordinator.api.site_intervals == {"Site 1": 600.0}
+    assert all(
+        "uptime" not in device.attrs for device in coordinator.api.devices.values()
+    )
+
+    await hass.config_entries.async_unload(entry.entry_id)
+    await fake.close()
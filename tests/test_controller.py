@@ -0,0 +1,355 @@
+"""Test the Omada Controller API client."""
+import asyncio
+import time
+
+from homeassistant.const import CONF_PASSWORD
+import pytest
+
+from custom_components.omada_controller import controller
+from custom_components.omada_controller.cache import CachedDevice
+from custom_components.omada_controller.controller import (
+    OmadaController,
+    OmadaControllerData,
+)
+from custom_components.omada_controller.const import CONF_READ_TIMEOUT
+from custom_components.omada_controller.errors import (
+    CannotConnect,
+    ControllerUnavailable,
+    LoginError,
+)
+from custom_components.omada_controller.events import parse_webhook_payload
+
+from .common import make_client, make_mac
+from .fake_controller import CONTROLLER_ID, event_line, event_payload
+
+
+@pytest.mark.asyncio
+async def test_login_and_update_devices(fake_controller, api):
+    """Test logging in and collecting clients, keeping sites that succeeded."""
+    fake_controller.failing_sites.add("Site 2")
+    await api.login()
+    assert api.controller_id == CONTROLLER_ID
+    assert api.sites == fake_controller.site_keys
+
+    data = OmadaControllerData(api)
+    await data.async_update_devices()
+    assert {mac: device.site for mac, device in data.devices.items()} == {
+        client["mac"]: site.name
+        for site in fake_controller.sites
+        if site.name != "Site 2"
+        for client in site.clients
+    }
+    assert list(data.site_errors) == ["Site 2"]
+
+
+@pytest.mark.asyncio
+async def test_get_all_clients_fetches_sites_concurrently(
+    fake_controller, api, monkeypatch
+):
+    """Test every site's clients are collected at once, keeping sites that succeeded."""
+    fake_controller.failing_sites.add("Site 2")
+    await api.login()
+    fetching: set[str] = set()
+    overlapping: set[str] = set()
+    iter_clients_at_site = api.iter_clients_at_site
+
+    async def iter_clients(site):
+        fetching.add(site)
+        try:
+            async for page in iter_clients_at_site(site):
+                overlapping.update(fetching - {site})
+                yield page
+        finally:
+            fetching.discard(site)
+
+    monkeypatch.setattr(api, "iter_clients_at_site", iter_clients)
+    result = await api.get_all_clients()
+    assert overlapping
+    assert {
+        site: [c["mac"] for c in clients] for site, clients in result.clients.items()
+    } == {
+        site.name: [c["mac"] for c in site.clients]
+        for site in fake_controller.sites
+        if site.name != "Site 2"
+    }
+    assert list(result.errors) == ["Site 2"]
+
+
+@pytest.mark.asyncio
+async def test_login_reuses_info_and_overlaps_checks(fake_controller, api):
+    """Test a login fetches the info once and checks the session alongside the sites."""
+    fake_controller.latency = 0.05
+    data = OmadaControllerData(api)
+    await api.login()
+    assert fake_controller.round_trips == 3
+    await data.get_controller_details()
+    assert fake_controller.requests["/api/info"] == 1
+    assert data.serial_number == CONTROLLER_ID
+
+
+@pytest.mark.asyncio
+async def test_login_bad_credentials(api):
+    """Test a rejected login raises LoginError."""
+    api.config[CONF_PASSWORD] = "wrong"
+    with pytest.raises(LoginError):
+        await api.login()
+
+
+@pytest.mark.asyncio
+async def test_clients_are_paginated(fake_controller, api, monkeypatch):
+    """Test every page of a large site is fetched."""
+    monkeypatch.setattr(controller, "CLIENTS_PAGE_SIZE", 7)
+    site = fake_controller.site("Default")
+    site.clients = [{"mac": make_mac(i)} for i in range(50)]
+    await api.login()
+    pages = [page async for page in api.iter_clients_at_site("Default")]
+    assert len(pages) == 8
+    assert sorted(c["mac"] for page in pages for c in page) == [
+        c["mac"] for c in site.clients
+    ]
+
+
+@pytest.mark.asyncio
+async def test_expired_session_renewed_once(fake_controller, api):
+    """Test concurrent requests on an expired session share one login."""
+    await api.login()
+    fake_controller.expire_session()
+    data = OmadaControllerData(api)
+    await data.async_update_devices()
+    assert fake_controller.logins == 2
+    assert len(data.devices) == 15
+
+
+@pytest.mark.asyncio
+async def test_failed_gets_are_retried(fake_controller, api, monkeypatch):
+    """Test a GET is retried after server errors, but a login is not."""
+    monkeypatch.setattr(controller, "RETRY_BACKOFF", 0.01)
+    await api.login()
+    fake_controller.fail_next = 2
+    assert len(await api.get_clients_at_site("Default")) == 5
+    assert api.metrics.request_retries == 2
+
+    api.token = None
+    fake_controller.fail_next = 1
+    with pytest.raises(CannotConnect):
+        await api.login()
+    assert api.metrics.request_retries == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_controller_times_out(fake_controller, api, monkeypatch):
+    """Test a request gives up once the controller is slower than the read timeout."""
+    monkeypatch.setattr(controller, "RETRY_BACKOFF", 0.01)
+    slow = OmadaController(api.session, {**api.config, CONF_READ_TIMEOUT: 0.1})
+    await slow.login()
+    fake_controller.latency = 1
+    start = time.monotonic()
+    with pytest.raises(CannotConnect):
+        await slow.get_clients_at_site("Default")
+    assert time.monotonic() - start < 2 * fake_controller.latency
+    assert slow.metrics.request_retries == 2
+
+
+@pytest.mark.asyncio
+async def test_breaker_fails_fast_and_probes(fake_controller, api, monkeypatch):
+    """Test a failing controller trips the breaker, which closes after a good probe."""
+    monkeypatch.setattr(controller, "RETRY_BACKOFF", 0.01)
+    api.breaker.threshold = 2
+    api.breaker.reset_timeout = api.breaker._timeout = 0.2
+    await api.login()
+    fake_controller.fail_next = 100
+    for _ in range(2):
+        with pytest.raises(CannotConnect):
+            await api.get_clients_at_site("Default")
+    assert api.breaker.state == "open"
+
+    requests = sum(fake_controller.requests.values())
+    with pytest.raises(ControllerUnavailable):
+        await api.get_clients_at_site("Default")
+    assert sum(fake_controller.requests.values()) == requests
+    assert api.metrics.breaker_trips == 1
+
+    fake_controller.fail_next = 0
+    await asyncio.sleep(0.2)
+    assert api.breaker.state == "half_open"
+    clients = await asyncio.gather(
+        *(api.get_clients_at_site(s.name) for s in fake_controller.sites)
+    )
+    assert [len(c) for c in clients] == [5, 5, 5]
+    assert fake_controller.requests["/api/info"] == 2
+    assert api.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_refresh_against_churning_controller(fake_controller, api):
+    """Test a refresh tracks churn with one request per site page."""
+    fake_controller.churn = 0.4
+    data = OmadaControllerData(api)
+    data.detection_time = 0
+    await api.login()
+    await data.async_update_devices()
+    assert len(data.changes.added) == 15
+
+    fake_controller.tick()
+    await data.async_update_devices()
+    assert len(data.changes.added) == 6
+    assert len(data.changes.disconnected) == 6
+    assert len(data.changes.updated) == 9
+    clients_path = f"/{CONTROLLER_ID}/api/v2/sites/{{site_key}}/clients"
+    assert fake_controller.requests[clients_path] == 6
+
+    metrics = api.metrics
+    assert metrics.endpoints["/api/v2/sites/{site}/clients"].count == 6
+    assert metrics.stages["refresh"].count == 2
+    assert metrics.clients_per_site == {site.name: 5 for site in fake_controller.sites}
+    assert metrics.devices_added == 21
+    assert metrics.bytes_received > 0
+
+
+@pytest.mark.asyncio
+async def test_only_due_sites_are_fetched(fake_controller, api):
+    """Test a site with its own poll interval is skipped until it is due."""
+    data = OmadaControllerData(api)
+    data.detection_time = 0
+    data.site_intervals = {"Site 1": 3600}
+    await data.async_update_devices()
+    await data.async_update_devices()
+    clients_path = f"/{CONTROLLER_ID}/api/v2/sites/{{site_key}}/clients"
+    assert fake_controller.requests[clients_path] == 5
+    assert not data.changes
+    assert all(device.connected for device in data.devices.values())
+    assert api.metrics.clients_per_site["Site 1"] == 5
+
+
+@pytest.mark.asyncio
+async def test_unchanged_sites_are_skipped(fake_controller, api):
+    """Test a site whose fingerprinted fields didn't change is not processed."""
+    data = OmadaControllerData(api)
+    data.detection_time = 0
+    await data.async_update_devices()
+    fake_controller.tick()
+    await data.async_update_devices()
+    assert not data.changes
+    assert api.metrics.fingerprint_hit_rates == {
+        site.name: 0.5 for site in fake_controller.sites
+    }
+
+    client = fake_controller.site("Site 1").clients[0]
+    client["ip"] = "10.9.9.9"
+    await data.async_update_devices()
+    assert client["mac"] in data.changes.updated
+    assert data.devices[client["mac"]].ip_address == "10.9.9.9"
+    assert api.metrics.fingerprint_hit_rates["Site 1"] == pytest.approx(1 / 3)
+    assert api.metrics.fingerprint_hit_rate == pytest.approx(5 / 9)
+
+    gone = fake_controller.site("Default").clients.pop()
+    await data.async_update_devices()
+    assert data.changes.disconnected == {gone["mac"]}
+
+
+@pytest.mark.asyncio
+async def test_update_devices_change_set(data, refresh):
+    """Test each refresh records only the devices that changed."""
+    data.detection_time = 0
+    one = {"mac": "CC-CC-CC-CC-CC-01", "ip": "10.0.0.1"}
+    two = {"mac": "CC-CC-CC-CC-CC-02", "ip": "10.0.0.2"}
+
+    await refresh([one, two])
+    assert data.changes.added == {one["mac"], two["mac"]}
+    assert not data.changes.changed
+
+    await refresh([one, two])
+    assert not data.changes
+
+    await refresh([{**one, "ip": "10.0.0.9"}])
+    assert data.changes.updated == {one["mac"]}
+    assert data.changes.disconnected == {two["mac"]}
+
+    await refresh([one, two])
+    assert data.changes.connected == {two["mac"]}
+    assert data.changes.updated == {one["mac"]}
+
+
+@pytest.mark.asyncio
+async def test_missing_device_stays_home_until_detection_time(data, refresh):
+    """Test a device only goes away once last seen plus detection time passes."""
+    data.detection_time = 300
+    last_seen = time.time() - 100
+    client = {"mac": "CC-CC-CC-CC-CC-01", "lastSeen": int(last_seen * 1000)}
+
+    await refresh([client])
+    await refresh([])
+    assert data.devices[client["mac"]].connected
+    assert data.next_expiry == pytest.approx(last_seen + 300, abs=0.01)
+
+    data.expire_due(last_seen + 299)
+    assert not data.changes
+    data.expire_due(last_seen + 300)
+    assert data.changes.disconnected == {client["mac"]}
+    assert not data.devices[client["mac"]].connected
+    assert data.next_expiry is None
+
+
+@pytest.mark.asyncio
+async def test_expiry_during_refresh_joins_its_changes(fake_controller, api):
+    """Test an expiry firing while a refresh awaits a site keeps its changes."""
+    now_ms = int(time.time() * 1000)
+    for site in fake_controller.sites:
+        for client in site.clients:
+            client["lastSeen"] = now_ms
+    data = OmadaControllerData(api)
+    data.detection_time = 60
+    await data.async_update_devices()
+    gone = fake_controller.site("Default").clients.pop()
+    await data.async_update_devices()
+    assert data.devices[gone["mac"]].connected
+
+    first = make_client(100, site="Default", last_seen=now_ms)
+    last = make_client(101, site="Site 2", last_seen=now_ms)
+    fake_controller.site("Default").clients.append(first)
+    fake_controller.site("Site 2").clients.append(last)
+    fake_controller.latency = 0.05
+    api.max_concurrent_sites = 1
+    clients_path = f"/{CONTROLLER_ID}/api/v2/sites/{{site_key}}/clients"
+    fetched = fake_controller.requests[clients_path]
+    refresh = asyncio.create_task(data.async_update_devices())
+    while fake_controller.requests[clients_path] < fetched + 2:
+        await asyncio.sleep(0.005)
+    assert data.refreshing
+    data.expire_due(time.time() + 120)
+    await refresh
+
+    assert data.changes.added == {first["mac"], last["mac"]}
+    assert data.changes.disconnected == {gone["mac"]}
+    data.changes_delivered()
+    await data.async_update_devices()
+    assert not data.changes
+
+
+@pytest.mark.asyncio
+async def test_device_seen_again_cancels_expiry(data, refresh):
+    """Test a device reappearing before its deadline never goes away."""
+    client = {"mac": "CC-CC-CC-CC-CC-01", "lastSeen": int(time.time() * 1000)}
+
+    await refresh([client])
+    await refresh([])
+    await refresh([client])
+    assert data.next_expiry is None
+    data.expire_due(time.time() + 3600)
+    assert data.devices[client["mac"]].connected
+
+
+@pytest.mark.asyncio
+async def test_restored_and_event_devices_expire_when_missing(data, refresh):
+    """Test devices a fetch never listed expire once their site's fetch misses them."""
+    data.detection_time = 0
+    listed, restored, pushed = make_client(1), make_client(2), make_client(3)
+    data.restore({}, {restored["mac"]: CachedDevice("Default", True, restored)})
+    await refresh([listed])
+    assert data.changes.disconnected == {restored["mac"]}
+
+    payload = event_payload("Default", [event_line("connected", pushed)])
+    data.apply_events(parse_webhook_payload(payload))
+    assert data.devices[pushed["mac"]].connected
+    await refresh([listed])
+    assert data.changes.disconnected == {pushed["mac"]}
@@ -0,0 +1,105 @@
+"""Test the network device model."""
+from unittest.mock import patch
+
+from custom_components.omada_controller.device import Device
+from custom_components.omada_controller.policy import AttributeFilter, AttributePolicy
+
+from .common import make_client
+
+
+def test_device_keeps_only_projected_fields():
+    """Test the device exposes the tracked attributes and drops the rest."""
+    client = make_client(1)
+    device = Device(client["mac"], client, "Default")
+    assert not hasattr(device, "__dict__")
+    assert device.name == "client-1"
+    assert device.ip_address == client["ip"]
+    assert device.attrs["apname"] == client["apName"]
+    assert "trafficdown" not in device.attrs
+    assert device.last_seen.timestamp() == client["lastSeen"] / 1000
+
+
+def test_device_attrs_rebuilt_only_on_change():
+    """Test the attribute mapping is cached until a tracked value changes."""
+    client = make_client(1)
+    device = Device(client["mac"], client)
+    attrs = device.attrs
+
+    assert not device.update({**client, "trafficDown": 0})
+    assert device.attrs is attrs
+
+    assert device.update({**client, "uptime": client["uptime"] + 10})
+    assert device.attrs is not attrs
+    assert device.attrs["uptime"] == client["uptime"] + 10
+
+
+def test_attribute_filter_holds_back_small_changes():
+    """Test volatile changes are shown once large enough and not too soon."""
+    attribute_filter = AttributeFilter(
+        {
+            "signalLevel": AttributePolicy(threshold=10, min_interval=60),
+            "uptime": AttributePolicy(exclude=True),
+        }
+    )
+    client = make_client(1)
+    device = Device(client["mac"], client, "Default", attribute_filter)
+    assert "uptime" not in device.attrs
+    signal = client["signalLevel"]
+    now = device._shown_at
+
+    assert not device.update(
+        {**client, "uptime": 99, "signalLevel": signal + 5},
+        "Default",
+        attribute_filter,
+        now + 100,
+    )
+    assert not device.update(
+        {**client, "signalLevel": signal + 20}, "Default", attribute_filter, now + 30
+    )
+    assert device.update(
+        {**client, "signalLevel": signal + 20}, "Default", attribute_filter, now + 70
+    )
+    assert device.attrs["signallevel"] == signal + 20
+
+    # A change to any other attribute shows the latest values straight away.
+    assert device.update(
+        {**client, "signalLevel": signal + 21, "ip": "10.9.9.9"},
+        "Default",
+        attribute_filter,
+        now + 71,
+    )
+    assert device.attrs["signallevel"] == signal + 21
+    assert device.ip_address == "10.9.9.9"
+    assert "uptime" not in device.attrs
+    assert device.params()["uptime"] == client["uptime"]
+
+
+def test_attribute_filter_skipped_when_nothing_is_held_back():
+    """Test the filter only runs again for an unchanged device while a change is due."""
+    attribute_filter = AttributeFilter(
+        {"signalLevel": AttributePolicy(threshold=10, min_interval=60)}
+    )
+    client = make_client(1)
+    device = Device(client["mac"], client, "Default", attribute_filter)
+    now = device._shown_at
+    signal = client["signalLevel"]
+
+    with patch.object(
+        attribute_filter, "update", wraps=attribute_filter.update
+    ) as update:
+        for _ in range(5):
+            assert not device.update(client, "Default", attribute_filter, now + 100)
+        assert update.call_count == 0
+
+        # A change below the threshold never becomes due.
+        small = {**client, "signalLevel": signal + 5}
+        for _ in range(3):
+            assert not device.update(small, "Default", attribute_filter, now + 100)
+        assert update.call_count == 1
+
+        # A change made too soon is shown once old enough, and then settles.
+        large = {**client, "signalLevel": signal + 20}
+        assert not device.update(large, "Default", attribute_filter, now + 10)
+        assert device.update(large, "Default", attribute_filter, now + 70)
+        assert not device.update(large, "Default", attribute_filter, now + 200)
+        assert update.call_count == 3
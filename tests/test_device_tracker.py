@@ -0,0 +1,105 @@
+"""Test the Omada Controller device tracker platform."""
+import asyncio
+
+from homeassistant.const import STATE_HOME, STATE_NOT_HOME
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.omada_controller import device_tracker
+from custom_components.omada_controller.const import DOMAIN
+
+from .fake_controller import FakeOmadaController
+
+
+def _tracker_ids(hass, entry) -> set[str]:
+    registry = er.async_get(hass)
+    return {
+        entity.unique_id
+        for entity in er.async_entries_for_config_entry(registry, entry.entry_id)
+        if entity.domain == "device_tracker"
+    }
+
+
+async def _added(hass, entry) -> None:
+    """Wait for the batches of device trackers still being added."""
+    name = f"{DOMAIN} {entry.entry_id} add device trackers"
+    await asyncio.gather(
+        *(task for task in asyncio.all_tasks() if task.get_name() == name)
+    )
+    await hass.async_block_till_done()
+
+
+async def test_entities_added_in_batches(
+    hass, tmp_path, socket_enabled, monkeypatch, add_entry
+):
+    """Test a large first refresh is registered in batches and new devices follow."""
+    hass.config.config_dir = str(tmp_path)
+    monkeypatch.setattr(device_tracker, "ENTITY_ADD_BATCH", 10)
+    batches: list[int] = []
+    add_batched = device_tracker._async_add_batched
+
+    async def record_batches(config_entry, async_add_entities, entities):
+        def add_batch(batch):
+            batches.append(len(batch))
+            async_add_entities(batch)
+
+        await add_batched(config_entry, add_batch, entities)
+
+    monkeypatch.setattr(device_tracker, "_async_add_batched", record_batches)
+    fake = FakeOmadaController(sites=2, clients_per_site=25, churn=0.2)
+    await fake.start()
+    entry = add_entry(fake)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await _added(hass, entry)
+    assert len(_tracker_ids(hass, entry)) == 50
+    # The first batch is added straight away, the rest by the background task.
+    assert batches == [10] * 4
+
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    await coordinator.async_refresh()
+    assert batches == [10] * 4
+
+    fake.tick()
+    await coordinator.async_refresh()
+    await _added(hass, entry)
+    assert _tracker_ids(hass, entry) == set(coordinator.api.devices)
+    assert len(coordinator.api.devices) == 60
+    assert batches == [10] * 4
+
+    await hass.config_entries.async_unload(entry.entry_id)
+    await fake.close()
+
+
+async def test_removed_device_tracked_again(hass, tmp_path, socket_enabled, add_entry):
+    """Test a device back after its site stopped being tracked is home again."""
+    hass.config.config_dir = str(tmp_path)
+    fake = FakeOmadaController(sites=2, clients_per_site=2)
+    await fake.start()
+    entry = add_entry(fake, options={"detection_time": 0})
+    site = fake.sites[-1]
+    # Device trackers are disabled by default, so enable the one looked at.
+    entity_id = (
+        er.async_get(hass)
+        .async_get_or_create(
+            "device_tracker", DOMAIN, site.clients[0]["mac"], config_entry=entry
+        )
+        .entity_id
+    )
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    coordinator.api.site_filter = {"Default"}
+    assert hass.states.get(entity_id).state == STATE_HOME
+
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+    assert site.clients[0]["mac"] not in coordinator.api.devices
+    assert hass.states.get(entity_id).state == STATE_NOT_HOME
+
+    coordinator.api.site_filter = None
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+    assert hass.states.get(entity_id).state == STATE_HOME
+    assert len(_tracker_ids(hass, entry)) == 4
+
+    await hass.config_entries.async_unload(entry.entry_id)
+    await fake.close()
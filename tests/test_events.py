@@ -0,0 +1,136 @@
+"""Test client events pushed to the webhook."""
+import asyncio
+
+from custom_components.omada_controller.const import (
+    CONF_DETECTION_TIME,
+    CONF_EVENT_MODE,
+    CONF_WEBHOOK_ID,
+    DOMAIN,
+)
+from custom_components.omada_controller.controller import OmadaControllerData
+from custom_components.omada_controller.events import (
+    CONNECTED,
+    DISCONNECTED,
+    ROAMED,
+    parse_webhook_payload,
+)
+
+from .common import make_client
+from .fake_controller import (
+    CONTROLLER_ID,
+    FakeOmadaController,
+    event_line,
+    event_payload,
+)
+
+CLIENT = make_client(1)
+
+
+def _events(site: str, *lines: str):
+    return parse_webhook_payload(event_payload(site, list(lines)))
+
+
+def test_parse_webhook_payload():
+    """Test connect, disconnect and roam lines are read and the rest ignored."""
+    payload = event_payload(
+        "Default",
+        [
+            event_line("connected", CLIENT),
+            event_line("roamed", CLIENT, ap="Attic"),
+            event_line("disconnected", CLIENT),
+            "[ap:Hall:50-00-00-00-00-01] was upgraded to firmware 1.2.3.",
+        ],
+        timestamp=1_700_000_000_000,
+    )
+    connected, roamed, disconnected = parse_webhook_payload(payload)
+    assert (connected.kind, roamed.kind, disconnected.kind) == (
+        CONNECTED,
+        ROAMED,
+        DISCONNECTED,
+    )
+    assert connected.mac == CLIENT["mac"]
+    assert connected.timestamp == 1_700_000_000
+    assert connected.params == {
+        "name": CLIENT["name"],
+        "apName": CLIENT["apName"],
+        "ssid": CLIENT["ssid"],
+    }
+    assert roamed.params["apName"] == "Attic"
+    assert disconnected.params == {"name": CLIENT["name"]}
+    assert parse_webhook_payload({"text": ["not a message"]}) == []
+
+
+async def test_apply_events(data, refresh):
+    """Test events update devices in place, keeping the fields they don't carry."""
+    data.detection_time = 0
+    await refresh([CLIENT])
+
+    data.apply_events(_events("Default", event_line("roamed", CLIENT, ap="Attic")))
+    device = data.devices[CLIENT["mac"]]
+    assert data.changes.updated == {CLIENT["mac"]}
+    assert device.attrs["apname"] == "Attic"
+    assert device.ip_address == CLIENT["ip"]
+
+    data.apply_events(_events("Default", event_line("disconnected", CLIENT)))
+    assert data.changes.disconnected == {CLIENT["mac"]}
+    assert not device.connected
+
+    data.apply_events(_events("Guest", event_line("connected", CLIENT)))
+    assert not data.changes
+
+
+async def test_events_during_refresh_join_its_changes(fake_controller, api):
+    """Test events applied while a refresh awaits a site keep the refresh's changes."""
+    data = OmadaControllerData(api)
+    await data.async_update_devices()
+    new = make_client(100, site="Default")
+    fake_controller.site("Default").clients.append(new)
+    roaming = fake_controller.site("Site 2").clients[0]
+    fake_controller.latency = 0.05
+    api.max_concurrent_sites = 1
+    clients_path = f"/{CONTROLLER_ID}/api/v2/sites/{{site_key}}/clients"
+    fetched = fake_controller.requests[clients_path]
+    refresh = asyncio.create_task(data.async_update_devices())
+    while fake_controller.requests[clients_path] < fetched + 2:
+        await asyncio.sleep(0.005)
+    data.apply_events(_events("Site 2", event_line("roamed", roaming, ap="Attic")))
+    await refresh
+
+    assert data.changes.added == {new["mac"]}
+    assert roaming["mac"] in data.changes.updated
+
+
+async def test_webhook_events(
+    hass, hass_client_no_auth, tmp_path, socket_enabled, add_entry
+):
+    """Test events posted to the webhook update the trackers between sweeps."""
+    hass.config.config_dir = str(tmp_path)
+    fake = FakeOmadaController(sites=1, clients_per_site=10, churn=0.2)
+    await fake.start()
+    entry = add_entry(
+        fake,
+        options={
+            CONF_EVENT_MODE: True,
+            CONF_WEBHOOK_ID: "omada-hook",
+            CONF_DETECTION_TIME: 0,
+        },
+    )
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    assert coordinator.update_interval.total_seconds() == 300
+    requests = sum(fake.requests.values())
+
+    fake.tick()
+    await fake.post_events(await hass_client_no_auth(), "/api/webhook/omada-hook")
+    await hass.async_block_till_done()
+    data = coordinator.api
+    assert sum(fake.requests.values()) == requests
+    assert {mac for mac, device in data.devices.items() if device.connected} == {
+        client["mac"] for client in fake.sites[0].clients
+    }
+    assert len(data.devices) == 12
+    assert data.metrics.events_received == 4
+
+    await hass.config_entries.async_unload(entry.entry_id)
+    await fake.close()
@@ -0,0 +1,88 @@
+"""Test the per-client throughput history."""
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.omada_controller.const import (
+    CONF_HISTORY_SAMPLES,
+    CONF_THROUGHPUT_SENSORS,
+    DOMAIN,
+    SERVICE_GET_THROUGHPUT_HISTORY,
+)
+from custom_components.omada_controller.history import ThroughputHistory
+
+from .fake_controller import FakeOmadaController
+
+
+def test_history_wraps_and_downsamples():
+    """Test the oldest samples are overwritten and windows summarize the rest."""
+    history = ThroughputHistory(4)
+    assert history.nbytes == 4 * 28
+    samples = [
+        (0, 1, 0),
+        (10, 2, 100),
+        (20, 3, 300),
+        (30, 4, 50),
+        (40, 5, 80),
+        (80, None, -5),
+    ]
+    for second, rate, down in samples:
+        history.append(1000 + second, rate, rate, down, 0)
+    assert len(history) == 4
+    assert [sample[0] for sample in history.samples()] == [1020, 1030, 1040, 1080]
+    assert history.samples()[-1][1:] == (0, 0, 0, 0)
+
+    first, second = history.downsample(60)
+    assert first["start"] == 1020
+    assert first["samples"] == 3
+    assert first["rx_rate"] == {"min": 3, "max": 5, "mean": 4.0}
+    # The counter went from 300 down to 50, so it was reset and counts from zero.
+    assert first["downloaded"] == 50 + 30
+    assert (second["start"], second["downloaded"]) == (1080, 0)
+    assert history.mean_rates(1030) == (3.0, 3.0)
+    assert history.mean_rates(2000) is None
+
+
+async def test_history_service_and_sensors(hass, tmp_path, socket_enabled, add_entry):
+    """Test the history is recorded per poll and served by the service and sensors."""
+    hass.config.config_dir = str(tmp_path)
+    fake = FakeOmadaController(sites=1, clients_per_site=3)
+    await fake.start()
+    entry = add_entry(
+        fake, options={CONF_HISTORY_SAMPLES: 2, CONF_THROUGHPUT_SENSORS: True}
+    )
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    client = fake.site("Default").clients[0]
+    client["rxRate"] = 1000
+    await coordinator.async_refresh()
+    client["rxRate"] = 3000
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    registry = er.async_get(hass)
+    tracker = registry.async_get_entity_id("device_tracker", DOMAIN, client["mac"])
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_THROUGHPUT_HISTORY,
+        {"entity_id": [tracker]},
+        blocking=True,
+        return_response=True,
+    )
+    samples = response[tracker]["samples"]
+    assert [sample["rx_rate"] for sample in samples] == [1000, 3000]
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_THROUGHPUT_HISTORY,
+        {"entity_id": [tracker], "window": 3600},
+        blocking=True,
+        return_response=True,
+    )
+    assert response[tracker]["windows"][-1]["rx_rate"]["max"] == 3000
+
+    sensor = registry.async_get_entity_id("sensor", DOMAIN, f"{client['mac']}_rx_rate")
+    assert float(hass.states.get(sensor).state) == 2.0
+    assert len(coordinator.api.history) == 3
+
+    await hass.config_entries.async_unload(entry.entry_id)
+    await fake.close()
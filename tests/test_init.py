@@ -1,9 +1,100 @@
 """Test component setup."""
+from homeassistant import config_entries
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.helpers import entity_registry as er
 from homeassistant.setup import async_setup_component
 
+from custom_components.omada_controller import config_flow
 from custom_components.omada_controller.const import DOMAIN
+from custom_components.omada_controller.hub import DATA_HUBS
+
+from .fake_controller import FakeOmadaController
+
+LATENCY = 0.25
 
 
 async def test_async_setup(hass):
     """Test the component gets setup."""
     assert await async_setup_component(hass, DOMAIN, {}) is True
+
+
+async def test_setup_round_trips(hass, tmp_path, socket_enabled, add_entry):
+    """Test setup takes four round trips: info, login, session and sites, clients."""
+    hass.config.config_dir = str(tmp_path)
+    fake = FakeOmadaController(sites=3, clients_per_site=5, latency=LATENCY)
+    await fake.start()
+    entry = add_entry(fake)
+
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    assert fake.round_trips == 4
+    assert fake.requests["/api/info"] == 1
+    assert fake.logins == 1
+
+    await hass.config_entries.async_unload(entry.entry_id)
+    await fake.close()
+
+
+async def test_setup_reuses_config_flow_login(hass, tmp_path, socket_enabled):
+    """Test the entry created by the config flow is set up without logging in again."""
+    hass.config.config_dir = str(tmp_path)
+    fake = FakeOmadaController(sites=1, clients_per_site=5)
+    await fake.start()
+
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": config_entries.SOURCE_USER}
+    )
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], fake.entry_data
+    )
+    await hass.async_block_till_done()
+    assert result["type"] == "create_entry"
+    assert fake.logins == 1
+    assert fake.requests["/api/info"] == 1
+    registry = er.async_get(hass)
+    entities = er.async_entries_for_config_entry(registry, result["result"].entry_id)
+    assert (
+        len([entity for entity in entities if entity.domain == "device_tracker"]) == 5
+    )
+
+    (api,) = hass.data[DATA_HUBS].values()
+    await hass.config_entries.async_unload(result["result"].entry_id)
+    assert not hass.data[DATA_HUBS]
+    assert api.session.closed
+    await fake.close()
+
+
+async def test_abandoned_config_flow_closes_its_client(
+    hass, tmp_path, socket_enabled, monkeypatch
+):
+    """Test a flow left at the sites step closes the client it logged in with."""
+    hass.config.config_dir = str(tmp_path)
+    fake = FakeOmadaController(sites=2, clients_per_site=1)
+    await fake.start()
+    clients = []
+    create_controller = config_flow.async_create_controller
+
+    def record_controller(hass, config):
+        clients.append(create_controller(hass, config))
+        return clients[-1]
+
+    monkeypatch.setattr(config_flow, "async_create_controller", record_controller)
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": config_entries.SOURCE_USER}
+    )
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {**fake.entry_data, CONF_PASSWORD: "wrong"}
+    )
+    assert result["errors"] == {
+        CONF_USERNAME: "invalid_auth",
+        CONF_PASSWORD: "invalid_auth",
+    }
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], fake.entry_data
+    )
+    assert result["step_id"] == "sites"
+    assert not clients[1].session.closed
+
+    hass.config_entries.flow.async_abort(result["flow_id"])
+    assert [api.session.closed for api in clients] == [True, True]
+    assert not hass.data.get(DATA_HUBS)
+    await fake.close()
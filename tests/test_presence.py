@@ -0,0 +1,108 @@
+"""Test the presence transition log."""
+from types import SimpleNamespace
+
+from custom_components.omada_controller import presence
+from custom_components.omada_controller.const import (
+    CONF_PRESENCE_LOG,
+    DOMAIN,
+    SERVICE_GET_PRESENCE_TRANSITIONS,
+)
+from custom_components.omada_controller.device import Device, DeviceChanges
+from custom_components.omada_controller.presence import PresenceLog
+
+from .common import make_client
+from .fake_controller import FakeOmadaController
+
+
+def _transitions(result):
+    transitions, _ = result
+    return [(row["transition"], row["mac"], row["ap"]) for row in transitions]
+
+
+async def test_log_rotates_and_answers_range_queries(hass, tmp_path, monkeypatch):
+    """Test transitions are logged per refresh, kept in segments and queried."""
+    hass.config.config_dir = str(tmp_path)
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(presence, "time", SimpleNamespace(time=lambda: clock.now))
+    monkeypatch.setattr(presence, "_SEGMENT_RECORDS", 2)
+    monkeypatch.setattr(presence, "PRESENCE_MAX_SEGMENTS", 2)
+    log = PresenceLog(hass, "entry")
+    one, two = make_client(1), make_client(2)
+    devices = {
+        client["mac"]: Device(client["mac"], client, "Default") for client in (one, two)
+    }
+
+    log.async_record_changes(devices, DeviceChanges(added=set(devices)))
+    clock.now = 1100
+    devices[one["mac"]].update({**one, "apName": "AP 9"}, "Default")
+    log.async_record_changes(devices, DeviceChanges(updated={one["mac"]}))
+    clock.now = 1200
+    devices[two["mac"]].connected = False
+    log.async_record_changes(devices, DeviceChanges(disconnected={two["mac"]}))
+    await log.async_flush()
+    assert len(list(log.path.glob("*.seg"))) == 2
+
+    assert _transitions(await log.async_query(1000, 1200)) == [
+        ("connect", one["mac"], one["apName"]),
+        ("connect", two["mac"], two["apName"]),
+        ("roam", one["mac"], "AP 9"),
+        ("disconnect", two["mac"], two["apName"]),
+    ]
+    assert _transitions(await log.async_query(1050, 1150)) == [
+        ("roam", one["mac"], "AP 9")
+    ]
+    transitions, truncated = await log.async_query(0, 2000, two["mac"].lower(), limit=1)
+    assert [row["transition"] for row in transitions] == ["connect"]
+    assert truncated
+
+    # Rotation drops the oldest segment, and a reloaded log finds the rest.
+    clock.now = 1300
+    devices[two["mac"]].connected = True
+    log.async_record_changes(devices, DeviceChanges(connected={two["mac"]}))
+    await log.async_flush()
+    reloaded = PresenceLog(hass, "entry")
+    await reloaded.async_load()
+    assert _transitions(await reloaded.async_query(0, 2000, two["mac"])) == [
+        ("disconnect", two["mac"], two["apName"]),
+        ("connect", two["mac"], two["apName"]),
+    ]
+    assert (await reloaded.async_query(0, 2000))[0][0]["site"] == "Default"
+
+    await reloaded.async_remove()
+    assert not reloaded.path.exists()
+
+
+async def test_presence_service(hass, tmp_path, socket_enabled, add_entry):
+    """Test the service returns the transitions seen by the coordinator."""
+    hass.config.config_dir = str(tmp_path)
+    fake = FakeOmadaController(sites=1, clients_per_site=2)
+    await fake.start()
+    entry = add_entry(fake, options={CONF_PRESENCE_LOG: True, "detection_time": 0})
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    site = fake.site("Default")
+    left = site.clients.pop()
+    site.clients[0]["apName"] = "Attic"
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_PRESENCE_TRANSITIONS,
+        {"config_entry_id": entry.entry_id},
+        blocking=True,
+        return_response=True,
+    )
+    transitions = [(row["transition"], row["mac"]) for row in response["transitions"]]
+    assert sorted(transitions[:2]) == sorted(
+        [("connect", left["mac"]), ("connect", site.clients[0]["mac"])]
+    )
+    assert sorted(transitions[2:]) == [
+        ("disconnect", left["mac"]),
+        ("roam", site.clients[0]["mac"]),
+    ]
+    assert not response["truncated"]
+
+    await hass.config_entries.async_unload(entry.entry_id)
+    await fake.close()
@@ -0,0 +1,58 @@
+"""Test the refresh profiling service."""
+import asyncio
+
+from custom_components.omada_controller.const import DOMAIN, SERVICE_PROFILE_REFRESH
+
+from .fake_controller import FakeOmadaController
+
+
+async def test_profile_refresh(hass, tmp_path, socket_enabled, add_entry):
+    """Test the next refreshes are profiled, and profiling stops afterwards."""
+    hass.config.config_dir = str(tmp_path)
+    fake = FakeOmadaController(sites=1, clients_per_site=3)
+    await fake.start()
+    entry = add_entry(fake)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_PROFILE_REFRESH,
+        {"config_entry_id": entry.entry_id, "refreshes": 2},
+        blocking=True,
+    )
+    profiler = coordinator.profiler
+    assert profiler is not None
+    await coordinator.async_refresh()
+    await coordinator.async_refresh()
+    assert coordinator.profiler is None
+    # The files are written by a background task, which sets done once they are.
+    await profiler.done
+    profiles = list(tmp_path.glob(f"{DOMAIN}.profile.*.prof"))
+    assert len(profiles) == 1
+    summary = profiles[0].with_suffix(".txt").read_text()
+    assert summary.startswith("2 refreshes profiled")
+    assert "async_update_devices" in summary
+
+    call = asyncio.create_task(
+        hass.services.async_call(
+            DOMAIN,
+            SERVICE_PROFILE_REFRESH,
+            {"config_entry_id": entry.entry_id, "refreshes": 1},
+            blocking=True,
+            return_response=True,
+        )
+    )
+    await hass.async_block_till_done()
+    await coordinator.async_refresh()
+    # The response is the profiler's done result, so the files are written by now.
+    response = await call
+    assert response["refreshes"] == 1
+    assert any(
+        "async_update_devices" in row["function"] for row in response["top_functions"]
+    )
+    assert len(list(tmp_path.glob(f"{DOMAIN}.profile.*.txt"))) == 2
+
+    await hass.config_entries.async_unload(entry.entry_id)
+    await fake.close()
@@ -0,0 +1,58 @@
+"""Test the adaptive poll interval."""
+from datetime import timedelta
+import random
+
+from custom_components.omada_controller.scheduler import AdaptiveInterval
+
+
+def _scheduler():
+    return AdaptiveInterval(
+        timedelta(seconds=10), timedelta(seconds=120), rng=random.Random(1)
+    )
+
+
+def test_interval_grows_when_quiet_and_shrinks_with_churn():
+    """Test quiet refreshes lengthen the interval and churn shortens it."""
+    scheduler = _scheduler()
+    for _ in range(10):
+        scheduler.success(churn=0, tracked=100, duration=0.1)
+    assert scheduler.interval == timedelta(seconds=120)
+
+    assert scheduler.success(churn=5, tracked=100, duration=0.1) == timedelta(
+        seconds=60
+    )
+    for _ in range(5):
+        scheduler.success(churn=5, tracked=100, duration=0.1)
+    assert scheduler.interval == timedelta(seconds=10)
+
+
+def test_slow_refresh_backs_off():
+    """Test a refresh taking most of the interval lengthens it."""
+    scheduler = _scheduler()
+    assert scheduler.success(churn=50, tracked=100, duration=8) == timedelta(seconds=20)
+
+
+def test_failures_back_off_with_jitter_within_bounds():
+    """Test consecutive failures back off exponentially up to the maximum."""
+    scheduler = _scheduler()
+    intervals = [scheduler.failure().total_seconds() for _ in range(6)]
+    assert 10 <= intervals[0] <= 20
+    assert 20 <= intervals[1] <= 40
+    assert all(10 <= seconds <= 120 for seconds in intervals)
+
+    scheduler.success(churn=0, tracked=100, duration=0.1)
+    assert scheduler.failures == 0
+
+
+def test_fixed_interval_still_backs_off():
+    """Test failures back off beyond a fixed interval, up to their own ceiling."""
+    sweep = timedelta(seconds=300)
+    scheduler = AdaptiveInterval(
+        sweep, sweep, rng=random.Random(1), failure_maximum=sweep * 8
+    )
+    intervals = [scheduler.failure().total_seconds() for _ in range(6)]
+    assert 300 <= intervals[0] <= 600
+    assert intervals[-1] >= 1200
+    assert all(seconds <= 2400 for seconds in intervals)
+
+    assert scheduler.success(churn=0, tracked=100, duration=0.1) == sweep